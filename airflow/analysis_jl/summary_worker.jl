@@ -0,0 +1,70 @@
+using Sockets                  # For the local TCP command server
+
+# Load analysis.jl once: its `using` lines (CSV, DataFrames, Chain, ...) and main()
+# stay loaded and compiled for the lifetime of this process. The include does not
+# run main() (analysis.jl only does that when executed directly).
+include(joinpath(@__DIR__, "analysis.jl"))
+precompile(main, ())
+
+"""
+serve(ready_file)
+
+Long-lived summary worker, started and supervised by helpers/julia_worker.py.
+
+Listens on an ephemeral 127.0.0.1 port and handles one command per connection,
+one request at a time (a line in, a line out):
+    PING  -> "PONG"                               (health check)
+    RUN   -> "OK <seconds>" | "ERR <message>"     (runs analysis.jl's main())
+    QUIT  -> "BYE", then exits
+
+Once listening, writes "<port> <pid>" to `ready_file` (atomically), which is how
+the Python side learns the port. An exception inside main() is reported as ERR
+and the worker keeps serving; main()'s own output goes to this process's stdout
+(the worker log).
+
+Usage:
+    julia --project=<repo> analysis_jl/summary_worker.jl <ready_file>
+"""
+function serve(ready_file::AbstractString)
+    server = listen(ip"127.0.0.1", 0)
+    port = getsockname(server)[2]
+    tmp_file = ready_file * ".tmp"
+    write(tmp_file, "$(port) $(getpid())")
+    mv(tmp_file, ready_file; force=true)
+    println("Summary worker listening on 127.0.0.1:$(port) (pid $(getpid()))")
+    flush(stdout)
+
+    while true
+        sock = accept(server)
+        command = ""
+        try
+            command = strip(readline(sock))
+            if command == "PING"
+                println(sock, "PONG")
+            elseif command == "RUN"
+                started = time()
+                try
+                    main()
+                    println(sock, "OK ", round(time() - started; digits=3))
+                catch err
+                    println(sock, "ERR ", replace(sprint(showerror, err), '\n' => ' '))
+                end
+            elseif command == "QUIT"
+                println(sock, "BYE")
+            else
+                println(sock, "ERR unknown command: ", command)
+            end
+        catch err
+            println(stderr, "Summary worker: connection error: ", sprint(showerror, err))
+        finally
+            close(sock)
+            flush(stdout)
+        end
+        command == "QUIT" && break
+    end
+    close(server)
+end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    serve(ARGS[1])
+end
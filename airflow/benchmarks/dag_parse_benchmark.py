@@ -0,0 +1,106 @@
+# benchmarks/dag_parse_benchmark.py
+# =====================================================
+# Module: dag_parse_benchmark
+#
+# Measures how long the scheduler takes to parse the weather DAG file and
+# fails (exit code 1) when it exceeds a budget, so parse cost cannot creep up
+# unnoticed as the DAG grows.
+#
+# Each run parses the DAG file in a fresh interpreter (like a scheduler parse
+# process) and records:
+#   - airflow_import_s: importing the Airflow modules the DAG uses (baseline,
+#     paid by every DAG file and not under our control)
+#   - dag_parse_s:      executing the DAG file itself, i.e. our own cost
+#   - heavy_imports:    polars/pydantic/requests/helpers.* modules the DAG file
+#     pulled in beyond what Airflow already loaded (must be none: the ETL
+#     helpers belong inside task bodies)
+# The budget applies to the median dag_parse_s, and is asserted by
+# tests/test_dag_parse.py (skipped where Airflow is not installed).
+#
+# The city count does not affect parse time: cities are read and fanned out at
+# run time (dynamic task mapping), never while parsing.
+#
+# Usage:
+#   PYTHONPATH=airflow python -m benchmarks.dag_parse_benchmark
+#   PYTHONPATH=airflow python -m benchmarks.dag_parse_benchmark --runs 10 --budget 0.2
+# =====================================================
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+DAG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dags", "weather_etl_by_city_dag.py")
+PARSE_BUDGET_SECONDS = 0.25
+HEAVY_MODULES = ("polars", "pydantic", "requests", "pyarrow", "helpers")
+
+# Runs inside the child interpreter; prints one JSON line
+_PARSE_SNIPPET = """
+import json, runpy, sys, time
+started = time.perf_counter()
+import airflow.decorators, airflow.operators.bash
+imported = time.perf_counter()
+baseline = set(sys.modules)
+runpy.run_path(sys.argv[1], run_name="dag_parse_benchmark")
+parsed = time.perf_counter()
+heavy = sorted({
+    m.split(".")[0] for m in set(sys.modules) - baseline
+    if m.split(".")[0] in sys.argv[2].split(",")
+})
+print(json.dumps({"airflow_import_s": imported - started, "dag_parse_s": parsed - imported, "heavy_imports": heavy}))
+"""
+
+
+def parse_once(dag_file=DAG_FILE):
+    """Parses the DAG file in a fresh interpreter and returns its timings."""
+    result = subprocess.run(
+        [sys.executable, "-c", _PARSE_SNIPPET, dag_file, ",".join(HEAVY_MODULES)],
+        capture_output=True, text=True, env=os.environ.copy()
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Parsing {dag_file} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(runs=5, budget_seconds=PARSE_BUDGET_SECONDS, dag_file=DAG_FILE):
+    """
+    Parses the DAG `runs` times and checks the median against the budget.
+
+    Returns:
+        dict: Median timings, heavy imports found and whether the budget was met.
+    """
+    samples = [parse_once(dag_file) for _ in range(runs)]
+    heavy = sorted({m for s in samples for m in s["heavy_imports"]})
+    report = {
+        "dag_file": dag_file,
+        "runs": runs,
+        "airflow_import_s": statistics.median(s["airflow_import_s"] for s in samples),
+        "dag_parse_s": statistics.median(s["dag_parse_s"] for s in samples),
+        "budget_s": budget_seconds,
+        "heavy_imports": heavy,
+    }
+    report["ok"] = report["dag_parse_s"] <= budget_seconds and not heavy
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DAG parse-time benchmark with a budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=PARSE_BUDGET_SECONDS, help="Max median DAG parse seconds")
+    parser.add_argument("--dag-file", default=DAG_FILE)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs, args.budget, args.dag_file)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"ℹ️  Airflow import (baseline): {report['airflow_import_s'] * 1000:.0f} ms")
+        print(f"ℹ️  DAG file parse (median of {args.runs}): {report['dag_parse_s'] * 1000:.0f} ms "
+              f"(budget {args.budget * 1000:.0f} ms)")
+        if report["heavy_imports"]:
+            print(f"❌ DAG file imports heavy modules at parse time: {', '.join(report['heavy_imports'])}")
+        print("✅ Within budget" if report["ok"] else "❌ Over budget")
+    raise SystemExit(0 if report["ok"] else 1)
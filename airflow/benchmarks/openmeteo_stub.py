@@ -0,0 +1,292 @@
+# benchmarks/openmeteo_stub.py
+# =====================================================
+# Module: openmeteo_stub
+#
+# Local stand-in for the two Open-Meteo endpoints the pipeline calls, so its
+# performance can be measured without touching (or being throttled by) the
+# real API:
+#   GET /v1/search   geocoding: deterministic coordinates derived from the name
+#   GET /v1/archive  archive: synthetic daily and/or hourly series for any
+#                    date range and variable list; comma-separated
+#                    latitude/longitude lists return one result per location
+#                    (as the real multi-location API does)
+#
+# Payloads have the real response shape (metadata envelope + "daily"/"hourly"
+# blocks) and are reproducible: the same request always yields the same body,
+# so the response cache and idempotent inserts behave as in production.
+#
+# Knobs (per server):
+#   latency_ms / jitter_ms  added delay before every response
+#   null_rate               fraction of values returned as null (sparse stations)
+#   error_rate              fraction of requests answered with an error code
+#                           drawn from error_codes (429 carries Retry-After: 0)
+# Malformed requests (missing coordinates, bad dates, unknown variables) get
+# the API's 400 {"error": true, "reason": ...} body.
+#
+# Usage:
+#   server, base_url = start_stub_server(latency_ms=20, null_rate=0.01)
+#   ...  # point WEATHER_API_URL / GEOCODING_API_URL at base_url + "/v1/..."
+#   server.shutdown()
+#   python -m benchmarks.openmeteo_stub --port 8089 --latency-ms 50   # serve until Ctrl-C
+#
+# Dependencies:
+#   - Python standard library only
+# =====================================================
+
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# WMO codes the archive actually emits for daily/hourly weather_code
+WMO_CODES = (0, 1, 2, 3, 45, 51, 53, 55, 61, 63, 65, 71, 73, 75, 80, 81, 95)
+
+# variable -> (unit, generator(base_temp, season, rng)); season is in [-1, 1]
+_DAILY_GENERATORS = {
+    "temperature_2m_max": ("°C", lambda base, season, rng: round(base + 9 * season + 5 + rng.gauss(0, 2.5), 1)),
+    "temperature_2m_min": ("°C", lambda base, season, rng: round(base + 7 * season - 4 + rng.gauss(0, 2.5), 1)),
+    "weather_code": ("wmo code", lambda base, season, rng: rng.choice(WMO_CODES)),
+    "precipitation_sum": ("mm", lambda base, season, rng: round(rng.expovariate(0.3), 1) if rng.random() < 0.3 else 0.0),
+}
+_HOURLY_GENERATORS = {
+    "temperature_2m": ("°C", lambda base, season, rng: round(base + 8 * season + rng.gauss(0, 1.5), 1)),
+    "relative_humidity_2m": ("%", lambda base, season, rng: min(100, max(5, round(70 - 20 * season + rng.gauss(0, 10))))),
+    "precipitation": ("mm", lambda base, season, rng: round(rng.expovariate(2.0), 1) if rng.random() < 0.08 else 0.0),
+    "weather_code": ("wmo code", lambda base, season, rng: rng.choice(WMO_CODES)),
+    "wind_speed_10m": ("km/h", lambda base, season, rng: round(abs(rng.gauss(12, 7)), 1)),
+}
+
+
+class StubRequestError(ValueError):
+    """Malformed request; answered with HTTP 400 like the real API."""
+
+
+def _request_rng(query):
+    """Per-request RNG seeded from the query string: identical requests, identical bodies."""
+    return random.Random(hashlib.sha256(query.encode()).digest())
+
+
+def geocode_payload(params):
+    """Geocoding response: one result whose coordinates are a hash of the name."""
+    name = (params.get("name") or [""])[0]
+    if not name:
+        raise StubRequestError("Parameter 'name' is required")
+    country = (params.get("country") or [""])[0]
+    h = int.from_bytes(hashlib.sha256(f"{name}|{country}".encode()).digest()[:8], "big")
+    latitude = round((h % 140_000) / 1000 - 70, 4)               # -70..70
+    longitude = round((h // 140_000 % 360_000) / 1000 - 180, 4)  # -180..180
+    return {
+        "results": [{
+            "id": h % 10_000_000, "name": name, "latitude": latitude, "longitude": longitude,
+            "country_code": country.upper() or "XX", "timezone": "GMT",
+        }],
+        "generationtime_ms": 0.1,
+    }
+
+
+def _series(latitude, days, steps_per_day, generators, variables, null_rate, rng):
+    """Generates the value lists of one block: `steps_per_day` samples per day ordinal."""
+    base = 22.0 - abs(latitude) * 0.35
+    hemisphere = 1 if latitude >= 0 else -1
+    values = {variable: [] for variable in variables}
+    for day in days:
+        season = hemisphere * math.sin(2 * math.pi * ((day % 365.25) - 105) / 365.25)
+        for step in range(steps_per_day):
+            # Hourly temperatures also follow a daily cycle peaking mid-afternoon
+            diurnal = 0.6 * math.sin(2 * math.pi * (step - 9) / 24) if steps_per_day == 24 else 0.0
+            for variable in variables:
+                if null_rate and rng.random() < null_rate:
+                    values[variable].append(None)
+                else:
+                    values[variable].append(generators[variable][1](base, season + diurnal, rng))
+    return values
+
+
+def _variables(params, key, generators):
+    requested = (params.get(key) or [""])[0]
+    variables = [v for v in requested.split(",") if v]
+    unknown = [v for v in variables if v not in generators]
+    if unknown:
+        raise StubRequestError(f"Cannot initialize WeatherVariable from invalid String value {unknown[0]} for key {key}")
+    return variables
+
+
+def archive_payload(params, null_rate=0.0, query=""):
+    """
+    Archive response for parsed query `params` (dict of lists, as from parse_qs).
+
+    Returns:
+        dict for a single location, list of dicts for several (same order as requested).
+
+    Raises:
+        StubRequestError: On missing/invalid coordinates, dates or variables.
+    """
+    try:
+        latitudes = [float(v) for v in params["latitude"][0].split(",")]
+        longitudes = [float(v) for v in params["longitude"][0].split(",")]
+        start = datetime.date.fromisoformat(params["start_date"][0])
+        end = datetime.date.fromisoformat(params["end_date"][0])
+    except (KeyError, ValueError) as e:
+        raise StubRequestError(f"Invalid or missing parameter: {e}")
+    if len(latitudes) != len(longitudes):
+        raise StubRequestError("Parameter 'latitude' and 'longitude' must have the same number of elements")
+    if end < start:
+        raise StubRequestError("Parameter 'end_date' must be after 'start_date'")
+    daily = _variables(params, "daily", _DAILY_GENERATORS)
+    hourly = _variables(params, "hourly", _HOURLY_GENERATORS)
+    timezones = (params.get("timezone") or ["GMT"])[0].split(",")
+
+    rng = _request_rng(query)
+    days = range(start.toordinal(), end.toordinal() + 1)
+    results = []
+    for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+        result = {
+            "latitude": latitude, "longitude": longitude, "generationtime_ms": 1.0,
+            "utc_offset_seconds": 0, "timezone": timezones[min(i, len(timezones) - 1)],
+            "timezone_abbreviation": "GMT", "elevation": 50.0,
+        }
+        if daily:
+            result["daily_units"] = {"time": "iso8601", **{v: _DAILY_GENERATORS[v][0] for v in daily}}
+            result["daily"] = {
+                "time": [datetime.date.fromordinal(d).isoformat() for d in days],
+                **_series(latitude, days, 1, _DAILY_GENERATORS, daily, null_rate, rng),
+            }
+        if hourly:
+            result["hourly_units"] = {"time": "iso8601", **{v: _HOURLY_GENERATORS[v][0] for v in hourly}}
+            result["hourly"] = {
+                "time": [
+                    f"{datetime.date.fromordinal(d).isoformat()}T{hour:02d}:00"
+                    for d in days for hour in range(24)
+                ],
+                **_series(latitude, days, 24, _HOURLY_GENERATORS, hourly, null_rate, rng),
+            }
+        results.append(result)
+    return results[0] if len(results) == 1 else results
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, so the pooled client session is exercised
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        delay = server.latency_ms + (server.rng_uniform(0, server.jitter_ms) if server.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+        if server.error_rate and server.rng_uniform(0, 1) < server.error_rate:
+            status = server.rng_choice(server.error_codes)
+            server.count(errors_injected=1)
+            headers = {"Retry-After": "0"} if status == 429 else {}
+            return self._send(status, {"error": True, "reason": "Injected failure"}, headers)
+
+        try:
+            if url.path == "/v1/search":
+                payload = geocode_payload(params)
+            elif url.path == "/v1/archive":
+                payload = archive_payload(params, server.null_rate, url.query)
+            else:
+                return self._send(404, {"error": True, "reason": f"Unknown endpoint {url.path}"})
+        except StubRequestError as e:
+            return self._send(400, {"error": True, "reason": str(e)})
+        self._send(200, payload)
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(requests=1, bytes_sent=len(body))
+
+    def log_message(self, format, *args):
+        pass   # one line per request would dominate benchmark output
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms, jitter_ms, null_rate, error_rate, error_codes, seed):
+        super().__init__(address, _StubHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.null_rate = null_rate
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "errors_injected": 0, "bytes_sent": 0}
+
+    def rng_uniform(self, low, high):
+        with self._lock:
+            return self._rng.uniform(low, high)
+
+    def rng_choice(self, options):
+        with self._lock:
+            return self._rng.choice(options)
+
+    def count(self, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.stats[key] += value
+
+    def reset_stats(self):
+        """Returns the counters so far and zeroes them."""
+        with self._lock:
+            stats, self.stats = self.stats, {key: 0 for key in self.stats}
+        return stats
+
+
+def start_stub_server(
+    host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, null_rate=0.0,
+    error_rate=0.0, error_codes=(429, 500, 503), seed=0
+):
+    """
+    Starts the stub in a daemon thread.
+
+    Args:
+        port (int): 0 picks a free port.
+        latency_ms, jitter_ms (float): Fixed + uniformly random delay per response.
+        null_rate (float): Fraction of series values returned as null.
+        error_rate (float): Fraction of requests answered with one of `error_codes`.
+        seed (int): Seed for latency jitter and error injection.
+
+    Returns:
+        tuple: (server, base_url). Call server.shutdown() to stop it; server.stats /
+            server.reset_stats() give request, injected-error and byte counters.
+    """
+    server = _StubServer((host, port), latency_ms, jitter_ms, null_rate, error_rate, error_codes, seed)
+    threading.Thread(target=server.serve_forever, name="openmeteo-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Open-Meteo geocoding + archive stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--null-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        args.host, args.port, args.latency_ms, args.jitter_ms, args.null_rate, args.error_rate, seed=args.seed
+    )
+    print(f"✅ Open-Meteo stub listening on {base_url} (/v1/search, /v1/archive). Ctrl-C to stop.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"ℹ️  Served: {server.stats}")
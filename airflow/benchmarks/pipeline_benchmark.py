@@ -0,0 +1,288 @@
+# benchmarks/pipeline_benchmark.py
+# =====================================================
+# Module: pipeline_benchmark
+#
+# End-to-end throughput / memory benchmark of the ETL stages against the local
+# Open-Meteo stub (benchmarks.openmeteo_stub), at configurable scales
+# ("<cities>x<years>", from 1x1 up to 1000x80).
+#
+# Stages measured per scenario:
+#   fetch              weather_api.fetch_weather_data (geocoding + archive request
+#                      + response cache + Pydantic validation), city by city
+#   validate_pydantic  WeatherResponse.model_validate on the same payloads (in-process)
+#   validate_columnar  columnar_validation.parse_weather_payload on the same payloads
+#   insert             db_loader.insert_weather_data of every fetched response
+#   export             sqlite_utils.export_sqlite_to_csv_with_polars of the whole table
+#   hourly (opt-in)    hourly_weather.load_hourly_weather per city
+#
+# Each scenario runs in a fresh interpreter with a fresh working directory, so
+# the DB, geocode and response caches start cold and ru_maxrss is the peak RSS of
+# that scenario alone. The stub runs in this (parent) process and reports the
+# requests, injected errors and bytes it served. Cities and dates are synthetic
+# and fixed (ranges end 2023-12-31), so results are comparable across changes.
+#
+# Results are written as JSON (default data/benchmarks/pipeline_<UTC time>.json);
+# --compare prints the throughput ratio of each stage against an earlier file.
+#
+# Usage:
+#   PYTHONPATH=airflow python -m benchmarks.pipeline_benchmark
+#   PYTHONPATH=airflow python -m benchmarks.pipeline_benchmark --scales 1x1,100x20,1000x80 --latency-ms 30
+#   PYTHONPATH=airflow python -m benchmarks.pipeline_benchmark --null-rate 0.02 --error-rate 0.01 \
+#       --compare data/benchmarks/pipeline_20250101T000000Z.json
+# =====================================================
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from benchmarks.openmeteo_stub import start_stub_server
+
+AIRFLOW_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SCALES = ("1x1", "10x10", "100x20")
+RESULTS_DIR = "data/benchmarks"
+BENCH_END_DATE = "2023-12-31"
+BENCH_COUNTRY = "XX"
+BENCH_TIMEZONE = "GMT"
+
+
+def parse_scale(scale):
+    """'100x20' -> (100 cities, 20 years)."""
+    cities, years = scale.lower().split("x")
+    return int(cities), int(years)
+
+
+def _bench_dates(years):
+    end = datetime.date.fromisoformat(BENCH_END_DATE)
+    return f"{end.year - years + 1}-01-01", BENCH_END_DATE
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 1) if seconds > 0 else None
+
+
+def _peak_rss_mb():
+    import resource
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_worker(stub_url, n_cities, years, hourly=False, rate_limit=None):
+    """
+    Runs one scenario in the current process and working directory (the parent
+    starts it in a fresh interpreter and temp dir).
+
+    Returns:
+        dict: Per-stage seconds, counts, throughput and peak RSS.
+    """
+    import time
+    from urllib.parse import parse_qs, urlencode
+    from benchmarks.openmeteo_stub import archive_payload
+    import helpers.geocode_utils as geocode_utils
+    from helpers.http_client import configure_rate_limiter
+    from helpers.columnar_validation import parse_weather_payload
+    from helpers.city_utils import make_location_key
+    from helpers.db_utils import create_weather_table
+    from helpers.db_loader import insert_weather_data
+    from helpers.schemas import WeatherResponse
+    from helpers.sqlite_utils import export_sqlite_to_csv_with_polars
+    from helpers.weather_api import fetch_weather_data
+    from config.constants import DB_PATH, DAILY_VARIABLES
+
+    archive_url = f"{stub_url}/v1/archive"
+    geocode_utils.GEOCODING_API_URL = f"{stub_url}/v1/search"
+    if rate_limit is None:
+        configure_rate_limiter(1e9, 10 ** 9)   # measure the pipeline, not the API quota pacing
+    else:
+        configure_rate_limiter(rate_limit, max(1, int(rate_limit)))
+
+    start_date, end_date = _bench_dates(years)
+    create_weather_table(DB_PATH)
+    timings = {stage: 0.0 for stage in ("fetch", "validate_pydantic", "validate_columnar", "insert")}
+    fetched_rows = inserted = failed = 0
+
+    for i in range(n_cities):
+        city_name = f"Benchville{i:04d}"
+        location = make_location_key(city_name, BENCH_COUNTRY)
+
+        started = time.perf_counter()
+        response = fetch_weather_data(
+            city_name, BENCH_COUNTRY, archive_url, start_date, end_date, DAILY_VARIABLES, BENCH_TIMEZONE
+        )
+        timings["fetch"] += time.perf_counter() - started
+        if response is None:
+            failed += 1
+            continue
+        fetched_rows += len(response.daily.time)
+
+        # Same payload shape, generated in-process so only validation is timed
+        query = urlencode({
+            "latitude": response.latitude, "longitude": response.longitude, "start_date": start_date,
+            "end_date": end_date, "daily": ",".join(DAILY_VARIABLES), "timezone": BENCH_TIMEZONE,
+        })
+        payload = archive_payload(parse_qs(query), query=query)
+        started = time.perf_counter()
+        WeatherResponse.model_validate(payload)
+        timings["validate_pydantic"] += time.perf_counter() - started
+        started = time.perf_counter()
+        parse_weather_payload(payload)
+        timings["validate_columnar"] += time.perf_counter() - started
+        del payload
+
+        started = time.perf_counter()
+        inserted += insert_weather_data(DB_PATH, response, location)
+        timings["insert"] += time.perf_counter() - started
+    ingest_rss = _peak_rss_mb()
+
+    output_csv = "data/exported_csvs/benchmark_export.csv"
+    started = time.perf_counter()
+    export_sqlite_to_csv_with_polars(DB_PATH, output_csv=output_csv, sample_lines=0, overwrite=True)
+    export_seconds = time.perf_counter() - started
+    export_bytes = os.path.getsize(output_csv) if os.path.exists(output_csv) else 0
+
+    stages = {
+        "fetch": {"seconds": timings["fetch"], "cities": n_cities - failed, "rows": fetched_rows,
+                  "cities_per_s": _rate(n_cities - failed, timings["fetch"]),
+                  "rows_per_s": _rate(fetched_rows, timings["fetch"])},
+        "validate_pydantic": {"seconds": timings["validate_pydantic"], "rows": fetched_rows,
+                              "rows_per_s": _rate(fetched_rows, timings["validate_pydantic"])},
+        "validate_columnar": {"seconds": timings["validate_columnar"], "rows": fetched_rows,
+                              "rows_per_s": _rate(fetched_rows, timings["validate_columnar"])},
+        "insert": {"seconds": timings["insert"], "rows": inserted,
+                   "rows_per_s": _rate(inserted, timings["insert"])},
+        "export": {"seconds": export_seconds, "rows": inserted, "bytes": export_bytes,
+                   "rows_per_s": _rate(inserted, export_seconds)},
+    }
+    peak_rss = {"after_ingest_mb": ingest_rss, "after_export_mb": _peak_rss_mb()}
+
+    if hourly:
+        from helpers.hourly_weather import load_hourly_weather
+        started = time.perf_counter()
+        hourly_rows = sum(
+            load_hourly_weather(DB_PATH, f"Benchville{i:04d}", BENCH_COUNTRY, start_date, end_date,
+                                weather_api_url=archive_url)
+            for i in range(n_cities)
+        )
+        hourly_seconds = time.perf_counter() - started
+        stages["hourly"] = {"seconds": hourly_seconds, "rows": hourly_rows,
+                            "rows_per_s": _rate(hourly_rows, hourly_seconds)}
+        peak_rss["after_hourly_mb"] = _peak_rss_mb()
+
+    for stage in stages.values():
+        stage["seconds"] = round(stage["seconds"], 4)
+    return {"stages": stages, "failed_cities": failed, "peak_rss": peak_rss}
+
+
+def run_scenario(server, stub_url, scale, hourly=False, rate_limit=None, verbose=False):
+    """Runs one scale in a fresh interpreter and temp working directory; returns its result dict."""
+    n_cities, years = parse_scale(scale)
+    command = [sys.executable, "-m", "benchmarks.pipeline_benchmark", "--worker",
+               "--stub-url", stub_url, "--scales", scale]
+    if hourly:
+        command.append("--hourly")
+    if rate_limit is not None:
+        command += ["--rate-limit", str(rate_limit)]
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [AIRFLOW_ROOT, os.environ.get("PYTHONPATH")]))}
+
+    server.reset_stats()
+    with tempfile.TemporaryDirectory(prefix="weather_bench_") as workdir:
+        result = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    if verbose or result.returncode != 0:
+        print(result.stdout, end="")
+        print(result.stderr, end="", file=sys.stderr)
+    if result.returncode != 0:
+        raise RuntimeError(f"Scenario {scale} failed (exit {result.returncode})")
+
+    scenario = json.loads(result.stdout.strip().splitlines()[-1])
+    return {"scale": scale, "cities": n_cities, "years": years, **scenario, "stub": server.reset_stats()}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=AIRFLOW_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare_results(current, previous):
+    """Prints rows/s of each (scale, stage) as a ratio to an earlier results file."""
+    earlier = {
+        (s["scale"], stage): values.get("rows_per_s")
+        for s in previous["scenarios"] for stage, values in s["stages"].items()
+    }
+    print(f"ℹ️  Compared with {previous.get('git_commit')} ({previous.get('created_at')}):")
+    for scenario in current["scenarios"]:
+        for stage, values in scenario["stages"].items():
+            before, now = earlier.get((scenario["scale"], stage)), values.get("rows_per_s")
+            if before and now:
+                print(f"   {scenario['scale']:>8} {stage:<18} {now / before:6.2f}x  ({before:,.0f} -> {now:,.0f} rows/s)")
+
+
+def _print_scenario(scenario):
+    print(f"✅ {scenario['scale']} ({scenario['cities']} cities x {scenario['years']} years): "
+          f"peak RSS {scenario['peak_rss']['after_export_mb']:.0f} MB, "
+          f"{scenario['stub']['requests']} requests, {scenario['stub']['bytes_sent'] / 1e6:.1f} MB served, "
+          f"{scenario['stub']['errors_injected']} injected errors, {scenario['failed_cities']} failed cities")
+    for stage, values in scenario["stages"].items():
+        rate = f"{values['rows_per_s']:,.0f} rows/s" if values.get("rows_per_s") else "-"
+        print(f"   {stage:<18} {values['seconds']:9.3f} s  {rate}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ETL stage benchmarks against a local Open-Meteo stub")
+    parser.add_argument("--scales", default=",".join(DEFAULT_SCALES), help="Comma-separated <cities>x<years>")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stub delay per response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--null-rate", type=float, default=0.0, help="Fraction of null values in payloads")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests failing with 429/5xx")
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="Client requests/s (default: unlimited, i.e. no API quota pacing)")
+    parser.add_argument("--hourly", action="store_true", help="Also benchmark hourly ingestion")
+    parser.add_argument("--output", help="Results JSON path (default data/benchmarks/pipeline_<UTC time>.json)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare throughput against")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        n_cities, years = parse_scale(args.scales)
+        print(json.dumps(run_worker(args.stub_url, n_cities, years, args.hourly, args.rate_limit)))
+        raise SystemExit(0)
+
+    server, stub_url = start_stub_server(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, null_rate=args.null_rate, error_rate=args.error_rate
+    )
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    report = {
+        "created_at": started_at.isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "stub": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                 "null_rate": args.null_rate, "error_rate": args.error_rate},
+        "rate_limit": args.rate_limit,
+        "scenarios": [],
+    }
+    try:
+        for scale in args.scales.split(","):
+            scenario = run_scenario(server, stub_url, scale.strip(), args.hourly, args.rate_limit, args.verbose)
+            _print_scenario(scenario)
+            report["scenarios"].append(scenario)
+    finally:
+        server.shutdown()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline_{started_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(report, json.load(f))
@@ -0,0 +1,133 @@
+# benchmarks/shard_write_benchmark.py
+# =====================================================
+# Module: shard_write_benchmark
+#
+# Write throughput of concurrent loaders against the single-file database and
+# sharded layouts (helpers.shards).
+#
+# Each scenario creates a fresh store with the given shard count, then starts
+# `--writers` processes that load disjoint sets of synthetic cities through
+# db_loader.insert_weather_frame (the DAG's mapped insert path: routed, idempotent,
+# summary + coverage upkeep). Frames are built before a start barrier, so the clock
+# covers the loads only. With one file every commit waits on the same database lock;
+# with shards, writers whose cities hash to different shards commit concurrently,
+# so throughput is bounded by cores/disk instead of by that lock.
+#
+# After each scenario the unified read view (shards.map_shards) must return every
+# row, and the yearly summary must match a full recompute on every shard.
+#
+# Usage:
+#   PYTHONPATH=airflow python -m benchmarks.shard_write_benchmark
+#   PYTHONPATH=airflow python -m benchmarks.shard_write_benchmark --shards 1,4,8 --writers 8 \
+#       --cities 64 --years 20
+# =====================================================
+
+import argparse
+import contextlib
+import datetime
+import io
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+BENCH_END_DATE = "2023-12-31"
+
+
+def _city_frame(index, years):
+    """Deterministic weather_daily-shaped frame for synthetic city `index`."""
+    import polars as pl
+
+    end = datetime.date.fromisoformat(BENCH_END_DATE)
+    dates = pl.date_range(datetime.date(end.year - years + 1, 1, 1), end, "1d", eager=True)
+    day = pl.int_range(len(dates), eager=True)
+    return pl.DataFrame({
+        "date": dates.dt.strftime("%Y-%m-%d"),
+        "temp_max": ((day * 7 + index * 13) % 300 / 10.0).cast(pl.Float64),
+        "temp_min": ((day * 5 + index * 11) % 200 / 10.0 - 5.0).cast(pl.Float64),
+        "weather_code": ((day + index) % 4).cast(pl.Int64),
+    })
+
+
+def _writer(db_path, city_indices, years, barrier, results, verbose):
+    from helpers.db_loader import insert_weather_frame
+
+    frames = [(f"Shardville{i:04d},XX", _city_frame(i, years)) for i in city_indices]
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    barrier.wait()
+    with output:
+        rows = sum(insert_weather_frame(db_path, frame, location) for location, frame in frames)
+    results.put(rows)
+
+
+def run_scenario(shards, writers, n_cities, years, verbose=False):
+    """
+    Loads n_cities x years of daily rows with `writers` concurrent processes.
+
+    Returns:
+        dict: shards, writers, rows, seconds (wall clock from the start barrier to the
+            last writer), rows_per_s, summary_ok.
+    """
+    from helpers.db_utils import create_weather_table
+    from helpers.shards import map_shards
+    from helpers.yearly_summary import verify_yearly_summary
+    from config.constants import TABLE_NAME
+
+    ctx = multiprocessing.get_context("spawn")   # no fork of a process that already loaded Polars
+    with tempfile.TemporaryDirectory(prefix="weather_shards_bench_") as tmp:
+        db_path = os.path.join(tmp, "weather.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            create_weather_table(db_path, shards=shards)
+
+        barrier, results = ctx.Barrier(writers + 1), ctx.Queue()
+        processes = [
+            ctx.Process(target=_writer, args=(db_path, list(range(w, n_cities, writers)), years,
+                                              barrier, results, verbose))
+            for w in range(writers)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        started = time.perf_counter()
+        inserted = sum(results.get() for _ in processes)
+        seconds = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+        def count(path):
+            with sqlite3.connect(path) as conn:
+                return conn.execute(f"SELECT COUNT(*) FROM {TABLE_NAME}").fetchone()[0]
+
+        stored = sum(map_shards(db_path, count))
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary_ok = verify_yearly_summary(db_path)
+
+    if stored != inserted:
+        raise AssertionError(f"Read view returned {stored} rows, writers inserted {inserted}")
+    return {
+        "shards": shards, "writers": writers, "rows": inserted, "seconds": round(seconds, 3),
+        "rows_per_s": round(inserted / seconds, 1) if seconds > 0 else None, "summary_ok": summary_ok,
+    }
+
+
+if __name__ == "__main__":
+    from config.constants import INSERT_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(description="Concurrent write throughput: single file vs shards")
+    parser.add_argument("--shards", default="1,4", help="Comma-separated shard counts (1 = single file)")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent writer processes")
+    parser.add_argument("--cities", type=int, default=32)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--verbose", action="store_true", help="Show the loaders' own output")
+    args = parser.parse_args()
+
+    print(f"ℹ️  {args.writers} writers, {args.cities} cities x {args.years} years, "
+          f"{INSERT_BATCH_SIZE} rows per transaction, {os.cpu_count()} CPU(s)")
+    baseline = None
+    for shards in (int(s) for s in args.shards.split(",")):
+        result = run_scenario(shards, args.writers, args.cities, args.years, args.verbose)
+        baseline = baseline or result["rows_per_s"]
+        print(f"{'✅' if result['summary_ok'] else '❌'} {shards:>3} shard(s): {result['rows']:,} rows in "
+              f"{result['seconds']:.2f} s = {result['rows_per_s']:,.0f} rows/s "
+              f"(x{result['rows_per_s'] / baseline:.2f} vs first)")
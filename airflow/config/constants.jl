@@ -1,6 +1,6 @@
 module Constants
 
-export LOCATION_TO_CONFIG, CONFIG_DIR, DATA_DIR, WEATHERCODE_LOOKUP, EXPORTED_CSV_DIR, SUMMARY_CSV_NAME, EXPORTED_CSV_PATH, MANIFESTS_DIR, WEATHER_SUMMARY_CSV_MANIFEST
+export LOCATION_TO_CONFIG, CONFIG_DIR, DATA_DIR, WEATHERCODE_LOOKUP, EXPORTED_CSV_DIR, SUMMARY_CSV_NAME, EXPORTED_CSV_PATH, MANIFESTS_DIR, WEATHER_SUMMARY_CSV_MANIFEST, WEATHER_PARQUET_MANIFEST
 
 const CONFIG_DIR = "config"
 const DATA_DIR = "data"
@@ -52,6 +52,11 @@ MANIFESTS_DIR:
     - Project-level directory (outside data/), dedicated to manifest files for workflow automation and handoff across scripts/languages.
     - Keeps manifest pointers organized, discoverable, and decoupled from data outputs.
 
+WEATHER_PARQUET_MANIFEST:
+    - Path to the JSON manifest written by the Python partitioned Parquet export
+      (helpers/sqlite_utils.export_sqlite_to_parquet_partitions).
+    - Lists every partition (location, year, path, rows) so readers can load only what they need.
+
 WEATHER_SUMMARY_CSV_MANIFEST:
     - Path to manifest file indicating the latest summary CSV export.
     - Always write/export this manifest immediately after each new summary CSV is generated.
@@ -69,5 +74,6 @@ const EXPORTED_CSV_PATH = joinpath(EXPORTED_CSV_DIR, SUMMARY_CSV_NAME)
 
 const MANIFESTS_DIR = joinpath(@__DIR__, "..", "..", "manifests")
 const WEATHER_SUMMARY_CSV_MANIFEST = joinpath(MANIFESTS_DIR, "latest_weather_summary_csv_path.txt")
+const WEATHER_PARQUET_MANIFEST = joinpath(MANIFESTS_DIR, "weather_parquet_manifest.json")
 
 end # module
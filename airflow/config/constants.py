@@ -10,17 +10,95 @@ CITY_NAME = "Lisbon"         # Main city for weather data extraction
 COUNTRY = "PT"               # Country code (ISO Alpha-2 format)
 TIMEZONE = "Europe/Lisbon"   # Target timezone for API queries
 
+# --- Multi-city fan-out ---
+# One row per city (header: city_name,country,timezone). Each row becomes its own
+# mapped fetch/insert task in the DAG. Falls back to CITY_NAME/COUNTRY if missing.
+CITIES_CSV_PATH = "airflow/config/cities.csv"
+# Timezone for rows without one: the API resolves each city's local timezone from its
+# coordinates, so daily aggregates follow the city's own day boundaries
+CITY_DEFAULT_TIMEZONE = "auto"
+
 # --- API endpoints ----
 GEOCODING_API_URL = "https://geocoding-api.open-meteo.com/v1/search"   # URL for geocoding requests (lat/lon)
 WEATHER_API_URL = "https://archive-api.open-meteo.com/v1/archive"      # Weather API endpoint for historical data
 
+# --- Shared HTTP client (geocoding + archive requests) ---
+HTTP_POOL_MAXSIZE = 32             # Keep-alive connections kept per host
+HTTP_MAX_RETRIES = 5               # Retries on 429/5xx responses and connection errors
+HTTP_BACKOFF_BASE_SECONDS = 0.5    # First backoff; doubles on each retry (full jitter applied)
+HTTP_BACKOFF_MAX_SECONDS = 30.0    # Upper bound for a single backoff sleep
+HTTP_RATE_LIMIT_PER_SECOND = 10.0  # Token-bucket refill rate (Open-Meteo free tier: 600 calls/min)
+HTTP_RATE_LIMIT_BURST = 10         # Token-bucket capacity (max back-to-back requests)
+
+# --- Geocode cache ---
+# Coordinates are cached in their own SQLite file (keyed on city_name + country)
+# with an in-process LRU in front, so geocoding is a network hop only on first use.
+GEOCODE_CACHE_DB_PATH = "data/geocode_cache.db"
+GEOCODE_CACHE_TTL_SECONDS = None   # None = cached coordinates never expire
+GEOCODE_CACHE_LRU_SIZE = 1024      # Max entries held in the in-process LRU
+
+# --- Geocoder backend ---
+# API: Open-Meteo geocoding (behind the geocode cache). GAZETTEER: offline lookups in a
+# memory-mapped index built from a local GeoNames dump (helpers/gazetteer.py), no HTTP at all.
+API = "api"
+GAZETTEER = "gazetteer"
+GEOCODER_BACKEND = API                              # Choose backend (API/GAZETTEER)
+GAZETTEER_DUMP_PATH = "data/gazetteer/cities500.txt"   # GeoNames dump (download.geonames.org/export/dump)
+GAZETTEER_INDEX_PATH = "data/gazetteer/cities500.idx"  # Built from the dump on first use / when the dump is newer
+GAZETTEER_API_FALLBACK = False                      # GAZETTEER: fall back to the API for names not in the dump
+
+# --- Archive response cache ---
+# Raw archive responses, zstd-compressed and stored by content hash, with a SQLite
+# index keyed on the request (lat, lon, dates, variables, timezone). Ranges ending
+# before today - ARCHIVE_LAG_DAYS never change and never expire.
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_DIR = "data/response_cache"
+RESPONSE_CACHE_RECENT_TTL_SECONDS = 6 * 3600   # TTL for ranges that may still be revised
+RESPONSE_CACHE_MAX_BYTES = 2 * 1024 ** 3       # Compressed size cap; least recently used evicted first
+
 # --- SQLite and Export Config ---
 DB_PATH = "data/weather.db"
 TABLE_NAME = "weather_daily"
-EXPORT_QUERY = f"SELECT * FROM {TABLE_NAME}"
+DERIVED_TABLE_NAME = "weather_daily_derived"   # Rolling means / normals / anomalies per (location, date)
+CLIMATOLOGY_TABLE_NAME = "weather_climatology" # Day-of-year normals per location
+# Explicit columns: `id` is numbered per shard file (AUTOINCREMENT), so it repeats across shards
+EXPORT_QUERY = f"SELECT location, date, temp_max, temp_min, weather_code FROM {TABLE_NAME}"
 EXPORT_CSV_DIR = "data/exported_csvs"
 EXPORT_CSV_FILENAME = "weather_export_test.csv"
 EXPORT_CSV = f"{EXPORT_CSV_DIR}/{EXPORT_CSV_FILENAME}"
+STAGING_DIR = "data/staging"   # Parquet hand-off files between DAG fetch and insert tasks
+
+# Partitioned Parquet export (location=<key>/year=<YYYY>/part.parquet) + JSON manifest
+EXPORT_FORMATS = ["csv", "parquet"]   # Formats written by the DAG export task
+EXPORT_PARQUET_DIR = "data/exported_parquet"
+EXPORT_PARQUET_MANIFEST = "manifests/weather_parquet_manifest.json"
+EXPORT_BATCH_SIZE = 100000            # Rows fetched from SQLite per streaming batch
+
+# --- Derived metrics (helpers/derived_metrics.py) ---
+# Day-of-year normals over a fixed baseline period, trailing 7/30-day means and
+# anomalies vs normal, precomputed per (location, date) after each load. A fixed
+# baseline keeps normals (and so stored anomalies) stable as new days arrive.
+CLIMATOLOGY_BASELINE_START_YEAR = 1991   # WMO standard normals period 1991-2020
+CLIMATOLOGY_BASELINE_END_YEAR = 2020
+
+# --- Sharded storage (helpers/shards.py) ---
+# DB_SHARDS > 1 splits the weather tables across DB_SHARDS SQLite files under
+# <DB_PATH without .db>_shards/, routed by a stable hash of the location key. Each shard
+# has its own write lock, so loads of different cities commit concurrently. Only shapes
+# new stores: an existing layout is used as found (move an existing single file with
+# `python -m helpers.shards split`).
+DB_SHARDS = 1                          # 1 = everything in the single DB_PATH file
+
+# --- SQLite tuning (applied to every loader connection) ---
+SQLITE_BUSY_TIMEOUT_SECONDS = 30       # Wait this long for a competing writer before failing
+SQLITE_SYNCHRONOUS = "NORMAL"          # Safe with WAL: fsync at checkpoints, not on every commit
+SQLITE_CACHE_SIZE_KB = 65536           # Page cache per connection (64 MB)
+SQLITE_MMAP_SIZE_BYTES = 268435456     # Memory-map up to 256 MB of the DB file for reads
+INSERT_BATCH_SIZE = 50000              # Rows per transaction for bulk loads
+
+# --- Read-side queries (helpers/queries.py, dashboards) ---
+QUERY_POOL_SIZE = 4        # Read-only connections kept open per database
+QUERY_CACHE_SIZE = 256     # Query results kept in the LRU (invalidated by the loader's watermark)
 
 
 # --- Weather data configuration ---
@@ -30,6 +108,22 @@ DAILY_VARIABLES = [
     "weather_code",        # WMO code for main daily weather type
 ]
 
+# --- Hourly ingestion (helpers/hourly_weather.py) ---
+HOURLY_TABLE_NAME = "weather_hourly"
+HOURLY_VARIABLES = [
+    "temperature_2m",        # Air temp (°C) at 2 meters above ground
+    "relative_humidity_2m",  # Relative humidity (%) at 2 meters
+    "precipitation",         # Total precipitation (mm) for the preceding hour
+    "weather_code",          # WMO code for the hour
+    "wind_speed_10m",        # Wind speed (km/h) at 10 meters
+]
+HOURLY_BATCH_SIZE = 10000    # Rows parsed, validated and committed per batch (bounds peak memory)
+
+# --- Validation mode ---
+PYDANTIC = "pydantic"       # Validate every series element through the Pydantic models
+COLUMNAR = "columnar"       # Vectorized Polars checks; Pydantic only for the metadata envelope
+VALIDATION_MODE = COLUMNAR  # Choose mode (PYDANTIC/COLUMNAR) for the DAG fetch path
+
 # --- Year range and fetch direction ---
 FORWARD = "forward"         # Fetch data starting from START_YEAR
 BACKWARD = "backward"       # Fetch data going backward from START_YEAR
@@ -38,12 +132,84 @@ DIRECTION = FORWARD         # Choose direction (FORWARD/BACKWARD) for current ex
 START_YEAR = 2015           # Anchor year (starting point for data retrieval)
 NUM_YEARS = 5               # Number of years to include (from anchor)
 
+# --- Fetch mode ---
+FULL = "full"               # Re-fetch the whole configured interval every run
+INCREMENTAL = "incremental" # Fetch only dates after each city's latest stored date (full on first load)
+GAPS = "gaps"               # Fetch every missing date in the interval (coverage index, helpers/coverage.py)
+FETCH_MODE = INCREMENTAL    # Choose mode (FULL/INCREMENTAL/GAPS) for current execution
+ARCHIVE_LAG_DAYS = 5        # Archive API publishes with a few days' delay; incremental fetches stop here
+BACKFILL_BRIDGE_DAYS = 30   # GAPS: holes separated by at most this many stored days are fetched as one range
+
+# --- Chunked fetching (deep backfills) ---
+FETCH_CHUNK_YEARS = 10      # Calendar years per archive request (1 = yearly chunks, 10 = decade chunks)
+FETCH_CHUNK_WORKERS = 4     # Chunks fetched concurrently for one city
+FETCH_CHUNK_RETRIES = 2     # Extra attempts for a single failed chunk (on top of HTTP retries)
+WEATHER_API_BATCH_SIZE = 50 # Locations per multi-location archive request (comma-separated lat/lon)
+
+# --- Standalone pipeline runner (helpers/pipeline_runner.py, outside Airflow) ---
+PIPELINE_FETCH_CONCURRENCY = 8   # Archive requests in flight at once (still paced by the HTTP rate limiter)
+PIPELINE_VALIDATE_WORKERS = 4    # Threads validating fetched payloads
+PIPELINE_QUEUE_SIZE = 16         # Max payloads/frames waiting between stages (backpressure)
+PIPELINE_PROGRESS_SECONDS = 5.0  # Interval between progress reports
+
+# --- Metrics (helpers/metrics.py) ---
+# Request latency, bytes, validation time, rows inserted/ignored, transaction and export
+# timings. Disabled, every metrics call returns immediately.
+JSON_LOG = "json_log"                        # One JSON line per flush (a full snapshot)
+PROMETHEUS_TEXTFILE = "prometheus_textfile"  # *.prom files for node_exporter's textfile collector
+AIRFLOW_XCOM = "airflow_xcom"                # Snapshot pushed as the task's "metrics" XCom
+METRICS_ENABLED = False                      # Turn instrumentation on/off
+METRICS_SINKS = [JSON_LOG, PROMETHEUS_TEXTFILE, AIRFLOW_XCOM]   # Sinks written on each flush
+METRICS_JSON_LOG_PATH = "data/metrics/metrics.jsonl"
+METRICS_PROMETHEUS_DIR = "data/metrics/textfile"   # One <job>.prom file per task/job
+
 
 # config/constants.py
 REPO_ROOT = "/workspaces/multiLanguage-weather-etl"
 JULIA_SUMMARY_SCRIPT_PATH = f"{REPO_ROOT}/airflow/analysis_jl/analysis.jl"
 R_ANIMATION_SCRIPT_PATH = f"{REPO_ROOT}/airflow/visualizations/yearly_weather_trends.R"
 
+# --- Yearly summary stage ---
+JULIA = "julia"             # Run analysis_jl/analysis.jl in a fresh Julia process
+JULIA_WORKER = "julia_worker"   # Run analysis.jl's main() in a warm, long-lived Julia worker
+POLARS = "polars"           # Run helpers/weather_summary.py (same output, no Julia startup/JIT)
+SUMMARY_ENGINE = POLARS     # Choose engine (JULIA/JULIA_WORKER/POLARS) for the DAG summary step
+
+# --- Warm Julia summary worker (helpers/julia_worker.py, SUMMARY_ENGINE = JULIA_WORKER) ---
+# One Julia process loads analysis.jl once and serves runs over a localhost socket,
+# so package loading and JIT are paid once per worker instead of once per DAG run.
+JULIA_EXECUTABLE = "julia"
+JULIA_WORKER_SCRIPT_PATH = f"{REPO_ROOT}/airflow/analysis_jl/summary_worker.jl"
+JULIA_SYSIMAGE_PATH = None            # Optional PackageCompiler sysimage (faster cold start)
+JULIA_WORKER_STATE_DIR = "data/julia_worker"   # Port/pid state, lock and worker log
+JULIA_WORKER_STARTUP_TIMEOUT_SECONDS = 600.0   # First start may precompile packages
+JULIA_WORKER_PING_TIMEOUT_SECONDS = 5.0        # Health check budget
+JULIA_WORKER_RUN_TIMEOUT_SECONDS = 1800.0      # Max duration of one summary run
+JULIA_WORKER_MAX_RESTARTS = 1         # Restarts per run after the worker dies or hangs
+
+# Outputs shared by both engines (same paths as config/constants.jl)
+SUMMARY_CSV_PATH = "data/exported_csvs/weather_summary_for_r.csv"
+WEATHER_SUMMARY_CSV_MANIFEST = "manifests/latest_weather_summary_csv_path.txt"
+
+# --- Render skipping ---
+SKIP_UNCHANGED_RENDER = True    # Skip summary + R animation when the export fingerprint is unchanged
+FINGERPRINT_STATE_PATH = "manifests/last_render_fingerprint.json"  # Fingerprint of the last successful render
+
+# WMO weather code -> UI-friendly description (ported from constants.jl WEATHERCODE_LOOKUP;
+# keep both in sync). Codes not listed map to "Unknown".
+WEATHERCODE_LOOKUP = {
+    0: "Clear",
+    1: "Partly cloudy",
+    2: "Cloudy",
+    3: "Overcast/Rain",
+    51: "Light Drizzle",
+    53: "Moderate Drizzle",
+    55: "Heavy Drizzle",
+    61: "Light Rain",
+    63: "Moderate Rain",
+    65: "Heavy Rain",
+}
+
 
 # ------------------------------------------
 # End of configuration
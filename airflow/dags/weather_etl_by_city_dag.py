@@ -1,16 +1,14 @@
-# Project constants and ETL/helper imports
+# Project constants (plain values, cheap to import).
+# ETL helpers pull in polars/pydantic/requests, so they are imported inside the
+# task bodies: the scheduler re-parses this file constantly and only needs the
+# DAG structure (see benchmarks/dag_parse_benchmark.py for the parse-time budget).
 from config.constants import (
-    DB_PATH, CITY_NAME, COUNTRY, WEATHER_API_URL,
-    START_YEAR, NUM_YEARS, DIRECTION, DAILY_VARIABLES,
-    JULIA_SUMMARY_SCRIPT_PATH, R_ANIMATION_SCRIPT_PATH, REPO_ROOT
+    DB_PATH, DB_SHARDS, CITIES_CSV_PATH, WEATHER_API_URL,
+    START_YEAR, NUM_YEARS, DIRECTION, DAILY_VARIABLES, FETCH_MODE, INCREMENTAL, GAPS,
+    VALIDATION_MODE, COLUMNAR, EXPORT_FORMATS,
+    JULIA_SUMMARY_SCRIPT_PATH, R_ANIMATION_SCRIPT_PATH, REPO_ROOT,
+    SUMMARY_ENGINE, POLARS, JULIA_WORKER, SKIP_UNCHANGED_RENDER
 )
-from helpers.db_utils import create_weather_table
-from helpers.db_loader import insert_weather_data
-from helpers.weather_api import fetch_weather_data
-from helpers.date_utils import get_interval_start_to_end_dates
-from helpers.sqlite_utils import export_sqlite_to_csv_with_polars
-# Import Pydantic Schema for reconstruction
-from helpers.schemas import WeatherResponse
 
 from airflow.decorators import dag, task
 from airflow.operators.bash import BashOperator
@@ -26,13 +24,30 @@ Weather ETL Full Pipeline DAG
 
 DAG Tasks:
     1. Create weather DB table if missing
-    2. Prepare date ranges for API
-    3. Fetch weather data (external API)
-    4. Insert data into DB
-    5. Export DB to CSV
-    6. Run Julia summary script
-    7. Run R animation (animated summary MP4)
+    2. Load the city list (config/cities.csv) and plan each city's date range for API
+       (INCREMENTAL mode: only dates after the city's latest stored date;
+        GAPS mode: every missing date in the interval, from the coverage index)
+    3. Fetch weather data (external API) and stage it as Parquet - one mapped task per city
+    4. Insert staged data into DB - one mapped task per city; then, once for all cities,
+       update the precomputed climatology / rolling-window table for the inserted dates
+       (helpers/derived_metrics.py; runs alongside steps 5-8)
+    5. Export DB to CSV and/or partitioned Parquet (+ manifest) and fingerprint the export
+    6. Skip steps 7-8 if the fingerprint matches the last successful render (ShortCircuit)
+    7. Run yearly summary per SUMMARY_ENGINE: Julia script (fresh process or warm
+       long-lived worker), or the equivalent Polars engine
+    8. Run R animation (animated summary MP4), then record the rendered fingerprint
 All steps are atomic and reusable, for modular pipeline development.
+With METRICS_ENABLED, the Python tasks record per-stage metrics (helpers/metrics.py)
+and flush them to the configured sinks when they finish.
+Steps 3-4 fan out with dynamic task mapping (.expand), so wall-clock time scales
+with the number of Airflow workers rather than the number of cities; steps 5-8
+run once for all cities. With DB_SHARDS > 1 (helpers/shards.py) each city's rows
+live in its shard's file and up to DB_SHARDS mapped inserts run at once, so cities
+on different shards commit in parallel instead of queueing on a single write lock.
+A city whose fetch or insert fails does not block the others: the inserts, export
+and derived metrics run once the mapped tasks are done (trigger_rule="all_done"),
+and a final check task then fails the DAG run so the failed cities are not hidden.
+A failed fetch stages nothing, so the city's range is planned again on the next run.
 """
 
 @dag(
@@ -46,87 +61,252 @@ def weather_etl_full_pipeline_dag():
     # 1. Create weather table (idempotent)
     @task()
     def t_create_weather_table():
-        """Ensure database table for weather data exists (creates if missing)"""
+        """
+        Ensure database table for weather data exists (creates if missing).
+        Fails if the store's shard count differs from DB_SHARDS: the insert concurrency
+        limit is fixed from DB_SHARDS when the DAG is parsed.
+        """
+        from helpers.db_utils import create_weather_table
+        from helpers.shards import shard_count
+
         create_weather_table(DB_PATH)
         print(f"Ensured weather table exists at {DB_PATH}")
+        shards = shard_count(DB_PATH)
+        if shards != DB_SHARDS:
+            raise RuntimeError(
+                f"{DB_PATH} has {shards} shard(s) but DB_SHARDS is {DB_SHARDS}; set DB_SHARDS "
+                f"to {shards} so at most one insert per shard runs at a time"
+            )
 
-    # 2. Prepare date range for API request
+    # 2. Load city list and plan a date range per city
     @task()
-    def t_prepare_date_range():
-        """Compute start/end dates for API query given config constants"""
-        start_date, end_date = get_interval_start_to_end_dates(START_YEAR, NUM_YEARS, DIRECTION)
-        print(f"Date range: {start_date} to {end_date}")
-        return {"start_date": start_date, "end_date": end_date}
+    def t_plan_date_ranges():
+        """
+        Read the configured city list and compute each city's start/end dates for the API query.
+        In INCREMENTAL mode a city's range starts after its high-water mark (latest stored date),
+        and cities that are already up to date are left out. In GAPS mode every hole in the
+        configured interval is planned (coalesced into few ranges; a city may get several).
+        Each returned entry becomes one mapped fetch/insert task.
+        """
+        from helpers.city_utils import load_city_list
+        from helpers.coverage import plan_backfill
+        from helpers.db_utils import get_high_water_mark
+        from helpers.date_utils import get_interval_start_to_end_dates, get_incremental_start_to_end_dates
+        from helpers.metrics import task_metrics
 
-    # 3. Fetch weather data from API
+        with task_metrics("plan_date_ranges"):
+            cities = load_city_list(CITIES_CSV_PATH)
+            if FETCH_MODE == GAPS:
+                start_date, end_date = get_interval_start_to_end_dates(START_YEAR, NUM_YEARS, DIRECTION)
+                planned = plan_backfill(DB_PATH, cities, start_date, end_date)
+                print(f"Planned {len(planned)} gap range(s), {sum(p['missing_days'] for p in planned)} missing days")
+                return planned
+
+            planned = []
+            for city in cities:
+                if FETCH_MODE == INCREMENTAL:
+                    high_water_mark = get_high_water_mark(DB_PATH, city['location'])
+                    dates = get_incremental_start_to_end_dates(high_water_mark, START_YEAR, NUM_YEARS, DIRECTION)
+                else:
+                    dates = get_interval_start_to_end_dates(START_YEAR, NUM_YEARS, DIRECTION)
+                if dates is None:
+                    print(f"{city['location']} is up to date (latest: {high_water_mark}). Skipping fetch.")
+                    continue
+                print(f"{city['location']} date range: {dates[0]} to {dates[1]}")
+                planned.append({**city, "start_date": dates[0], "end_date": dates[1]})
+            return planned
+
+    # 3. Fetch weather data from API (mapped: one task instance per city)
     @task()
-    def t_fetch_weather_data(dates):
+    def t_fetch_weather_data(city, run_id=None, ti=None):
         """
-        Call weather API and fetch data for specified date range.
-        Returns a Dict (serialized from Pydantic model) for safe Airflow XCom usage.
+        Call weather API for one city over its planned date range, in chunks, and write
+        each validated chunk to a Parquet staging file. File names carry the run id and
+        try number (run_id/ti are injected from the task context), so overlapping runs
+        and retries never overwrite or delete each other's files.
+        Returns only the staging file references (path + checksum) for Airflow XCom usage.
+        If the city cannot be geocoded or a chunk fails, the task fails and stages
+        nothing; only this city is affected (its date range is planned again on the
+        next run).
         """
-        weather_obj = fetch_weather_data(
-            CITY_NAME, COUNTRY, WEATHER_API_URL,
-            dates['start_date'], dates['end_date'], DAILY_VARIABLES
-        )
-        
-        if weather_obj:
-            print(f"Fetched and validated weather data for {CITY_NAME}, {COUNTRY}")
-            # Serialize Pydantic Object -> Dictionary for Airflow XCom
-            return weather_obj.model_dump()
-            
-        print("Warning: No weather data fetched.")
-        return None
-
-    # 4. Insert collected weather data into DB
-    @task()
-    def t_insert_weather_data(weather_data_dict):
+        from helpers.weather_api import iter_weather_chunks
+        from helpers.staging import write_weather_staging, remove_weather_staging
+        from helpers.metrics import task_metrics
+
+        staged = []
+        staging_run_id = f"{run_id}_try{ti.try_number}"
+        with task_metrics("fetch_weather_data"):
+            try:
+                for chunk in iter_weather_chunks(
+                    city['city_name'], city['country'], WEATHER_API_URL,
+                    city['start_date'], city['end_date'], DAILY_VARIABLES, city['timezone'],
+                    columnar=(VALIDATION_MODE == COLUMNAR)
+                ):
+                    staged.append(write_weather_staging(chunk, city['location'], run_id=staging_run_id))
+            except Exception:
+                # A failed task pushes no XCom, so nothing would ever load or delete these
+                for ref in staged:
+                    remove_weather_staging(ref)
+                raise
+
+        if staged:
+            print(f"Fetched and staged {len(staged)} file(s) for {city['location']}")
+        else:
+            print(f"Warning: No weather data fetched for {city['location']}.")
+        return staged
+
+    # 4. Insert staged weather data into DB (mapped: one task instance per city)
+    # all_done: a city whose fetch failed pushes no XCom and gets no insert instance, while
+    # the other cities still load (check_city_failures fails the run afterwards).
+    # SQLite allows a single writer per database file, so at most one insert per shard
+    # runs at a time (one at a time for the single-file layout). Two concurrent cities
+    # that hash to the same shard wait on its lock (BEGIN IMMEDIATE + busy timeout).
+    # The limit is read at parse time, so create_weather_table checks DB_SHARDS against
+    # the store's actual layout (e.g. after `python -m helpers.shards split`).
+    @task(max_active_tis_per_dagrun=DB_SHARDS, trigger_rule="all_done")
+    def t_insert_weather_data(staged):
         """
-        Reconstructs Pydantic object from Dict and inserts into database.
+        Bulk-loads each staged Parquet file (checksum-verified) into the database.
         """
-        if not weather_data_dict:
+        from helpers.db_loader import insert_weather_frame
+        from helpers.staging import read_weather_staging, remove_weather_staging
+        from helpers.metrics import task_metrics
+
+        if not staged:
             print("No data to insert.")
             return
 
-        # Reconstruct Object from Dict (Strict Type Check)
         try:
-            weather_obj = WeatherResponse.model_validate(weather_data_dict)
-            insert_weather_data(DB_PATH, weather_obj)
+            with task_metrics("insert_weather_data"):
+                for ref in staged:
+                    # insert_weather_frame raises on a database error, so a staged file is
+                    # only removed once all of its rows are committed (a retry reloads it)
+                    insert_weather_frame(DB_PATH, read_weather_staging(ref), ref['location'])
+                    remove_weather_staging(ref)
             print("Weather data inserted successfully.")
         except Exception as e:
             print(f"Failed to insert weather data: {e}")
             raise e
 
-    # 5. Export DB to CSV using Polars (for R/Julia downstream use)
-    @task()
+    # 4b. Recompute the derived metrics (normals, 7/30-day means, anomalies) touched by the inserts
+    #     (all_done, like step 5: a failed city must not hold back the others)
+    @task(trigger_rule="all_done")
+    def t_update_derived_metrics():
+        """Drain the derived-metrics queue filled by the inserts (only the affected windows are recomputed)"""
+        from helpers.derived_metrics import update_derived_metrics
+        from helpers.metrics import task_metrics
+
+        with task_metrics("update_derived_metrics"):
+            update_derived_metrics(DB_PATH)
+
+    # 5. Export DB to CSV / partitioned Parquet using Polars (for R/Julia downstream use)
+    #    all_done: runs once the inserts are finished, even if some cities failed, so the
+    #    cities that did load still reach the summary and animation
+    @task(trigger_rule="all_done")
     def t_export():
-        """Export SQLite weather data to CSV; enables advanced cross-language viz"""
-        export_sqlite_to_csv_with_polars()
-        print("Export process completed.")
-
-    # 6. Run Julia summary script (advanced stats/update)
-    julia_summary = BashOperator(
-        task_id="julia_summary",
-        bash_command=f'julia --project={REPO_ROOT} {JULIA_SUMMARY_SCRIPT_PATH}',
-        cwd=REPO_ROOT
-    )
+        """
+        Export SQLite weather data in the configured EXPORT_FORMATS; enables advanced cross-language viz.
+        Exports are rewritten every run so downstream stages never read stale data:
+        the task fails if a configured format was not exported, rather than
+        fingerprinting the files an earlier run left on disk.
+        Returns the export fingerprint (row count, max date, content hash) for XCom usage.
+        """
+        from helpers.sqlite_utils import export_sqlite_to_csv_with_polars, export_sqlite_to_parquet_partitions
+        from helpers.fingerprint import compute_export_fingerprint
+        from helpers.metrics import task_metrics
+
+        with task_metrics("export"):
+            if "csv" in EXPORT_FORMATS and not export_sqlite_to_csv_with_polars(overwrite=True):
+                raise RuntimeError("CSV export produced no file (empty table?)")
+            if "parquet" in EXPORT_FORMATS and export_sqlite_to_parquet_partitions() is None:
+                raise RuntimeError("Parquet export produced no partitions (empty table?)")
+            fingerprint = compute_export_fingerprint(DB_PATH, EXPORT_FORMATS)
+        print(f"Export process completed. Fingerprint: {fingerprint['digest'][:12]}")
+        return fingerprint
+
+    # 6. Skip the summary/render stages when the exported data has not changed
+    @task.short_circuit()
+    def t_render_needed(fingerprint):
+        """
+        Returns False (skipping all downstream tasks) if the last successful render
+        used exactly this export fingerprint.
+        """
+        from helpers.fingerprint import fingerprint_matches
+
+        if SKIP_UNCHANGED_RENDER and fingerprint_matches("render", fingerprint):
+            print(f"Export unchanged since last render ({fingerprint['digest'][:12]}). Skipping summary and animation.")
+            return False
+        return True
+
+    # 7. Run yearly summary: Julia script (fresh process or warm worker) or the Polars port
+    #    (same CSV + manifest outputs)
+    @task()
+    def t_polars_summary():
+        """Compute the yearly summary with a streaming Polars query (no Julia startup/JIT)"""
+        from helpers.weather_summary import run_weather_summary
+        from helpers.metrics import task_metrics
+
+        with task_metrics("polars_summary"):
+            run_weather_summary()
 
-    # 7. Run R animation script for MP4 visualization (final output)
+    @task()
+    def t_julia_worker_summary():
+        """Run analysis.jl's main() on the warm Julia worker (started on first use, restarted if unhealthy)"""
+        from helpers.julia_worker import run_julia_summary
+        from helpers.metrics import task_metrics
+
+        with task_metrics("julia_worker_summary"):
+            run_julia_summary()
+
+    if SUMMARY_ENGINE == POLARS:
+        summary = t_polars_summary()
+    elif SUMMARY_ENGINE == JULIA_WORKER:
+        summary = t_julia_worker_summary()
+    else:
+        summary = BashOperator(
+            task_id="julia_summary",
+            bash_command=f'julia --project={REPO_ROOT} {JULIA_SUMMARY_SCRIPT_PATH}',
+            cwd=REPO_ROOT
+        )
+
+    # 8. Run R animation script for MP4 visualization (final output)
     r_animation = BashOperator(
         task_id="r_weather_animation",
         bash_command=f"Rscript {R_ANIMATION_SCRIPT_PATH}",
         cwd=REPO_ROOT
     )
 
+    @task()
+    def t_record_render(fingerprint):
+        """Remember the fingerprint of the successfully rendered export"""
+        from helpers.fingerprint import record_fingerprint
+
+        record_fingerprint("render", fingerprint)
+
+    # Fails the DAG run if any city's fetch or insert failed: with all_done downstream,
+    # the shared tail would otherwise finish green and hide the failed cities
+    @task(trigger_rule="one_failed")
+    def t_check_city_failures():
+        """Runs only when a fetch or insert instance failed (skipped otherwise)"""
+        raise RuntimeError("Some cities failed to fetch or insert; see the failed "
+                           "fetch_weather_data / insert_weather_data instances. The other cities were loaded.")
+
     # Chain tasks and data flow (>> for dependencies)
     table = t_create_weather_table()
-    dates = t_prepare_date_range()
-    weather_data = t_fetch_weather_data(dates)
-    insert = t_insert_weather_data(weather_data)
+    planned = t_plan_date_ranges()
+    weather_data = t_fetch_weather_data.expand(city=planned)
+    insert = t_insert_weather_data.expand(staged=weather_data)
+    derived = t_update_derived_metrics()
     export = t_export()
+    render_needed = t_render_needed(export)
+    recorded = t_record_render(export)
+    city_failures = t_check_city_failures()
 
-    # Final chain includes Julia and R steps
-    table >> dates >> weather_data >> insert >> export >> julia_summary >> r_animation
+    # Final chain includes summary and R steps (shared by all cities)
+    table >> planned
+    insert >> derived
+    [weather_data, insert] >> city_failures
+    insert >> export >> render_needed >> summary >> r_animation >> recorded
 
 # DAG registration (entry point for Airflow)
 weather_etl_full_pipeline_dag()
@@ -0,0 +1,82 @@
+# helpers/city_utils.py
+
+import csv
+import hashlib
+import os
+import re
+from config.constants import CITIES_CSV_PATH, CITY_NAME, COUNTRY, TIMEZONE, CITY_DEFAULT_TIMEZONE
+
+def make_location_key(city_name, country=None):
+    """
+    Builds the location key stored alongside every weather row (e.g. "Lisbon,PT").
+
+    Args:
+        city_name (str): City name as configured (case is preserved).
+        country (str, optional): ISO Alpha-2 country code.
+
+    Returns:
+        str: "<city_name>,<COUNTRY>" or just "<city_name>" when no country is given.
+    """
+    city_name = city_name.strip()
+    country = (country or "").strip().upper()
+    return f"{city_name},{country}" if country else city_name
+
+
+def location_slug(location):
+    """
+    Filesystem-safe form of a location key (e.g. "Lisbon,PT" -> "Lisbon_PT-3c230095"),
+    used for staging and export file/directory names.
+
+    The readable part alone is lossy ("St. Louis,US" and "St Louis,US" both give
+    "St_Louis_US"), so a short hash of the exact key is appended: distinct locations
+    never share a staging file or export partition.
+    """
+    readable = re.sub(r"[^A-Za-z0-9_-]+", "_", location)
+    return f"{readable}-{hashlib.sha1(location.encode('utf-8')).hexdigest()[:8]}"
+
+
+def load_city_list(csv_path=CITIES_CSV_PATH):
+    """
+    Reads the list of cities to process from a CSV config file.
+
+    The CSV must have a `city_name` column; `country` and `timezone` are optional
+    (timezone falls back to CITY_DEFAULT_TIMEZONE, "auto": the city's own local time,
+    resolved by the API). Blank rows and duplicate locations are skipped.
+    If the file does not exist, the single configured CITY_NAME/COUNTRY is returned.
+
+    Args:
+        csv_path (str): Path to the cities CSV file.
+
+    Returns:
+        list[dict]: One dict per city with keys city_name, country, timezone, location.
+            Plain dicts keep the list XCom-serializable for Airflow task mapping.
+    """
+    if not os.path.exists(csv_path):
+        print(f"ℹ️  City list '{csv_path}' not found. Using configured city {CITY_NAME}, {COUNTRY}.")
+        return [_city_entry(CITY_NAME, COUNTRY, TIMEZONE)]
+
+    cities = []
+    seen = set()
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            city_name = (row.get("city_name") or "").strip()
+            if not city_name:
+                continue
+            entry = _city_entry(city_name, row.get("country"), row.get("timezone") or CITY_DEFAULT_TIMEZONE)
+            if entry["location"] in seen:
+                continue
+            seen.add(entry["location"])
+            cities.append(entry)
+
+    print(f"✅ Loaded {len(cities)} cities from '{csv_path}'")
+    return cities
+
+
+def _city_entry(city_name, country, timezone):
+    country = (country or "").strip().upper() or None
+    return {
+        "city_name": city_name.strip(),
+        "country": country,
+        "timezone": timezone.strip(),
+        "location": make_location_key(city_name, country),
+    }
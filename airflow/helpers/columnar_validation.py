@@ -0,0 +1,180 @@
+# helpers/columnar_validation.py
+# =====================================================
+# Module: columnar_validation
+#
+# Fast, vectorized validation of the Open-Meteo `daily` block (and of
+# `hourly` batches read by helpers.hourly_weather).
+#
+# The Pydantic `DailyData` model walks every element of every series in Python.
+# This module loads the series straight into Polars columns instead, and checks
+# them with whole-column expressions:
+#   - every series has the same length as `time`
+#   - values have the expected dtype (numeric series cast strictly to Float64)
+#   - dates parse as YYYY-MM-DD and are strictly increasing
+#   - non-null values fall inside physically plausible ranges
+#
+# Nulls (sparse stations) are kept as masked values rather than rejecting the
+# whole response. The small metadata envelope (latitude, longitude, timezone)
+# is still validated by Pydantic (`schemas.WeatherMetadata`).
+#
+# Usage:
+#   from helpers.columnar_validation import parse_weather_payload
+#   metadata, df = parse_weather_payload(response_json)
+#
+# Dependencies:
+#   - polars
+#   - helpers.schemas (metadata envelope)
+# =====================================================
+
+from typing import Optional, Tuple
+import polars as pl
+from helpers.schemas import WeatherMetadata
+
+# API variable -> weather_daily column
+DAILY_COLUMN_MAP = {
+    "temperature_2m_max": "temp_max",
+    "temperature_2m_min": "temp_min",
+    "weather_code": "weather_code",
+}
+
+# Inclusive plausible value ranges per API variable (nulls are not checked)
+VALUE_RANGES = {
+    "temperature_2m_max": (-90.0, 60.0),   # °C, beyond recorded extremes
+    "temperature_2m_min": (-90.0, 60.0),
+    "weather_code": (0, 99),               # WMO 4677 code table
+    "precipitation_sum": (0.0, 2000.0),    # mm/day
+}
+
+# API variable -> weather_hourly column
+HOURLY_COLUMN_MAP = {
+    "temperature_2m": "temperature",
+    "relative_humidity_2m": "relative_humidity",
+    "precipitation": "precipitation",
+    "weather_code": "weather_code",
+    "wind_speed_10m": "wind_speed",
+}
+
+HOURLY_VALUE_RANGES = {
+    "temperature_2m": (-90.0, 60.0),       # °C
+    "relative_humidity_2m": (0.0, 100.0),  # %
+    "precipitation": (0.0, 500.0),         # mm/h
+    "weather_code": (0, 99),               # WMO 4677 code table
+    "wind_speed_10m": (0.0, 500.0),        # km/h
+}
+
+
+class ColumnarValidationError(ValueError):
+    """Raised when a daily or hourly block fails a columnar check."""
+
+
+def validate_daily_columns(daily: dict) -> pl.DataFrame:
+    """
+    Validates a raw `daily` block and returns it as a weather_daily-shaped DataFrame.
+
+    Args:
+        daily (dict): The `daily` object from the API JSON (series keyed by variable name).
+
+    Returns:
+        pl.DataFrame: Columns date (str), temp_max, temp_min (Float64) and weather_code (Int64).
+            Variables the API did not return come back as all-null columns.
+
+    Raises:
+        ColumnarValidationError: On missing/mismatched series, bad dtypes, unparseable or
+            non-increasing dates, or out-of-range values.
+    """
+    times = daily.get("time")
+    if not isinstance(times, list):
+        raise ColumnarValidationError("daily.time is missing or not a list")
+    columns = _validate_series("daily", daily, VALUE_RANGES, len(times))
+    time_str = _validate_times("daily", "date", times, "%Y-%m-%d")
+    return _to_frame(time_str, columns, DAILY_COLUMN_MAP)
+
+
+def validate_hourly_columns(hourly: dict, after: Optional[str] = None) -> pl.DataFrame:
+    """
+    Validates one batch of `hourly` series (same checks as the daily block).
+
+    Args:
+        hourly (dict): Series keyed by API variable name, including `time` ("YYYY-MM-DDTHH:MM").
+        after (str, optional): Last time of the previous batch; this batch must start later.
+
+    Returns:
+        pl.DataFrame: Columns time (str) plus one column per HOURLY_COLUMN_MAP entry
+            (weather_code as Int64, the rest Float64).
+
+    Raises:
+        ColumnarValidationError: On mismatched series, bad dtypes, unparseable or
+            non-increasing times, or out-of-range values.
+    """
+    times = hourly.get("time")
+    if not isinstance(times, list):
+        raise ColumnarValidationError("hourly.time is missing or not a list")
+    columns = _validate_series("hourly", hourly, HOURLY_VALUE_RANGES, len(times))
+    time_str = _validate_times("hourly", "time", times, "%Y-%m-%dT%H:%M")
+    if after is not None and len(times) and times[0] <= after:
+        raise ColumnarValidationError(f"hourly.time restarts at {times[0]} after {after}")
+    return _to_frame(time_str, columns, HOURLY_COLUMN_MAP)
+
+
+def _validate_series(block_name, block, ranges, n_rows):
+    """Length, dtype and range checks; returns {variable: Float64 Series} for known variables."""
+    columns = {}
+    for variable, values in block.items():
+        if variable == "time" or variable not in ranges or values is None:
+            continue
+        if len(values) != n_rows:
+            raise ColumnarValidationError(
+                f"{block_name}.{variable} has {len(values)} values but {block_name}.time has {n_rows}"
+            )
+        try:
+            columns[variable] = pl.Series(variable, values, dtype=pl.Float64, strict=True)
+        except (TypeError, pl.exceptions.PolarsError) as e:
+            raise ColumnarValidationError(f"{block_name}.{variable} is not numeric: {str(e).splitlines()[0]}") from e
+
+    # Value ranges: one vectorized comparison per column (nulls compare as null, not False)
+    for variable, series in columns.items():
+        low, high = ranges[variable]
+        out_of_range = ((series < low) | (series > high)).sum()
+        if out_of_range:
+            raise ColumnarValidationError(
+                f"{block_name}.{variable} has {out_of_range} values outside [{low}, {high}]"
+            )
+    return columns
+
+
+def _validate_times(block_name, column, times, fmt):
+    """Strict parse (a null after parsing means a malformed entry), then monotonicity."""
+    time_str = pl.Series(column, times, dtype=pl.Utf8, strict=False)
+    parsed = time_str.str.strptime(pl.Datetime, fmt, strict=False)
+    if parsed.null_count() != 0:
+        raise ColumnarValidationError(f"{block_name}.time has {parsed.null_count()} unparseable values")
+    if len(times) > 1 and (parsed.diff().drop_nulls().dt.total_seconds() <= 0).any():
+        raise ColumnarValidationError(f"{block_name}.time is not strictly increasing")
+    return time_str
+
+
+def _to_frame(time_str, columns, column_map):
+    n_rows = len(time_str)
+    frame = {time_str.name: time_str}
+    for variable, column in column_map.items():
+        series = columns.get(variable, pl.Series(column, [None] * n_rows, dtype=pl.Float64))
+        frame[column] = series.alias(column)
+    return pl.DataFrame(frame).with_columns(pl.col("weather_code").cast(pl.Int64))
+
+
+def parse_weather_payload(payload: dict) -> Tuple[WeatherMetadata, pl.DataFrame]:
+    """
+    Validates a full archive response: Pydantic for the envelope, Polars for the series.
+
+    Returns:
+        tuple: (WeatherMetadata, weather_daily-shaped pl.DataFrame)
+
+    Raises:
+        pydantic.ValidationError: If the metadata envelope is invalid.
+        ColumnarValidationError: If the daily block is invalid.
+    """
+    metadata = WeatherMetadata.model_validate(payload)
+    daily = payload.get("daily")
+    if not isinstance(daily, dict):
+        raise ColumnarValidationError("response has no daily block")
+    return metadata, validate_daily_columns(daily)
@@ -0,0 +1,244 @@
+# helpers/coverage.py
+# =====================================================
+# Module: coverage
+#
+# Per-location date-coverage index and gap-filling backfill planner.
+#
+# Index:
+#   `weather_coverage` stores, per location, the run-length ranges of stored
+#   days as [start_day, end_day] day numbers (proleptic ordinal, as in
+#   datetime.date.toordinal). A continuous 80-year series is a single row.
+#   The loader (db_loader._insert_records) folds each batch of newly inserted
+#   dates into the ranges in the same transaction, so the index never needs a
+#   scan of weather_daily after the one-off build (schema v6).
+#
+# Planner:
+#   plan_backfill() reads the ranges (a few rows per location), finds the holes
+#   inside a date window and coalesces them into as few requests as possible:
+#   holes separated by at most `bridge_days` of already-stored days are fetched
+#   as one range. Re-fetching those few days costs nothing extra (inserts are
+#   idempotent), while every additional request costs a full round trip.
+#   The plan uses the DAG's planned-city shape, so it can feed the mapped fetch
+#   tasks (FETCH_MODE = GAPS) or the standalone pipeline runner.
+#
+# With sharded storage (helpers.shards) every shard indexes its own locations;
+# reads and rebuilds cover all shards.
+#
+# Usage:
+#   python -m helpers.coverage --start 1940-01-01 --end 2024-12-31   # print the plan
+#   python -m helpers.coverage --start 1940-01-01 --end 2024-12-31 --run
+#   python -m helpers.coverage --rebuild                              # rebuild the index
+# =====================================================
+
+import argparse
+import datetime
+import sqlite3
+from helpers.shards import map_shards
+from config.constants import DB_PATH, TABLE_NAME, ARCHIVE_LAG_DAYS, BACKFILL_BRIDGE_DAYS
+
+COVERAGE_TABLE = "weather_coverage"
+
+# 'YYYY-MM-DD' -> proleptic ordinal day number (julianday('0001-01-01') = 1721425.5)
+_DAY_NUMBER = "CAST(julianday(date) - 1721424.5 AS INTEGER)"
+
+CREATE_COVERAGE_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {COVERAGE_TABLE} (
+        location TEXT NOT NULL,
+        start_day INTEGER NOT NULL,
+        end_day INTEGER NOT NULL,
+        PRIMARY KEY (location, start_day)
+    ) WITHOUT ROWID
+"""
+
+
+def _runs_select(source_table):
+    """Gaps-and-islands: consecutive dates share (day number - row number)."""
+    return f"""
+        SELECT location, MIN(day), MAX(day) FROM (
+            SELECT location, {_DAY_NUMBER} AS day,
+                   {_DAY_NUMBER} - ROW_NUMBER() OVER (PARTITION BY location ORDER BY date) AS run
+            FROM {source_table}
+        )
+        GROUP BY location, run
+    """
+
+
+def apply_coverage_delta(cursor, source_table):
+    """
+    Merges the dates of `source_table` (only rows that were actually inserted) into
+    the coverage ranges. Call inside the same transaction as the insert.
+    """
+    for location, start_day, end_day in cursor.execute(_runs_select(source_table)).fetchall():
+        # Ranges overlapping or touching the new run are absorbed into it
+        touching = (location, end_day + 1, start_day - 1)
+        low, high = cursor.execute(f"""
+            SELECT MIN(start_day), MAX(end_day) FROM {COVERAGE_TABLE}
+            WHERE location = ? AND start_day <= ? AND end_day >= ?
+        """, touching).fetchone()
+        if low is not None:
+            start_day, end_day = min(start_day, low), max(end_day, high)
+            cursor.execute(f"""
+                DELETE FROM {COVERAGE_TABLE} WHERE location = ? AND start_day <= ? AND end_day >= ?
+            """, (location, end_day + 1, start_day - 1))
+        cursor.execute(
+            f"INSERT INTO {COVERAGE_TABLE} (location, start_day, end_day) VALUES (?, ?, ?)",
+            (location, start_day, end_day)
+        )
+
+
+def rebuild_coverage_table(cursor):
+    """Recomputes the coverage ranges from weather_daily (inside the caller's transaction)."""
+    cursor.execute(CREATE_COVERAGE_TABLE_SQL)
+    cursor.execute(f"DELETE FROM {COVERAGE_TABLE}")
+    cursor.execute(f"INSERT INTO {COVERAGE_TABLE} (location, start_day, end_day) {_runs_select(TABLE_NAME)}")
+
+
+def _rebuild_coverage_file(path):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        rebuild_coverage_table(cursor)
+        conn.commit()
+        return cursor.execute(f"SELECT COUNT(*) FROM {COVERAGE_TABLE}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def rebuild_coverage(db_path=DB_PATH):
+    """Full rebuild of weather_coverage from weather_daily (on every shard)."""
+    rows = sum(map_shards(db_path, _rebuild_coverage_file))
+    print(f"✅ Rebuilt {COVERAGE_TABLE}: {rows} ranges")
+    return rows
+
+
+def read_coverage(db_path=DB_PATH):
+    """
+    Loads the coverage index.
+
+    Returns:
+        dict: location -> [(start_day, end_day), ...] sorted by start_day (day numbers as
+            in datetime.date.toordinal). Locations without rows are absent.
+    """
+    def read(path):
+        ranges = {}
+        with sqlite3.connect(path) as conn:
+            for location, start_day, end_day in conn.execute(
+                f"SELECT location, start_day, end_day FROM {COVERAGE_TABLE} ORDER BY location, start_day"
+            ):
+                ranges.setdefault(location, []).append((start_day, end_day))
+        return ranges
+
+    # A location lives on exactly one shard: merging is a plain union
+    coverage = {}
+    for ranges in map_shards(db_path, read):
+        coverage.update(ranges)
+    return coverage
+
+
+def find_gaps(ranges, window_start, window_end):
+    """
+    Holes of a sorted, non-overlapping range list inside [window_start, window_end].
+
+    Returns:
+        list[tuple]: [(start_day, end_day), ...] missing day-number ranges, in order.
+    """
+    gaps = []
+    cursor = window_start
+    for start_day, end_day in ranges:
+        if end_day < cursor:
+            continue
+        if start_day > window_end:
+            break
+        if start_day > cursor:
+            gaps.append((cursor, start_day - 1))
+        cursor = end_day + 1
+    if cursor <= window_end:
+        gaps.append((cursor, window_end))
+    return gaps
+
+
+def coalesce_gaps(gaps, bridge_days=BACKFILL_BRIDGE_DAYS):
+    """
+    Merges holes separated by at most `bridge_days` stored days into single ranges.
+
+    Returns:
+        list[tuple]: [(start_day, end_day, missing_days), ...] fetch ranges.
+    """
+    merged = []
+    for start_day, end_day in gaps:
+        missing = end_day - start_day + 1
+        if merged and start_day - merged[-1][1] - 1 <= bridge_days:
+            merged[-1] = (merged[-1][0], end_day, merged[-1][2] + missing)
+        else:
+            merged.append((start_day, end_day, missing))
+    return merged
+
+
+def plan_backfill(db_path, cities, start_date, end_date, bridge_days=BACKFILL_BRIDGE_DAYS,
+                  archive_lag_days=ARCHIVE_LAG_DAYS):
+    """
+    Builds a fetch plan covering every missing (city, date) in the window.
+
+    Args:
+        db_path (str): Path to the SQLite .db file (coverage index must exist, schema v6+).
+        cities (list[dict]): Entries as returned by city_utils.load_city_list.
+        start_date, end_date (str): Window, 'YYYY-MM-DD'; the end is clipped to
+            today - archive_lag_days (the archive has nothing newer yet).
+        bridge_days (int): Max stored days between two holes that are still fetched together.
+
+    Returns:
+        list[dict]: One entry per fetch range: the city's fields plus start_date, end_date
+            and missing_days. A city may appear several times; complete cities not at all.
+    """
+    latest = datetime.date.today() - datetime.timedelta(days=archive_lag_days)
+    window_start = datetime.date.fromisoformat(start_date).toordinal()
+    window_end = min(datetime.date.fromisoformat(end_date), latest).toordinal()
+
+    coverage = read_coverage(db_path)
+    plan = []
+    for city in cities:
+        gaps = find_gaps(coverage.get(city['location'], []), window_start, window_end)
+        for start_day, end_day, missing in coalesce_gaps(gaps, bridge_days):
+            plan.append({
+                **city,
+                "start_date": datetime.date.fromordinal(start_day).isoformat(),
+                "end_date": datetime.date.fromordinal(end_day).isoformat(),
+                "missing_days": missing,
+            })
+    return plan
+
+
+if __name__ == "__main__":
+    import asyncio
+    import time
+    from config.constants import CITIES_CSV_PATH
+    from helpers.city_utils import load_city_list
+    from helpers.db_utils import create_weather_table
+
+    parser = argparse.ArgumentParser(description="Find missing days and plan (or run) a backfill")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the SQLite database")
+    parser.add_argument("--cities", default=CITIES_CSV_PATH, help="City list CSV")
+    parser.add_argument("--start", help="Window start, YYYY-MM-DD")
+    parser.add_argument("--end", help="Window end, YYYY-MM-DD")
+    parser.add_argument("--bridge-days", type=int, default=BACKFILL_BRIDGE_DAYS)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the coverage index from weather_daily")
+    parser.add_argument("--run", action="store_true", help="Fetch the plan with helpers.pipeline_runner")
+    args = parser.parse_args()
+
+    create_weather_table(args.db)
+    if args.rebuild:
+        rebuild_coverage(args.db)
+    if args.start and args.end:
+        cities = load_city_list(args.cities)
+        started = time.perf_counter()
+        plan = plan_backfill(args.db, cities, args.start, args.end, args.bridge_days)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for entry in plan:
+            print(f"  {entry['location']}: {entry['start_date']} .. {entry['end_date']} ({entry['missing_days']} missing days)")
+        print(f"✅ Planned {len(plan)} ranges, {sum(e['missing_days'] for e in plan)} missing days ({elapsed_ms:.1f} ms)")
+
+        if args.run and plan:
+            from helpers.pipeline_runner import run_pipeline
+            result = asyncio.run(run_pipeline(plan, args.start, args.end, db_path=args.db))
+            raise SystemExit(1 if result.failed else 0)
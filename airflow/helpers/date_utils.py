@@ -1,5 +1,7 @@
 import datetime
-from config.constants import DIRECTION, START_YEAR, NUM_YEARS, FORWARD, BACKWARD
+from config.constants import (
+    DIRECTION, START_YEAR, NUM_YEARS, FORWARD, BACKWARD, ARCHIVE_LAG_DAYS, FETCH_CHUNK_YEARS
+)
 
 def get_interval_start_to_end_dates(start_year=START_YEAR, num_years=NUM_YEARS, direction=DIRECTION):
     """
@@ -47,3 +49,85 @@ def get_interval_start_to_end_dates(start_year=START_YEAR, num_years=NUM_YEARS,
         raise ValueError("direction must be FORWARD or BACKWARD")
 
     return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+
+
+def get_incremental_start_to_end_dates(
+    high_water_mark,
+    start_year=START_YEAR,
+    num_years=NUM_YEARS,
+    direction=DIRECTION,
+    archive_lag_days=ARCHIVE_LAG_DAYS
+):
+    """
+    Calculate the missing tail of the configured interval, given the latest stored date.
+
+    Parameters:
+        high_water_mark (str | None): Latest date already in the DB ('YYYY-MM-DD'), or None.
+        start_year, num_years, direction: Same as get_interval_start_to_end_dates.
+        archive_lag_days (int): Days behind today the archive API is considered complete.
+
+    Returns:
+        tuple | None: (start_date, end_date) as ('YYYY-MM-DD', 'YYYY-MM-DD'), or None if
+        nothing is missing.
+
+    Logic:
+        - No watermark (first load): the range starts at the interval start.
+        - Otherwise the range starts the day after the watermark (never before the interval
+          start).
+        - Either way it ends at the interval end, capped at today minus archive_lag_days:
+          not-yet-published days come back null, and once stored the watermark would move
+          past them, so INCREMENTAL runs would never fetch them again.
+
+    Examples:
+        # Interval 2015-01-01..2019-12-31 and data stored up to 2019-06-30
+        get_incremental_start_to_end_dates("2019-06-30")  # → ('2019-07-01', '2019-12-31')
+        # Already complete
+        get_incremental_start_to_end_dates("2019-12-31")  # → None
+    """
+    interval = get_interval_start_to_end_dates(start_year, num_years, direction)
+
+    # BACKWARD intervals are returned latest-year-first; order them earliest → latest
+    window_start, window_end = (datetime.date.fromisoformat(d) for d in sorted(interval))
+    latest_complete = datetime.date.today() - datetime.timedelta(days=archive_lag_days)
+
+    start_date = window_start
+    if high_water_mark is not None:
+        start_date = max(datetime.date.fromisoformat(high_water_mark) + datetime.timedelta(days=1), window_start)
+    end_date = min(window_end, latest_complete)
+    if start_date > end_date:
+        return None
+
+    return start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+
+
+def split_date_range(start_date, end_date, chunk_years=FETCH_CHUNK_YEARS):
+    """
+    Split a date range into consecutive chunks aligned to calendar years.
+
+    Parameters:
+        start_date (str): First date, 'YYYY-MM-DD'.
+        end_date (str): Last date (inclusive), 'YYYY-MM-DD'.
+        chunk_years (int): Years per chunk (1 = yearly, 10 = decade). Chunk boundaries fall
+            on multiples of chunk_years (e.g. 1940, 1950, ...) so the same chunks come out
+            regardless of where the range starts.
+
+    Returns:
+        list[tuple]: [(chunk_start, chunk_end), ...] as 'YYYY-MM-DD' strings, in date order.
+
+    Examples:
+        split_date_range("1995-06-01", "2012-03-31", 10)
+        # → [('1995-06-01', '1999-12-31'), ('2000-01-01', '2009-12-31'), ('2010-01-01', '2012-03-31')]
+    """
+    start = datetime.date.fromisoformat(start_date)
+    end = datetime.date.fromisoformat(end_date)
+    if chunk_years < 1:
+        raise ValueError("chunk_years must be >= 1")
+
+    chunks = []
+    chunk_start = start
+    while chunk_start <= end:
+        boundary_year = (chunk_start.year // chunk_years + 1) * chunk_years
+        chunk_end = min(datetime.date(boundary_year - 1, 12, 31), end)
+        chunks.append((chunk_start.strftime("%Y-%m-%d"), chunk_end.strftime("%Y-%m-%d")))
+        chunk_start = chunk_end + datetime.timedelta(days=1)
+    return chunks
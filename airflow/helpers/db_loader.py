@@ -11,11 +11,13 @@
 #
 # Design Decision – Duplicates and Idempotency:
 # -----------------------------------------------------
-# For this pipeline, we enforce a UNIQUE constraint on the `date`
-# column in the target DB and use the `INSERT OR IGNORE` statement.
+# For this pipeline, we enforce a UNIQUE index on `(location, date)`
+# in the target DB (schema v3, see helpers.db_utils) and use the
+# `INSERT OR IGNORE` statement.
 #
 # This approach ensures that:
-#   - Each day is loaded only once, even if the ETL is rerun or the API is called multiple times.
+#   - Each day is loaded only once per location, even if the ETL is rerun or the API is called multiple times.
+#   - Deduplication costs a single index probe per row, so the table does not grow on reruns.
 #   - If an attempt is made to insert data for a date that already exists, the insert is ignored.
 #   - We avoid possible corruption or loss of historical data by never overwriting existing records without explicit intent.
 #
@@ -28,9 +30,31 @@
 #   - This module now accepts strictly typed `WeatherResponse` objects.
 #   - It uses Pydantic's validation guarantees to safely access data via dot notation.
 #
+# Incremental yearly summary:
+#   - Each batch first lands in a TEMP table; rows whose (location, date) already
+#     exist are dropped there, the rest are copied into weather_daily and folded
+#     into weather_yearly_summary (helpers.yearly_summary) and the
+#     weather_coverage date ranges (helpers.coverage) in the same
+#     transaction. Summary and coverage upkeep therefore cost O(new rows).
+#   - The same transaction bumps the location's load generation
+#     (weather_load_watermark), which invalidates helpers.queries' result cache,
+#     and queues the new date range for helpers.derived_metrics (weather_derived_pending).
+#
+# Sharded storage:
+#   - With a helpers.shards layout, every load is routed to the shard that owns its
+#     location (shard_path), so loads of cities on different shards run in parallel
+#     without waiting on each other's write lock. Callers still pass DB_PATH.
+#
+# Bulk loads:
+#   - Rows are written in transactions of INSERT_BATCH_SIZE rows on a tuned
+#     WAL connection (db_utils.connect), so multi-million-row loads neither hold
+#     one giant transaction nor pay a commit per row.
+#
 # Usage:
 #   from helpers.db_loader import insert_weather_data
-#   insert_weather_data(DB_PATH, weather_data_object)
+#   insert_weather_data(DB_PATH, weather_data_object, location="Lisbon,PT")
+#   insert_weather_frame(DB_PATH, staged_polars_frame, location="Lisbon,PT")
+#   insert_hourly_batches(DB_PATH, hourly_weather.iter_hourly_batches(path), "Lisbon,PT")
 #
 # Dependencies:
 #   - sqlite3 (Python standard library)
@@ -39,9 +63,19 @@
 
 import sqlite3
 import os
+import time
+from itertools import islice
+from typing import Iterable, Optional
+from helpers import metrics
 from helpers.schemas import WeatherResponse
+from helpers.city_utils import make_location_key
+from helpers.db_utils import connect, bump_load_watermark, mark_derived_pending
+from helpers.shards import shard_path
+from helpers.yearly_summary import apply_summary_delta
+from helpers.coverage import apply_coverage_delta
+from config.constants import CITY_NAME, COUNTRY, INSERT_BATCH_SIZE, TABLE_NAME, HOURLY_TABLE_NAME
 
-def insert_weather_data(db_path: str, weather_data: WeatherResponse):
+def insert_weather_data(db_path: str, weather_data: WeatherResponse, location: Optional[str] = None):
     """
     Inserts daily weather records into the weather_daily table in SQLite DB.
 
@@ -51,15 +85,24 @@ def insert_weather_data(db_path: str, weather_data: WeatherResponse):
     Args:
         db_path (str): Path to the SQLite .db file.
         weather_data (WeatherResponse): Validated Pydantic data object containing daily weather series.
+        location (str, optional): Location key for the rows (see city_utils.make_location_key).
+            Defaults to the configured CITY_NAME/COUNTRY.
             
     Side Effects:
         - Creates the database directory if it does not exist.
         - Inserts each day's observations as a new record in 'weather_daily'.
-        - If a date already exists (unique constraint), the record is ignored (Idempotency).
+        - If a (location, date) already exists (unique index), the record is ignored (Idempotency).
         - Prints the count of successfully inserted rows.
+
+    Returns:
+        int: Number of rows actually inserted (0 if nothing new).
+
+    Raises:
+        sqlite3.Error: If a batch cannot be written (earlier batches stay committed).
     """
     # Ensure the target directory exists
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    location = location or make_location_key(CITY_NAME, COUNTRY)
 
     # Access data directly via Pydantic dot notation (Clean & Safe)
     daily = weather_data.daily
@@ -78,32 +121,197 @@ def insert_weather_data(db_path: str, weather_data: WeatherResponse):
     # The API provides independent lists: [Date1, Date2], [Temp1, Temp2]
     # The DB requires rows: (Date1, Temp1, ...), (Date2, Temp2, ...)
     # zip() performs this transposition, stopping at the shortest list length.
-    records = list(zip(times, temp_max, temp_min, w_codes))
+    records = [(location, *row) for row in zip(times, temp_max, temp_min, w_codes)]
+
+    return _insert_records(db_path, records, location)
+
+
+def insert_weather_frame(db_path: str, df, location: Optional[str] = None):
+    """
+    Bulk-inserts a weather_daily-shaped Polars DataFrame (date, temp_max, temp_min,
+    weather_code), e.g. one loaded from a staging file by helpers.staging.
+
+    Rows go straight from the columnar frame to executemany, with no Pydantic
+    round trip.
+
+    Args:
+        db_path (str): Path to the SQLite .db file.
+        df (polars.DataFrame): Frame with the four weather_daily value columns.
+        location (str, optional): Location key for the rows. Defaults to CITY_NAME/COUNTRY.
+
+    Returns:
+        int: Number of rows actually inserted.
 
-    if not records:
+    Raises:
+        sqlite3.Error: If a batch cannot be written (earlier batches stay committed).
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    location = location or make_location_key(CITY_NAME, COUNTRY)
+    rows = df.select(["date", "temp_max", "temp_min", "weather_code"]).iter_rows()
+    # Generator: rows are materialized one batch at a time in _insert_records
+    records = ((location, *row) for row in rows)
+    return _insert_records(db_path, records, location)
+
+
+def _insert_records(db_path: str, records: Iterable, location: str, batch_size: int = INSERT_BATCH_SIZE):
+    """
+    Runs the idempotent load shared by all loaders, committing every `batch_size`
+    rows and updating the yearly summary with the rows that were actually new;
+    returns rows inserted. A database error rolls back the current batch and is
+    re-raised (earlier batches stay committed).
+    """
+    records = iter(records)
+    batch = list(islice(records, batch_size))
+    if not batch:
         print("⚠️ No valid weather records found to insert (lists were empty or mismatched).")
-        return
+        return 0
 
-    # --- DATABASE TRANSACTION ---
-    conn = sqlite3.connect(db_path)
+    # --- DATABASE TRANSACTIONS (one per batch, on the location's shard) ---
+    db_path = shard_path(db_path, location)
+    conn = connect(db_path)
     cursor = conn.cursor()
+    inserted = 0
     
     try:
-        # Uses 'INSERT OR IGNORE' to maintain idempotency (skips existing dates)
-        cursor.executemany("""
-            INSERT OR IGNORE INTO weather_daily (date, temp_max, temp_min, weather_code)
-            VALUES (?, ?, ?, ?)
-        """, records)
-        
-        conn.commit()
-        print(f"✅ Inserted {cursor.rowcount} new days into {db_path} (duplicates ignored)")
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS incoming_daily (
+                location TEXT, date TEXT, temp_max REAL, temp_min REAL, weather_code INTEGER,
+                PRIMARY KEY (location, date)
+            )
+        """)
+        while batch:
+            started = time.perf_counter()
+            # Take the write lock up front: a deferred transaction that reads first and
+            # writes later fails with "database is locked" (no busy wait) when another
+            # writer commits in between, while BEGIN IMMEDIATE waits out the busy timeout
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("DELETE FROM incoming_daily")
+            # 'INSERT OR IGNORE' drops duplicates within the batch itself
+            cursor.executemany("""
+                INSERT OR IGNORE INTO incoming_daily (location, date, temp_max, temp_min, weather_code)
+                VALUES (?, ?, ?, ?, ?)
+            """, batch)
+            # Keep only new location/dates (idempotency: one unique-index probe per row)
+            cursor.execute("""
+                DELETE FROM incoming_daily WHERE EXISTS (
+                    SELECT 1 FROM weather_daily w
+                    WHERE w.location = incoming_daily.location AND w.date = incoming_daily.date
+                )
+            """)
+            cursor.execute("""
+                INSERT INTO weather_daily (location, date, temp_max, temp_min, weather_code)
+                SELECT location, date, temp_max, temp_min, weather_code FROM incoming_daily
+            """)
+            batch_inserted = cursor.rowcount
+            inserted += batch_inserted
+            apply_summary_delta(cursor, "incoming_daily")
+            apply_coverage_delta(cursor, "incoming_daily")
+            bump_load_watermark(cursor, "incoming_daily")
+            mark_derived_pending(cursor, "incoming_daily")
+            conn.commit()
+            metrics.observe("db_transaction_seconds", time.perf_counter() - started, table=TABLE_NAME)
+            metrics.increment("db_rows_inserted_total", batch_inserted, table=TABLE_NAME)
+            metrics.increment("db_rows_ignored_total", len(batch) - batch_inserted, table=TABLE_NAME)
+            batch = list(islice(records, batch_size))
+
+        print(f"✅ Inserted {inserted} new days for {location} into {db_path} (duplicates ignored)")
     
     except sqlite3.Error as e:
-        print(f"❌ Database Error: {e}")
-    
+        # Batches committed before the failure stay (the load is idempotent, a rerun
+        # completes it); the caller must not treat the input as loaded
+        conn.rollback()
+        print(f"❌ Database Error after {inserted} new days for {location}: {e}")
+        raise
+
+    finally:
+        conn.close()
+
+    return inserted
+
+
+def insert_weather_chunks(db_path: str, chunks: Iterable, location: Optional[str] = None):
+    """
+    Streams chunked API responses into the database, inserting each chunk as it arrives.
+
+    Pairs with weather_api.iter_weather_chunks: only one chunk is held by the loader at a
+    time, so deep backfills never materialize the full date range in memory.
+
+    Args:
+        db_path (str): Path to the SQLite .db file.
+        chunks (Iterable): Validated chunks in date order - WeatherResponse objects, or
+            DataFrames from the columnar validation path (iter_weather_chunks(columnar=True)).
+            Loading stops at the first error (a fetch failure raised by the iterator, or a
+            database error), so the stored range never extends past a missing chunk and
+            INCREMENTAL mode refetches from the gap.
+        location (str, optional): Location key for the rows. Defaults to CITY_NAME/COUNTRY.
+
+    Returns:
+        int: Total rows inserted across all chunks.
+    """
+    total = 0
+    for chunk in chunks:
+        if isinstance(chunk, WeatherResponse):
+            total += insert_weather_data(db_path, chunk, location)
+        else:
+            total += insert_weather_frame(db_path, chunk, location)
+    print(f"✅ Chunked load finished: {total} new days for {location or make_location_key(CITY_NAME, COUNTRY)}")
+    return total
+
+
+def insert_hourly_batches(db_path: str, batches: Iterable, location: Optional[str] = None):
+    """
+    Streams hourly batches into the weather_hourly table, one transaction per batch.
+
+    Each batch is a weather_hourly-shaped Polars DataFrame (time, temperature, ...,
+    wind_speed), e.g. from hourly_weather.iter_hourly_batches. Only the current batch
+    is held in memory, so peak memory follows the batch size, not the date range.
+    Existing (location, time) rows are ignored (primary key + INSERT OR IGNORE).
+
+    Args:
+        db_path (str): Path to the SQLite .db file.
+        batches (Iterable): weather_hourly-shaped DataFrames.
+        location (str, optional): Location key for the rows. Defaults to CITY_NAME/COUNTRY.
+
+    Returns:
+        int: Number of rows actually inserted.
+
+    Raises:
+        sqlite3.Error: If a batch cannot be written (earlier batches stay committed).
+    """
+    location = location or make_location_key(CITY_NAME, COUNTRY)
+    columns = ["time", "temperature", "relative_humidity", "precipitation", "weather_code", "wind_speed"]
+    db_path = shard_path(db_path, location)
+    conn = connect(db_path)
+    cursor = conn.cursor()
+    inserted = 0
+
+    try:
+        for batch in batches:
+            started = time.perf_counter()
+            cursor.execute("BEGIN IMMEDIATE")   # write lock up front (see _insert_records)
+            before = conn.total_changes
+            cursor.executemany(f"""
+                INSERT OR IGNORE INTO {HOURLY_TABLE_NAME} (location, {", ".join(columns)})
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, ((location, *row) for row in batch.select(columns).iter_rows()))
+            batch_inserted = conn.total_changes - before
+            inserted += batch_inserted
+            conn.commit()
+            metrics.observe("db_transaction_seconds", time.perf_counter() - started, table=HOURLY_TABLE_NAME)
+            metrics.increment("db_rows_inserted_total", batch_inserted, table=HOURLY_TABLE_NAME)
+            metrics.increment("db_rows_ignored_total", batch.height - batch_inserted, table=HOURLY_TABLE_NAME)
+        print(f"✅ Inserted {inserted} new hours for {location} into {db_path} (duplicates ignored)")
+
+    except sqlite3.Error as e:
+        conn.rollback()   # earlier batches stay committed (see _insert_records)
+        print(f"❌ Database Error after {inserted} new hours for {location}: {e}")
+        raise
+
     finally:
         conn.close()
 
+    return inserted
+
 
 # =====================================================
 # Standalone Test Block
@@ -117,7 +325,7 @@ if __name__ == "__main__":
     from helpers.date_utils import get_interval_start_to_end_dates
     from helpers.db_utils import create_weather_table
     # Note: We import the Pydantic-enabled fetcher now!
-    from helpers.weather_api import fetch_weather_data 
+    from helpers.weather_api import fetch_weather_data, iter_weather_chunks
 
     print("--- Starting DB Loader Test ---")
 
@@ -137,6 +345,15 @@ if __name__ == "__main__":
     if weather_object:
         # 4. Test the insert function with the Object
         print("Loading validated weather data into database...")
-        insert_weather_data(DB_PATH, weather_object)
+        insert_weather_data(DB_PATH, weather_object, make_location_key(CITY_NAME, COUNTRY))
     else:
         print("❌ Test Failed: Could not fetch weather data.")
+
+    # 5. Test the chunked streaming path (yearly chunks; all rows already exist, so 0 new)
+    print("Streaming the same range in yearly chunks...")
+    insert_weather_chunks(
+        DB_PATH,
+        iter_weather_chunks(CITY_NAME, COUNTRY, WEATHER_API_URL, start_date, end_date,
+                            DAILY_VARIABLES, TIMEZONE, chunk_years=1),
+        make_location_key(CITY_NAME, COUNTRY)
+    )
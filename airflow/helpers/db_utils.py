@@ -1,16 +1,71 @@
+# helpers/db_utils.py
+# =====================================================
+# Module: db_utils
+#
+# Schema management and connection setup for the weather SQLite database.
+#
+# Versioned schema:
+#   The schema version lives in SQLite's `PRAGMA user_version`. Each entry in
+#   MIGRATIONS upgrades the database by one version inside its own transaction,
+#   so `create_weather_table` brings a fresh or old database up to date and is
+#   safe to run on every DAG run.
+#
+#   v1  weather_daily table (single city, no key)
+#   v2  `location` column; legacy rows are assigned the configured CITY_NAME/COUNTRY
+#   v3  duplicate (location, date) rows removed; UNIQUE index on (location, date),
+#       which makes `INSERT OR IGNORE` deduplicate with a single index probe
+#   v4  weather_yearly_summary table (see helpers.yearly_summary), built from
+#       existing rows and maintained incrementally by the loader afterwards
+#   v5  weather_hourly table keyed on (location, time) - time is UTC "YYYY-MM-DDTHH:MM"
+#   v6  weather_coverage table (run-length date ranges per location, see helpers.coverage),
+#       built from existing rows and maintained incrementally by the loader afterwards
+#   v7  weather_load_watermark table: a per-location load generation the loader bumps in
+#       every transaction that inserts rows (read caches compare it to detect new data)
+#   v8  weather_daily_derived + weather_climatology tables (see helpers.derived_metrics) and
+#       the weather_derived_pending queue of date ranges the loader inserted; existing
+#       locations are queued in full, so the next derived-metrics run builds them
+#
+# Sharded layout (DB_SHARDS > 1, see helpers.shards):
+#   Every shard file is a complete database with this schema; create_weather_table
+#   creates the layout on first use and migrates every shard.
+#
+# Connection tuning (see `connect`):
+#   WAL journal mode (readers never block the writer), synchronous=NORMAL,
+#   a larger page cache, and memory-mapped reads.
+# =====================================================
+
 import sqlite3
 import os
+from helpers.city_utils import make_location_key
+from helpers.yearly_summary import rebuild_summary_table
+from helpers.coverage import rebuild_coverage_table
+from helpers.shards import init_layout, shard_path
+from config.constants import (
+    CITY_NAME, COUNTRY, SQLITE_BUSY_TIMEOUT_SECONDS, SQLITE_SYNCHRONOUS,
+    SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE_BYTES, HOURLY_TABLE_NAME, DB_SHARDS,
+    DERIVED_TABLE_NAME, CLIMATOLOGY_TABLE_NAME
+)
+
+LOAD_WATERMARK_TABLE = "weather_load_watermark"
+DERIVED_PENDING_TABLE = "weather_derived_pending"
+
 
-def create_weather_table(db_path):
+def connect(db_path):
     """
-    Create the weather_daily table in the specified SQLite database file.
-    - db_path: str, path to the .db SQLite file (will be created if not exists).
-    The operation is idempotent (safe to run multiple times).
+    Open a tuned connection to the weather database.
+    - db_path: str, path to the .db SQLite file (directory is created if missing).
+    Applies WAL journal mode, synchronous, cache_size and mmap_size pragmas.
     """
-    # Ensure directory exists
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    conn = sqlite3.connect(db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+    return conn
+
+
+def _migration_1(cursor):
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS weather_daily (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -20,5 +75,239 @@ def create_weather_table(db_path):
             weather_code INTEGER
         )
     """)
-    conn.commit()
-    conn.close()
+
+
+def _migration_2(cursor):
+    # Databases touched by earlier multi-city code may already have the column
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(weather_daily)")]
+    if "location" not in columns:
+        cursor.execute("ALTER TABLE weather_daily ADD COLUMN location TEXT")
+    # Pre-location rows all came from the single configured city
+    cursor.execute(
+        "UPDATE weather_daily SET location = ? WHERE location IS NULL",
+        (make_location_key(CITY_NAME, COUNTRY),)
+    )
+
+
+def _migration_3(cursor):
+    # Keep the first-loaded row of each (location, date); later copies were re-run duplicates
+    cursor.execute("""
+        DELETE FROM weather_daily
+        WHERE id NOT IN (SELECT MIN(id) FROM weather_daily GROUP BY location, date)
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_weather_daily_location_date
+        ON weather_daily (location, date)
+    """)
+
+
+def _migration_4(cursor):
+    rebuild_summary_table(cursor)
+
+
+def _migration_5(cursor):
+    # Clustered on the key (WITHOUT ROWID): range scans per location read contiguous pages
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {HOURLY_TABLE_NAME} (
+            location TEXT NOT NULL,
+            time TEXT NOT NULL,
+            temperature REAL,
+            relative_humidity REAL,
+            precipitation REAL,
+            weather_code INTEGER,
+            wind_speed REAL,
+            PRIMARY KEY (location, time)
+        ) WITHOUT ROWID
+    """)
+
+
+def _migration_6(cursor):
+    rebuild_coverage_table(cursor)
+
+
+def _migration_7(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LOAD_WATERMARK_TABLE} (
+            location TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL,
+            loaded_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        INSERT OR IGNORE INTO {LOAD_WATERMARK_TABLE} (location, generation, loaded_at)
+        SELECT DISTINCT location, 1, datetime('now') FROM weather_daily
+    """)
+
+
+def _migration_8(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DERIVED_TABLE_NAME} (
+            location TEXT NOT NULL,
+            date TEXT NOT NULL,
+            temp_max_mean_7d REAL,
+            temp_max_mean_30d REAL,
+            temp_min_mean_7d REAL,
+            temp_min_mean_30d REAL,
+            temp_max_normal REAL,
+            temp_min_normal REAL,
+            temp_max_anomaly REAL,
+            temp_min_anomaly REAL,
+            PRIMARY KEY (location, date)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CLIMATOLOGY_TABLE_NAME} (
+            location TEXT NOT NULL,
+            day_of_year TEXT NOT NULL,
+            n_temp_max INTEGER NOT NULL,
+            temp_max_normal REAL,
+            n_temp_min INTEGER NOT NULL,
+            temp_min_normal REAL,
+            PRIMARY KEY (location, day_of_year)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DERIVED_PENDING_TABLE} (
+            id INTEGER PRIMARY KEY,
+            location TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL
+        )
+    """)
+    mark_derived_pending(cursor, "weather_daily")
+
+
+# (version, migration) pairs, applied in order to databases below that version
+MIGRATIONS = [
+    (1, _migration_1),
+    (2, _migration_2),
+    (3, _migration_3),
+    (4, _migration_4),
+    (5, _migration_5),
+    (6, _migration_6),
+    (7, _migration_7),
+    (8, _migration_8),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def migrate(conn):
+    """
+    Upgrade an open connection's database to SCHEMA_VERSION.
+    Each pending migration runs in its own transaction together with the user_version bump.
+    Returns the (new) schema version.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in MIGRATIONS:
+        if target <= version:
+            continue
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        try:
+            migration(cursor)
+            cursor.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"Migrated weather DB schema to v{target}")
+        version = target
+    return version
+
+
+def create_weather_table(db_path, shards=DB_SHARDS):
+    """
+    Create the weather_daily table in the specified SQLite database file.
+    - db_path: str, path to the .db SQLite file (will be created if not exists).
+    - shards: int, shard count of a new store (>1 creates the helpers.shards layout
+      next to db_path; an existing layout is kept as is).
+    The operation is idempotent (safe to run multiple times).
+    Existing databases are upgraded to the current schema version.
+    Returns the list of database files (one per shard).
+    """
+    paths = init_layout(db_path, shards)
+    for path in paths:
+        conn = connect(path)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+    return paths
+
+
+def get_high_water_mark(db_path, location):
+    """
+    Return the latest stored date for a location (its incremental-fetch watermark).
+    - db_path: str, path to the .db SQLite file.
+    - location: str, location key (see city_utils.make_location_key).
+    Returns 'YYYY-MM-DD', or None if the location has no rows (or the DB/table is missing).
+    """
+    db_path = shard_path(db_path, location)
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT MAX(date) FROM weather_daily WHERE location = ?", (location,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return row[0]
+
+
+def mark_derived_pending(cursor, source_table):
+    """
+    Queues the date range of every location in `source_table` (only rows that were
+    actually inserted) for helpers.derived_metrics. Call inside the same transaction
+    as the insert, so no inserted range is ever missed.
+    """
+    cursor.execute(f"""
+        INSERT INTO {DERIVED_PENDING_TABLE} (location, start_date, end_date)
+        SELECT location, MIN(date), MAX(date) FROM {source_table} GROUP BY location
+    """)
+
+
+_BUMP_ON_CONFLICT = "ON CONFLICT(location) DO UPDATE SET generation = generation + 1, loaded_at = excluded.loaded_at"
+
+
+def bump_load_watermark(cursor, source_table):
+    """
+    Advances the load generation of every location in `source_table` (only rows that
+    were actually inserted). Call inside the same transaction as the insert, so readers
+    see new rows and the new generation together.
+    """
+    # "WHERE true" keeps SQLite from parsing ON CONFLICT as part of the SELECT's join
+    cursor.execute(f"""
+        INSERT INTO {LOAD_WATERMARK_TABLE} (location, generation, loaded_at)
+        SELECT DISTINCT location, 1, datetime('now') FROM {source_table} WHERE true
+        {_BUMP_ON_CONFLICT}
+    """)
+
+
+def bump_location_watermark(cursor, location):
+    """
+    Advances the load generation of one location (e.g. after rewriting its derived
+    rows). Call inside the transaction that changed the location's data.
+    """
+    cursor.execute(f"""
+        INSERT INTO {LOAD_WATERMARK_TABLE} (location, generation, loaded_at)
+        VALUES (?, 1, datetime('now'))
+        {_BUMP_ON_CONFLICT}
+    """, (location,))
+
+
+def get_load_watermark(conn, location=None):
+    """
+    Return the load generation of a location, or the sum over all locations if
+    location is None. Any insert makes the value grow; 0 means nothing loaded yet.
+    - conn: open sqlite3 connection to the weather database (schema v7+).
+    """
+    if location is None:
+        row = conn.execute(f"SELECT COALESCE(SUM(generation), 0) FROM {LOAD_WATERMARK_TABLE}").fetchone()
+    else:
+        row = conn.execute(
+            f"SELECT generation FROM {LOAD_WATERMARK_TABLE} WHERE location = ?", (location,)
+        ).fetchone()
+    return row[0] if row else 0
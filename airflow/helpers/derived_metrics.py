@@ -0,0 +1,281 @@
+# helpers/derived_metrics.py
+# =====================================================
+# Module: derived_metrics
+#
+# Precomputed climatology and rolling-window metrics per (location, date), so
+# analytics read them with an index lookup instead of re-running window scans
+# over the full daily history on every read.
+#
+# Tables (schema v8, see helpers.db_utils):
+#   weather_climatology     (location, day_of_year 'MM-DD') -> day-of-year normals:
+#                           mean temp_max / temp_min over the baseline years
+#                           CLIMATOLOGY_BASELINE_START_YEAR..END_YEAR (29 Feb has its own
+#                           normal from leap years; nulls are ignored)
+#   weather_daily_derived   (location, date) -> temp_<var>_mean_7d / _mean_30d (trailing
+#                           calendar-day windows ending on the date, over the stored non-null
+#                           days in the window), temp_<var>_normal, temp_<var>_anomaly
+#                           (value - normal; null without a baseline normal)
+#
+# Incremental updates:
+#   The loader queues the date range of every batch it inserts
+#   (weather_derived_pending, in the insert transaction). update_derived_metrics
+#   drains the queue location by location:
+#     - new days outside the baseline years leave the normals unchanged: only the
+#       dates whose windows contain a new day, [first new date, last new date + 29],
+#       are recomputed, from the rows of that range plus the 29 days before it;
+#     - new days inside the baseline years change the normals, and with them the
+#       anomalies of every date of the location: normals and derived rows are then
+#       recomputed for the location's whole history (once per baseline backfill).
+#   Rolling means are vectorized Polars window operations (rolling_mean_by over the
+#   date column). Each location is one short transaction that also removes its
+#   queue entries and bumps its load generation (helpers.queries' cache).
+#   With sharded storage every shard drains its own queue, in parallel.
+#
+# Usage:
+#   from helpers.derived_metrics import update_derived_metrics
+#   update_derived_metrics(DB_PATH)                     # after inserts (DAG task / pipeline runner)
+#   python -m helpers.derived_metrics                   # drain the queue
+#   python -m helpers.derived_metrics --verify          # compare with a full recompute
+#   python -m helpers.derived_metrics --rebuild         # queue every location in full, then drain
+#
+# Dependencies:
+#   - polars, sqlite3
+# =====================================================
+
+import argparse
+import datetime
+import time
+import polars as pl
+from helpers import metrics
+from helpers.db_utils import (
+    connect, bump_location_watermark, mark_derived_pending, DERIVED_PENDING_TABLE
+)
+from helpers.shards import map_shards
+from config.constants import (
+    DB_PATH, TABLE_NAME, DERIVED_TABLE_NAME, CLIMATOLOGY_TABLE_NAME,
+    CLIMATOLOGY_BASELINE_START_YEAR, CLIMATOLOGY_BASELINE_END_YEAR
+)
+
+ROLLING_WINDOWS_DAYS = (7, 30)   # Columns temp_<var>_mean_<N>d of weather_daily_derived
+_VARIABLES = ("temp_max", "temp_min")
+_LOOKBACK_DAYS = max(ROLLING_WINDOWS_DAYS) - 1   # Days before a date that its widest window reads
+
+DERIVED_COLUMNS = (
+    [f"{v}_mean_{w}d" for v in _VARIABLES for w in ROLLING_WINDOWS_DAYS]
+    + [f"{v}_normal" for v in _VARIABLES]
+    + [f"{v}_anomaly" for v in _VARIABLES]
+)
+NORMALS_SCHEMA = {
+    "day_of_year": pl.Utf8, "n_temp_max": pl.Int64, "temp_max_normal": pl.Float64,
+    "n_temp_min": pl.Int64, "temp_min_normal": pl.Float64,
+}
+_DAILY_SCHEMA = {"date": pl.Utf8, "temp_max": pl.Float64, "temp_min": pl.Float64}
+
+_BASELINE = (f"{CLIMATOLOGY_BASELINE_START_YEAR}-01-01", f"{CLIMATOLOGY_BASELINE_END_YEAR}-12-31")
+
+
+def _shift_date(date, days):
+    return (datetime.date.fromisoformat(date) + datetime.timedelta(days=days)).isoformat()
+
+
+def _compute_normals(conn, location):
+    """Day-of-year normals of one location from its baseline-period rows (an index range scan)."""
+    rows = conn.execute(f"""
+        SELECT substr(date, 6, 5), COUNT(temp_max), AVG(temp_max), COUNT(temp_min), AVG(temp_min)
+        FROM {TABLE_NAME}
+        WHERE location = ? AND date BETWEEN ? AND ?
+        GROUP BY 1
+    """, (location, *_BASELINE)).fetchall()
+    return pl.DataFrame(rows, schema=NORMALS_SCHEMA, orient="row")
+
+
+def _read_normals(conn, location):
+    rows = conn.execute(f"""
+        SELECT day_of_year, n_temp_max, temp_max_normal, n_temp_min, temp_min_normal
+        FROM {CLIMATOLOGY_TABLE_NAME} WHERE location = ?
+    """, (location,)).fetchall()
+    return pl.DataFrame(rows, schema=NORMALS_SCHEMA, orient="row")
+
+
+def compute_derived(daily, normals):
+    """
+    Derived metrics for one location's daily rows.
+
+    Args:
+        daily (pl.DataFrame): date ('YYYY-MM-DD'), temp_max, temp_min - every stored day of
+            the dates to compute plus the _LOOKBACK_DAYS before them (their windows).
+        normals (pl.DataFrame): day_of_year plus temp_<var>_normal columns.
+
+    Returns:
+        pl.DataFrame: date and DERIVED_COLUMNS, one row per input date, sorted by date.
+    """
+    day = pl.col("date").str.to_date()
+    return (
+        daily.sort("date")
+        .with_columns(day.alias("day"), pl.col("date").str.slice(5, 5).alias("day_of_year"))
+        .with_columns([
+            pl.col(v).rolling_mean_by("day", window_size=f"{w}d").alias(f"{v}_mean_{w}d")
+            for v in _VARIABLES for w in ROLLING_WINDOWS_DAYS
+        ])
+        .join(normals.select(["day_of_year"] + [f"{v}_normal" for v in _VARIABLES]),
+              on="day_of_year", how="left")
+        .with_columns([(pl.col(v) - pl.col(f"{v}_normal")).alias(f"{v}_anomaly") for v in _VARIABLES])
+        .select(["date"] + DERIVED_COLUMNS)
+    )
+
+
+def _update_location(conn, location, start_date, end_date):
+    """
+    Recomputes the derived rows affected by new days in [start_date, end_date] (and the
+    normals, if the range touches the baseline years). Runs in the caller's transaction.
+    Returns the number of derived rows written.
+    """
+    if start_date <= _BASELINE[1] and end_date >= _BASELINE[0]:
+        # New baseline days move the normals, hence every anomaly of the location
+        normals = _compute_normals(conn, location)
+        conn.execute(f"DELETE FROM {CLIMATOLOGY_TABLE_NAME} WHERE location = ?", (location,))
+        conn.executemany(f"""
+            INSERT INTO {CLIMATOLOGY_TABLE_NAME} (location, {", ".join(NORMALS_SCHEMA)})
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, ((location, *row) for row in normals.iter_rows()))
+        start_date, end_date = "0000-01-01", "9999-12-31"
+    else:
+        normals = _read_normals(conn, location)
+        # A new day changes the windows of the dates up to _LOOKBACK_DAYS after it
+        end_date = _shift_date(end_date, _LOOKBACK_DAYS)
+
+    read_from = start_date if start_date == "0000-01-01" else _shift_date(start_date, -_LOOKBACK_DAYS)
+    rows = conn.execute(f"""
+        SELECT date, temp_max, temp_min FROM {TABLE_NAME}
+        WHERE location = ? AND date BETWEEN ? AND ?
+        ORDER BY date
+    """, (location, read_from, end_date)).fetchall()
+    derived = compute_derived(pl.DataFrame(rows, schema=_DAILY_SCHEMA, orient="row"), normals)
+    derived = derived.filter(pl.col("date") >= start_date)
+
+    conn.executemany(f"""
+        INSERT OR REPLACE INTO {DERIVED_TABLE_NAME} (location, date, {", ".join(DERIVED_COLUMNS)})
+        VALUES ({", ".join("?" * (len(DERIVED_COLUMNS) + 2))})
+    """, ((location, *row) for row in derived.iter_rows()))
+    return derived.height
+
+
+def _update_shard(path):
+    """Drains one database file's queue, one transaction per location. Returns rows written."""
+    conn = connect(path)
+    written = 0
+    try:
+        pending = conn.execute(f"""
+            SELECT location, MIN(start_date), MAX(end_date), MAX(id)
+            FROM {DERIVED_PENDING_TABLE} GROUP BY location
+        """).fetchall()
+        for location, start_date, end_date, last_id in pending:
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")   # a consistent view of the location's rows while we write
+            try:
+                rows = _update_location(conn, location, start_date, end_date)
+                # Entries queued after the SELECT above (higher ids) stay for the next run
+                conn.execute(f"DELETE FROM {DERIVED_PENDING_TABLE} WHERE location = ? AND id <= ?",
+                             (location, last_id))
+                bump_location_watermark(conn, location)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            written += rows
+            metrics.observe("derived_update_seconds", time.perf_counter() - started)
+            metrics.increment("derived_rows_written_total", rows)
+    finally:
+        conn.close()
+    return written
+
+
+def update_derived_metrics(db_path=DB_PATH):
+    """
+    Brings weather_daily_derived / weather_climatology up to date with every insert
+    queued since the last run (all shards, in parallel).
+
+    Args:
+        db_path (str): Path to the SQLite .db file (schema v8+).
+
+    Returns:
+        int: Derived rows (re)written.
+    """
+    started = time.perf_counter()
+    written = sum(map_shards(db_path, _update_shard))
+    print(f"✅ Derived metrics up to date: {written} rows (re)computed in {time.perf_counter() - started:.2f}s")
+    return written
+
+
+def _queue_everything(path):
+    conn = connect(path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        mark_derived_pending(conn, TABLE_NAME)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def rebuild_derived_metrics(db_path=DB_PATH):
+    """Queues every location's full history and recomputes it."""
+    map_shards(db_path, _queue_everything)
+    return update_derived_metrics(db_path)
+
+
+def _count_derived_mismatches(path, tolerance):
+    conn = connect(path)
+    try:
+        mismatches = 0
+        locations = [row[0] for row in conn.execute(f"SELECT DISTINCT location FROM {TABLE_NAME}")]
+        for location in locations:
+            daily = pl.DataFrame(conn.execute(
+                f"SELECT date, temp_max, temp_min FROM {TABLE_NAME} WHERE location = ?", (location,)
+            ).fetchall(), schema=_DAILY_SCHEMA, orient="row")
+            expected = compute_derived(daily, _compute_normals(conn, location))
+            stored = pl.DataFrame(conn.execute(f"""
+                SELECT date, {", ".join(DERIVED_COLUMNS)} FROM {DERIVED_TABLE_NAME}
+                WHERE location = ? ORDER BY date
+            """, (location,)).fetchall(), schema=expected.schema, orient="row")
+            if stored.height != expected.height or stored["date"].to_list() != expected["date"].to_list():
+                mismatches += 1
+                continue
+            for column in DERIVED_COLUMNS:
+                a, b = stored[column], expected[column]
+                if not ((a - b).abs().fill_null(0) <= tolerance).all() or not (a.is_null() == b.is_null()).all():
+                    mismatches += 1
+                    break
+    finally:
+        conn.close()
+    return mismatches
+
+
+def verify_derived_metrics(db_path=DB_PATH, tolerance=1e-9):
+    """
+    Compares the stored (incrementally maintained) metrics with a full recompute of
+    every location (run after update_derived_metrics has drained the queue).
+
+    Returns:
+        bool: True if every location matches.
+    """
+    mismatches = sum(map_shards(db_path, lambda path: _count_derived_mismatches(path, tolerance)))
+    if mismatches:
+        print(f"❌ {DERIVED_TABLE_NAME} differs from a full recompute for {mismatches} location(s)")
+    else:
+        print(f"✅ {DERIVED_TABLE_NAME} matches a full recompute")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain/verify the derived metrics tables")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the SQLite database")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every location in full")
+    parser.add_argument("--verify", action="store_true", help="Compare the stored metrics with a full recompute")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_derived_metrics(args.db)
+    else:
+        update_derived_metrics(args.db)
+    if args.verify:
+        raise SystemExit(0 if verify_derived_metrics(args.db) else 1)
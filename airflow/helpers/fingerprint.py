@@ -0,0 +1,96 @@
+# helpers/fingerprint.py
+# =====================================================
+# Module: fingerprint
+#
+# Content fingerprints for the exported weather data, used to skip the
+# downstream summary/render stages when nothing changed since their last
+# successful run.
+#
+# A fingerprint combines:
+#   - the row-count / max-date watermark of weather_daily (over all shards)
+#   - a sha256 over the exported files (Parquet partitions and/or CSV)
+# and is summarized into a single `digest`.
+#
+# The digest of the last successful render is stored per stage in a small JSON
+# state file (FINGERPRINT_STATE_PATH). Delete the file (or the stage's entry)
+# to force a re-render.
+#
+# Usage:
+#   fp = compute_export_fingerprint()
+#   if not fingerprint_matches("render", fp): ...render...; record_fingerprint("render", fp)
+# =====================================================
+
+import hashlib
+import json
+import os
+import sqlite3
+from helpers.shards import map_shards
+from config.constants import (
+    DB_PATH, TABLE_NAME, EXPORT_FORMATS, EXPORT_CSV, EXPORT_PARQUET_MANIFEST, FINGERPRINT_STATE_PATH
+)
+
+
+def _exported_files(formats):
+    paths = []
+    if "parquet" in formats and os.path.exists(EXPORT_PARQUET_MANIFEST):
+        with open(EXPORT_PARQUET_MANIFEST) as f:
+            paths += sorted(p["path"] for p in json.load(f)["partitions"])
+    if "csv" in formats and os.path.exists(EXPORT_CSV):
+        paths.append(EXPORT_CSV)
+    return paths
+
+
+def compute_export_fingerprint(db_path=DB_PATH, formats=EXPORT_FORMATS):
+    """
+    Fingerprints the current export.
+
+    Args:
+        db_path (str): Path to the SQLite .db file (for the row-count / max-date watermark).
+        formats (list): Export formats whose files are hashed ("parquet", "csv").
+
+    Returns:
+        dict: {row_count, max_date, content_sha256, digest} (small enough for XCom).
+    """
+    def watermark(path):
+        with sqlite3.connect(path) as conn:
+            return conn.execute(f"SELECT COUNT(*), MAX(date) FROM {TABLE_NAME}").fetchone()
+
+    per_shard = map_shards(db_path, watermark)
+    row_count = sum(count for count, _ in per_shard)
+    max_date = max((date for _, date in per_shard if date is not None), default=None)
+
+    content = hashlib.sha256()
+    for path in _exported_files(formats):
+        content.update(path.encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                content.update(block)
+
+    fingerprint = {"row_count": row_count, "max_date": max_date, "content_sha256": content.hexdigest()}
+    fingerprint["digest"] = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+    return fingerprint
+
+
+def _load_state(state_path):
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def fingerprint_matches(stage, fingerprint, state_path=FINGERPRINT_STATE_PATH):
+    """True if `stage` last completed successfully on exactly this fingerprint."""
+    last = _load_state(state_path).get(stage)
+    return last is not None and last.get("digest") == fingerprint["digest"]
+
+
+def record_fingerprint(stage, fingerprint, state_path=FINGERPRINT_STATE_PATH):
+    """Stores `fingerprint` as the last successful run of `stage`."""
+    state = _load_state(state_path)
+    state[stage] = fingerprint
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+    print(f"✅ Recorded fingerprint for '{stage}': {fingerprint['digest'][:12]} ({fingerprint['row_count']} rows, max date {fingerprint['max_date']})")
@@ -0,0 +1,354 @@
+# helpers/gazetteer.py
+# =====================================================
+# Module: gazetteer
+#
+# Offline geocoder backed by a local GeoNames dump (e.g. cities500.txt or
+# allCountries.txt from https://download.geonames.org/export/dump/), so city
+# coordinates resolve with no geocoding-API call at all
+# (GEOCODER_BACKEND = GAZETTEER, see helpers.geocode_utils).
+#
+# Index:
+#   The tab-separated dump is compiled once into a compact binary file of
+#   sorted keys "<normalized name>\0<COUNTRY>" (+ display name, lat, lon,
+#   population as parallel fixed-width arrays). The file is memory-mapped, so
+#   opening it costs no parsing and the OS pages in only what lookups touch.
+#   Entries with the same key are ordered by population (largest first), which
+#   matches how the geocoding API ranks homonyms.
+#
+#   Layout (native byte order; a local build artifact, rebuilt when the dump is newer):
+#     header   <8sIIII  magic, count, keys blob size, names blob size, reserved
+#     uint32   key_offsets[count + 1], name_offsets[count + 1]
+#     float32  latitudes[count], longitudes[count]
+#     uint32   populations[count]
+#     bytes    keys blob (UTF-8), names blob (UTF-8)
+#
+# Lookups:
+#   - exact: binary search on the key (name, optionally + country)
+#   - prefix: binary search for the first key starting with the prefix, then a
+#     scan in key order (alphabetical), filtered by country
+#   Names are normalized the same way for building and querying: accents
+#   stripped, case-folded, punctuation collapsed ("São Paulo" -> "sao paulo").
+#
+# Usage:
+#   python -m helpers.gazetteer build --dump data/gazetteer/cities500.txt
+#   python -m helpers.gazetteer lookup "Lisbon" --country PT
+#   python -m helpers.gazetteer lookup "San " --prefix --limit 5
+#   python -m helpers.gazetteer resolve --cities airflow/config/cities.csv
+#   get_gazetteer().lookup("Lisbon", "PT")  -> [{"name", "country", "latitude", ...}]
+#
+# Dependencies:
+#   - Python standard library only (mmap, array, struct)
+# =====================================================
+
+import argparse
+import array
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import unicodedata
+from config.constants import GAZETTEER_DUMP_PATH, GAZETTEER_INDEX_PATH
+
+INDEX_MAGIC = b"WXGAZ001"
+_HEADER = struct.Struct("<8sIIII")
+
+# GeoNames dump columns used (0-based)
+_COL_NAME, _COL_ASCII_NAME, _COL_ALTERNATE_NAMES = 1, 2, 3
+_COL_LATITUDE, _COL_LONGITUDE, _COL_FEATURE_CLASS, _COL_COUNTRY, _COL_POPULATION = 4, 5, 6, 8, 14
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name):
+    """Accent-stripped, case-folded, punctuation-collapsed form used as the index key."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub(" ", stripped).strip()
+
+
+def _entry_key(name, country):
+    return f"{normalize_name(name)}\0{(country or '').strip().upper()}".encode()
+
+
+def build_gazetteer_index(
+    dump_path=GAZETTEER_DUMP_PATH, index_path=GAZETTEER_INDEX_PATH,
+    include_alternate_names=False, feature_classes=("P",), min_population=0
+):
+    """
+    Compiles a GeoNames dump into the binary index (written atomically).
+
+    Args:
+        dump_path (str): Tab-separated GeoNames file (geoname table format).
+        index_path (str): Output index file.
+        include_alternate_names (bool): Also index every alternate name (exonyms,
+            other scripts); makes the index several times larger.
+        feature_classes (tuple): GeoNames feature classes kept ("P" = populated places).
+        min_population (int): Skip smaller places.
+
+    Returns:
+        int: Number of index entries.
+    """
+    started = time.perf_counter()
+    entries = []
+    with open(dump_path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) <= _COL_POPULATION or cols[_COL_FEATURE_CLASS] not in feature_classes:
+                continue
+            population = int(cols[_COL_POPULATION] or 0)
+            if population < min_population:
+                continue
+            name, country = cols[_COL_NAME], cols[_COL_COUNTRY]
+            latitude, longitude = float(cols[_COL_LATITUDE]), float(cols[_COL_LONGITUDE])
+            names = {name, cols[_COL_ASCII_NAME]}
+            if include_alternate_names and cols[_COL_ALTERNATE_NAMES]:
+                names.update(cols[_COL_ALTERNATE_NAMES].split(","))
+            # Distinct keys only: name and ascii name usually normalize identically
+            for key in {_entry_key(n, country) for n in names if n}:
+                entries.append((key, -population, name.encode(), latitude, longitude, min(population, 2 ** 32 - 1)))
+    entries.sort(key=lambda e: (e[0], e[1]))
+
+    key_offsets, name_offsets = array.array("I", [0]), array.array("I", [0])
+    keys_blob, names_blob = bytearray(), bytearray()
+    latitudes, longitudes, populations = array.array("f"), array.array("f"), array.array("I")
+    for key, _, name, latitude, longitude, population in entries:
+        keys_blob += key
+        names_blob += name
+        key_offsets.append(len(keys_blob))
+        name_offsets.append(len(names_blob))
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+        populations.append(population)
+
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, len(entries), len(keys_blob), len(names_blob), 0))
+        for part in (key_offsets, name_offsets, latitudes, longitudes, populations):
+            f.write(part.tobytes())
+        f.write(keys_blob)
+        f.write(names_blob)
+    os.replace(tmp_path, index_path)
+    print(f"✅ Gazetteer index: {len(entries)} entries from {dump_path} -> {index_path} "
+          f"({os.path.getsize(index_path) / 1e6:.1f} MB, {time.perf_counter() - started:.1f}s)")
+    return len(entries)
+
+
+class GazetteerIndex:
+    """Read-only, memory-mapped view of a gazetteer index file."""
+
+    def __init__(self, index_path=GAZETTEER_INDEX_PATH):
+        self.path = index_path
+        with open(index_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, count, keys_size, names_size, _ = _HEADER.unpack_from(view)
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{index_path} is not a gazetteer index (rebuild it with `build`)")
+        self.count = count
+
+        position = _HEADER.size
+        def take(fmt, n):
+            nonlocal position
+            size = n * array.array(fmt).itemsize
+            part = view[position:position + size].cast(fmt)
+            position += size
+            return part
+        self._key_offsets = take("I", count + 1)
+        self._name_offsets = take("I", count + 1)
+        self._latitudes = take("f", count)
+        self._longitudes = take("f", count)
+        self._populations = take("I", count)
+        self._keys = view[position:position + keys_size]
+        self._names = view[position + keys_size:position + keys_size + names_size]
+
+    def _key(self, i):
+        return self._keys[self._key_offsets[i]:self._key_offsets[i + 1]].tobytes()
+
+    def _lower_bound(self, prefix):
+        """First position whose key is >= prefix."""
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < prefix:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _entry(self, i):
+        key = self._key(i)
+        return {
+            "name": self._names[self._name_offsets[i]:self._name_offsets[i + 1]].tobytes().decode(),
+            "country": key[key.index(b"\0") + 1:].decode(),
+            # float32 storage: round to the 4 decimals (~10 m) the geocoding API returns
+            "latitude": round(self._latitudes[i], 4),
+            "longitude": round(self._longitudes[i], 4),
+            "population": self._populations[i],
+        }
+
+    def lookup(self, name, country=None, limit=1):
+        """
+        Exact (normalized) name match, most populous first.
+
+        Args:
+            name (str): City name.
+            country (str, optional): ISO Alpha-2 filter.
+            limit (int): Max matches.
+
+        Returns:
+            list[dict]: name, country, latitude, longitude, population per match.
+        """
+        prefix = _entry_key(name, country) if country else normalize_name(name).encode() + b"\0"
+        matches = []
+        i = self._lower_bound(prefix)
+        while i < self.count and self._key(i).startswith(prefix):
+            # Without a country filter the range covers every country; keep the biggest places
+            matches.append(i)
+            i += 1
+            if country and len(matches) >= limit:
+                break
+        if not country:
+            matches.sort(key=lambda j: -self._populations[j])
+        return [self._entry(j) for j in matches[:limit]]
+
+    def prefix_lookup(self, prefix, country=None, limit=10, max_scan=100000):
+        """
+        Names starting with `prefix` (normalized), in alphabetical key order.
+
+        Args:
+            prefix (str): Name prefix, e.g. "san fr".
+            country (str, optional): ISO Alpha-2 filter.
+            limit (int): Max matches.
+            max_scan (int): Max index entries examined after the first candidate
+                (bounds the cost of very short prefixes with a country filter).
+
+        Returns:
+            list[dict]: Same shape as lookup().
+        """
+        key_prefix = normalize_name(prefix).encode()
+        if prefix[-1:].isspace():
+            key_prefix += b" "   # "San " should not match "Santos"
+        country = (country or "").strip().upper().encode()
+        matches = []
+        i = start = self._lower_bound(key_prefix)
+        while i < self.count and len(matches) < limit and i - start < max_scan:
+            key = self._key(i)
+            if not key.startswith(key_prefix):
+                break
+            if not country or key.endswith(b"\0" + country):
+                matches.append(self._entry(i))
+            i += 1
+        return matches
+
+    def resolve_many(self, queries):
+        """
+        Bulk exact lookup.
+
+        Args:
+            queries (Iterable[tuple]): (city_name, country) pairs (country may be None).
+
+        Returns:
+            list: (latitude, longitude) or None per query, in input order.
+        """
+        resolved = []
+        for city_name, country in queries:
+            match = self.lookup(city_name, country)
+            resolved.append((match[0]["latitude"], match[0]["longitude"]) if match else None)
+        return resolved
+
+    def close(self):
+        for part in (self._key_offsets, self._name_offsets, self._latitudes, self._longitudes,
+                     self._populations, self._keys, self._names):
+            part.release()
+        self._mmap.close()
+
+
+_gazetteers = {}
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer(index_path=GAZETTEER_INDEX_PATH, dump_path=GAZETTEER_DUMP_PATH):
+    """
+    Returns the shared index for `index_path` (opened on first use). The index is
+    (re)built from `dump_path` when it is missing or older than the dump.
+
+    Raises:
+        FileNotFoundError: If neither the index nor the dump exists.
+    """
+    with _gazetteer_lock:
+        index = _gazetteers.get(index_path)
+        if index is None:
+            stale = os.path.exists(dump_path) and (
+                not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(dump_path)
+            )
+            if stale:
+                build_gazetteer_index(dump_path, index_path)
+            if not os.path.exists(index_path):
+                raise FileNotFoundError(f"No gazetteer index at {index_path} and no dump at {dump_path}")
+            index = _gazetteers[index_path] = GazetteerIndex(index_path)
+        return index
+
+
+def lookup_city_coordinates(city_name, country=None, index_path=GAZETTEER_INDEX_PATH):
+    """
+    Gazetteer counterpart of geocode_utils._fetch_city_coordinates.
+
+    Returns:
+        tuple: (latitude, longitude), or (None, None) if the name is not in the index.
+    """
+    match = get_gazetteer(index_path).lookup(city_name, country)
+    if not match:
+        return None, None
+    return match[0]["latitude"], match[0]["longitude"]
+
+
+if __name__ == "__main__":
+    from config.constants import CITIES_CSV_PATH
+    from helpers.city_utils import load_city_list
+
+    parser = argparse.ArgumentParser(description="Offline GeoNames gazetteer")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Compile a GeoNames dump into the index")
+    build.add_argument("--dump", default=GAZETTEER_DUMP_PATH)
+    build.add_argument("--index", default=GAZETTEER_INDEX_PATH)
+    build.add_argument("--alternate-names", action="store_true", help="Index alternate names too")
+    build.add_argument("--min-population", type=int, default=0)
+    lookup = commands.add_parser("lookup", help="Look up one name")
+    lookup.add_argument("name")
+    lookup.add_argument("--country")
+    lookup.add_argument("--prefix", action="store_true", help="Prefix instead of exact match")
+    lookup.add_argument("--limit", type=int, default=5)
+    lookup.add_argument("--index", default=GAZETTEER_INDEX_PATH)
+    resolve = commands.add_parser("resolve", help="Resolve every city of a cities CSV")
+    resolve.add_argument("--cities", default=CITIES_CSV_PATH)
+    resolve.add_argument("--index", default=GAZETTEER_INDEX_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_gazetteer_index(args.dump, args.index, args.alternate_names, min_population=args.min_population)
+    elif args.command == "lookup":
+        index = get_gazetteer(args.index)
+        started = time.perf_counter()
+        if args.prefix:
+            matches = index.prefix_lookup(args.name, args.country, args.limit)
+        else:
+            matches = index.lookup(args.name, args.country, args.limit)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        for match in matches:
+            print(f"  {match['name']}, {match['country']}: {match['latitude']}, {match['longitude']} "
+                  f"(population {match['population']})")
+        print(f"ℹ️  {len(matches)} match(es) in {elapsed_us:.0f} µs")
+    else:
+        cities = load_city_list(args.cities)
+        index = get_gazetteer(args.index)
+        started = time.perf_counter()
+        resolved = index.resolve_many((city["city_name"], city["country"]) for city in cities)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for city, coordinates in zip(cities, resolved):
+            if coordinates is None:
+                print(f"  ❌ {city['location']}: not found")
+        found = sum(1 for c in resolved if c is not None)
+        print(f"✅ Resolved {found}/{len(cities)} cities in {elapsed_ms:.1f} ms")
@@ -0,0 +1,183 @@
+# helpers/geocode_cache.py
+# =====================================================
+# Module: geocode_cache
+#
+# Two-level cache for city coordinates:
+#   1. In-process LRU (OrderedDict) - avoids even a SQLite read for hot cities.
+#   2. SQLite table `geocode_cache` - survives restarts and is shared by workers.
+#
+# Entries are keyed on (normalized city name, country code). City coordinates
+# do not change, so entries never expire unless a TTL is configured. Expired
+# entries are still kept so they can be served as a fallback when the geocoding
+# API is down (see geocode_utils.get_city_coordinates).
+#
+# Usage:
+#   from helpers.geocode_cache import get_cached_coordinates, store_coordinates
+#   coords = get_cached_coordinates("Lisbon", "PT")   # (lat, lon) or None
+#
+# Dependencies:
+#   - sqlite3 (Python standard library)
+# =====================================================
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config.constants import (
+    GEOCODE_CACHE_DB_PATH, GEOCODE_CACHE_TTL_SECONDS, GEOCODE_CACHE_LRU_SIZE
+)
+
+# (city_key, country) -> (latitude, longitude, fetched_at)
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _cache_key(city_name, country=None):
+    return city_name.strip().lower(), (country or "").strip().upper()
+
+
+def _lru_get(key):
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry is not None:
+            _lru.move_to_end(key)
+        return entry
+
+
+def _lru_put(key, entry):
+    with _lru_lock:
+        _lru[key] = entry
+        _lru.move_to_end(key)
+        while len(_lru) > GEOCODE_CACHE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _is_expired(fetched_at, ttl_seconds):
+    return ttl_seconds is not None and time.time() - fetched_at > ttl_seconds
+
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS geocode_cache (
+            city_key TEXT NOT NULL,
+            country TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL,
+            fetched_at REAL NOT NULL,
+            PRIMARY KEY (city_key, country)
+        )
+    """)
+    return conn
+
+
+def get_cached_coordinates(
+    city_name,
+    country=None,
+    db_path=GEOCODE_CACHE_DB_PATH,
+    ttl_seconds=GEOCODE_CACHE_TTL_SECONDS,
+    allow_stale=False
+):
+    """
+    Looks up cached coordinates, checking the in-process LRU before SQLite.
+
+    Args:
+        city_name (str): City name (matched case-insensitively).
+        country (str, optional): ISO Alpha-2 country code.
+        db_path (str): Path to the cache SQLite file.
+        ttl_seconds (float, optional): Max entry age; None means entries never expire.
+        allow_stale (bool): Return expired entries too (used as outage fallback).
+
+    Returns:
+        tuple | None: (latitude, longitude), or None on a miss/expired entry.
+    """
+    key = _cache_key(city_name, country)
+    entry = _lru_get(key)
+
+    if entry is None:
+        conn = _connect(db_path)
+        try:
+            entry = conn.execute(
+                "SELECT latitude, longitude, fetched_at FROM geocode_cache WHERE city_key = ? AND country = ?",
+                key
+            ).fetchone()
+        finally:
+            conn.close()
+        if entry is None:
+            return None
+        _lru_put(key, entry)
+
+    latitude, longitude, fetched_at = entry
+    if not allow_stale and _is_expired(fetched_at, ttl_seconds):
+        return None
+    return latitude, longitude
+
+
+def store_coordinates(city_name, country, latitude, longitude, db_path=GEOCODE_CACHE_DB_PATH):
+    """
+    Saves (or refreshes) coordinates for a city in both cache levels.
+
+    Args:
+        city_name (str): City name.
+        country (str, optional): ISO Alpha-2 country code.
+        latitude (float): Latitude (WGS84).
+        longitude (float): Longitude (WGS84).
+        db_path (str): Path to the cache SQLite file.
+    """
+    key = _cache_key(city_name, country)
+    entry = (latitude, longitude, time.time())
+    conn = _connect(db_path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache (city_key, country, latitude, longitude, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (*key, *entry)
+            )
+    finally:
+        conn.close()
+    _lru_put(key, entry)
+
+
+def invalidate_coordinates(city_name=None, country=None, db_path=GEOCODE_CACHE_DB_PATH):
+    """
+    Removes cached coordinates so the next lookup goes back to the geocoding API.
+
+    Args:
+        city_name (str, optional): City to drop. If None, drops every entry
+            (restricted to `country` when one is given).
+        country (str, optional): ISO Alpha-2 country code.
+        db_path (str): Path to the cache SQLite file.
+
+    Returns:
+        int: Number of SQLite rows removed.
+    """
+    conn = _connect(db_path)
+    try:
+        with conn:
+            if city_name is not None:
+                key = _cache_key(city_name, country)
+                removed = conn.execute(
+                    "DELETE FROM geocode_cache WHERE city_key = ? AND country = ?", key
+                ).rowcount
+            elif country is not None:
+                removed = conn.execute(
+                    "DELETE FROM geocode_cache WHERE country = ?", (country.strip().upper(),)
+                ).rowcount
+            else:
+                removed = conn.execute("DELETE FROM geocode_cache").rowcount
+    finally:
+        conn.close()
+
+    with _lru_lock:
+        if city_name is not None:
+            _lru.pop(_cache_key(city_name, country), None)
+        elif country is not None:
+            for key in [k for k in _lru if k[1] == country.strip().upper()]:
+                del _lru[key]
+        else:
+            _lru.clear()
+
+    print(f"ℹ️  Invalidated {removed} geocode cache entries")
+    return removed
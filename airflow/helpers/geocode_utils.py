@@ -1,29 +1,151 @@
-import requests
-from config.constants import GEOCODING_API_URL
+from config.constants import (
+    GEOCODING_API_URL, CITIES_CSV_PATH, GEOCODER_BACKEND, API, GAZETTEER, GAZETTEER_API_FALLBACK
+)
+from helpers import metrics
+from helpers.city_utils import load_city_list
+from helpers.gazetteer import get_gazetteer, lookup_city_coordinates
+from helpers.geocode_cache import get_cached_coordinates, store_coordinates
+from helpers.http_client import get_json, HTTPClientError
 
-def get_city_coordinates(city_name, country=None):
+def get_city_coordinates(city_name, country=None, use_cache=True, backend=GEOCODER_BACKEND):
     """
     Returns (latitude, longitude) for city_name using Open-Meteo's geocoding API.
     If country is supplied, narrows the search.
-    Raises ValueError if no result found.
+    Returns (None, None) if no result found.
+
+    With use_cache=True (default) the geocode cache is checked first and API results
+    are stored in it. If the API is unavailable (HTTPClientError), an expired cache
+    entry is still returned so a geocoder outage does not break an otherwise healthy
+    archive fetch.
+
+    With backend=GAZETTEER the local GeoNames index answers instead (no cache needed:
+    an index lookup is cheaper than a cache read). Names missing from the dump go to
+    the API path only if GAZETTEER_API_FALLBACK is set.
+
+    Raises:
+        requests.HTTPError: On a non-retryable 4xx response from the geocoding API.
+        HTTPClientError: If the API is unavailable and no cached entry exists.
+    """
+    if backend == GAZETTEER:
+        latitude, longitude = lookup_city_coordinates(city_name, country)
+        if latitude is not None:
+            metrics.increment("geocode_lookups_total", source="gazetteer")
+            return latitude, longitude
+        if not GAZETTEER_API_FALLBACK:
+            print(f"No gazetteer entry for city '{city_name}' with country '{country}'.")
+            metrics.increment("geocode_lookups_total", source="failed")
+            return None, None
+
+    if use_cache:
+        cached = get_cached_coordinates(city_name, country)
+        if cached is not None:
+            metrics.increment("geocode_lookups_total", source="cache")
+            return cached
+
+    try:
+        latitude, longitude = _fetch_city_coordinates(city_name, country)
+    except HTTPClientError as e:
+        stale = get_cached_coordinates(city_name, country, allow_stale=True) if use_cache else None
+        if stale is None:
+            metrics.increment("geocode_lookups_total", source="failed")
+            raise
+        print(f"⚠️ Geocoding API unavailable ({e}); using expired cached coordinates for '{city_name}' ({country})")
+        metrics.increment("geocode_lookups_total", source="stale")
+        return stale
+
+    if use_cache and latitude is not None:
+        store_coordinates(city_name, country, latitude, longitude)
+
+    metrics.increment("geocode_lookups_total", source="api" if latitude is not None else "failed")
+    return latitude, longitude
+
+
+def _fetch_city_coordinates(city_name, country=None):
+    """
+    Single geocoding API round trip (no caching).
+    Returns (None, None) if the city is not found; HTTP errors propagate (see get_json).
     """
     url = GEOCODING_API_URL
     params = {'name': city_name, 'count': 1}
     if country:
         params['country'] = country
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        results = data.get('results', [])
-        if results:
-            latitude = results[0]['latitude']
-            longitude = results[0]['longitude']
-            return latitude, longitude
-        else:
-            print(f"No results found for city '{city_name}' with country '{country}'. API response: {data}")
-            return None, None
-    except Exception as e:
-        print(f"Error fetching geocoding API: {e}")
+    data = get_json(url, params=params, timeout=10)
+    results = data.get('results', [])
+    if results:
+        latitude = results[0]['latitude']
+        longitude = results[0]['longitude']
+        return latitude, longitude
+    else:
+        print(f"No results found for city '{city_name}' with country '{country}'. API response: {data}")
         return None, None
 
+
+def resolve_city_coordinates(cities, backend=GEOCODER_BACKEND):
+    """
+    Resolves coordinates for a whole city list in one call.
+
+    With the GAZETTEER backend this is a local bulk lookup (thousands of cities in
+    milliseconds); with the API backend each city goes through get_city_coordinates.
+
+    Args:
+        cities (list[dict]): Entries as returned by city_utils.load_city_list.
+
+    Returns:
+        dict: location key -> (latitude, longitude), or None if the city was not found.
+
+    Raises:
+        requests.HTTPError / HTTPClientError: From API lookups, see get_city_coordinates.
+    """
+    results = {}
+    remaining = cities
+    if backend == GAZETTEER:
+        resolved = get_gazetteer().resolve_many((city["city_name"], city["country"]) for city in cities)
+        results = dict(zip((city["location"] for city in cities), resolved))
+        remaining = [city for city in cities if results[city["location"]] is None]
+        metrics.increment("geocode_lookups_total", len(cities) - len(remaining), source="gazetteer")
+        if not GAZETTEER_API_FALLBACK:
+            metrics.increment("geocode_lookups_total", len(remaining), source="failed")
+            return results
+
+    # API backend, or gazetteer misses with GAZETTEER_API_FALLBACK
+    for city in remaining:
+        latitude, longitude = get_city_coordinates(city["city_name"], city["country"], backend=API)
+        results[city["location"]] = (latitude, longitude) if latitude is not None else None
+    return results
+
+
+def warm_geocode_cache(csv_path=CITIES_CSV_PATH, refresh=False):
+    """
+    Bulk-loads coordinates for every city in a cities CSV into the geocode cache.
+
+    Args:
+        csv_path (str): Cities CSV (same format as config/cities.csv).
+        refresh (bool): Re-query the API even for cities already cached.
+
+    Returns:
+        dict: Counts of 'cached' (already present), 'fetched' and 'failed' cities.
+    """
+    counts = {"cached": 0, "fetched": 0, "failed": 0}
+    for city in load_city_list(csv_path):
+        if not refresh and get_cached_coordinates(city["city_name"], city["country"]) is not None:
+            counts["cached"] += 1
+            continue
+        try:
+            latitude, longitude = _fetch_city_coordinates(city["city_name"], city["country"])
+        except HTTPClientError as e:
+            # Transient outage: the city is picked up by the next warm-up
+            print(f"Error fetching geocoding API for '{city['city_name']}': {e}")
+            latitude = None
+        if latitude is None:
+            counts["failed"] += 1
+            continue
+        store_coordinates(city["city_name"], city["country"], latitude, longitude)
+        counts["fetched"] += 1
+
+    print(f"✅ Geocode cache warm-up: {counts}")
+    return counts
+
+
+if __name__ == "__main__":
+    import sys
+    warm_geocode_cache(sys.argv[1] if len(sys.argv) > 1 else CITIES_CSV_PATH)
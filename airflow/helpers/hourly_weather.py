@@ -0,0 +1,165 @@
+# helpers/hourly_weather.py
+# =====================================================
+# Module: hourly_weather
+#
+# Hourly-resolution ingestion from the Open-Meteo archive API into the
+# `weather_hourly` table (schema v5, see helpers.db_utils).
+#
+# Hourly data is 24x the daily row count, so a multi-decade pull is hundreds
+# of MB of JSON. Instead of json-decoding the response and validating it
+# element by element through Pydantic lists, each request is:
+#   1. streamed to a temporary file (response_cache.cached_download_to_file)
+#   2. read back in fixed-size column batches (helpers.json_stream)
+#   3. validated per batch with Polars (columnar_validation.validate_hourly_columns)
+#   4. inserted batch by batch, one transaction each (db_loader.insert_hourly_batches)
+# Peak memory is bounded by HOURLY_BATCH_SIZE, not by the length of the range.
+#
+# Times are requested and stored in UTC ("YYYY-MM-DDTHH:MM"): local time repeats
+# an hour when DST ends, which would collide on the (location, time) key.
+#
+# Usage:
+#   load_hourly_weather(DB_PATH, "Lisbon", "PT", "1990-01-01", "2020-12-31")
+#   python -m helpers.hourly_weather --start 1990-01-01 --end 2020-12-31
+#
+# Dependencies:
+#   - polars
+#   - helpers.json_stream, helpers.columnar_validation, helpers.db_loader
+# =====================================================
+
+import argparse
+import os
+import resource
+import sqlite3
+import tempfile
+from typing import Iterator
+import polars as pl
+from helpers.city_utils import make_location_key
+from helpers.columnar_validation import HOURLY_COLUMN_MAP, validate_hourly_columns
+from helpers.date_utils import split_date_range
+from helpers.db_loader import insert_hourly_batches
+from helpers.geocode_utils import get_city_coordinates
+from helpers.response_cache import cached_download_to_file, evict_response
+from helpers.json_stream import locate_arrays, iter_column_batches
+from helpers.schemas import WeatherMetadata
+from config.constants import (
+    CITY_NAME, COUNTRY, WEATHER_API_URL, HOURLY_VARIABLES, HOURLY_BATCH_SIZE,
+    FETCH_CHUNK_YEARS, STAGING_DIR, DB_PATH
+)
+
+HOURLY_TIMEZONE = "GMT"
+
+
+def iter_hourly_batches(
+    json_path: str, hourly_variables: list = HOURLY_VARIABLES, batch_size: int = HOURLY_BATCH_SIZE
+) -> Iterator[pl.DataFrame]:
+    """
+    Reads a saved archive response incrementally and yields validated hourly batches.
+
+    Args:
+        json_path (str): File holding one (single-location) archive API response.
+        hourly_variables (list): Variables to read (see HOURLY_COLUMN_MAP); absent ones come back null.
+        batch_size (int): Rows per yielded batch.
+
+    Yields:
+        pl.DataFrame: weather_hourly-shaped batches (time + HOURLY_COLUMN_MAP columns), in time order.
+
+    Raises:
+        pydantic.ValidationError: If the metadata envelope is invalid.
+        ColumnarValidationError: If a batch fails validation.
+        ValueError: If the response has no hourly block or is malformed.
+    """
+    variables = [v for v in hourly_variables if v in HOURLY_COLUMN_MAP]
+    metadata, offsets = locate_arrays(json_path, [("hourly", v) for v in ["time"] + variables])
+    WeatherMetadata.model_validate(metadata)
+    if ("hourly", "time") not in offsets:
+        raise ValueError(f"{json_path} has no hourly.time series")
+
+    columns = {v: offsets[("hourly", v)] for v in ["time"] + variables if ("hourly", v) in offsets}
+    last_time = None
+    for batch in iter_column_batches(json_path, columns, batch_size):
+        frame = validate_hourly_columns(batch, after=last_time)
+        last_time = batch["time"][-1]
+        yield frame
+
+
+def load_hourly_weather(
+    db_path: str = DB_PATH,
+    city_name: str = CITY_NAME,
+    country: str = COUNTRY,
+    start_date: str = None,
+    end_date: str = None,
+    weather_api_url: str = WEATHER_API_URL,
+    hourly_variables: list = HOURLY_VARIABLES,
+    chunk_years: int = FETCH_CHUNK_YEARS,
+    batch_size: int = HOURLY_BATCH_SIZE,
+    staging_dir: str = STAGING_DIR
+) -> int:
+    """
+    Fetches hourly data for one city over [start_date, end_date] and loads it into weather_hourly.
+
+    The range is requested in calendar-aligned chunks of `chunk_years`; each chunk is
+    downloaded to a temporary file in `staging_dir`, streamed into the DB in
+    `batch_size`-row batches and deleted. Chunks are processed one at a time.
+
+    Returns:
+        int: Rows inserted.
+
+    Raises:
+        RuntimeError: If the city could not be geocoded (nothing is fetched), or after
+            the other chunks were loaded, if some chunks failed.
+            Loaded chunks stay valid (inserts are idempotent, so a rerun is safe).
+    """
+    lat, lon = get_city_coordinates(city_name, country)
+    if lat is None:
+        raise RuntimeError(f"No coordinates for {city_name}, {country}; nothing fetched")
+
+    location = make_location_key(city_name, country)
+    os.makedirs(staging_dir, exist_ok=True)
+    total, failed = 0, []
+
+    for chunk_start, chunk_end in split_date_range(start_date, end_date, chunk_years):
+        fd, path = tempfile.mkstemp(prefix="hourly_", suffix=".json", dir=staging_dir)
+        os.close(fd)
+        params = {
+            'latitude': lat,
+            'longitude': lon,
+            'start_date': chunk_start,
+            'end_date': chunk_end,
+            'hourly': ','.join(hourly_variables),
+            'timezone': HOURLY_TIMEZONE,
+        }
+        try:
+            size = cached_download_to_file(weather_api_url, path, params=params)
+            print(f"ℹ️  Downloaded {size / 1e6:.1f} MB of hourly data for {city_name} {chunk_start}..{chunk_end}")
+            total += insert_hourly_batches(db_path, iter_hourly_batches(path, hourly_variables, batch_size), location)
+        except Exception as e:
+            print(f"❌ Hourly chunk {chunk_start}..{chunk_end} failed for {city_name}: {e}")
+            failed.append((chunk_start, chunk_end))
+            if not isinstance(e, sqlite3.Error):
+                # Possibly a bad body: the cache must not replay it to the rerun
+                evict_response(weather_api_url, params)
+        finally:
+            os.remove(path)
+
+    if failed:
+        ranges = ", ".join(f"{start}..{end}" for start, end in failed)
+        raise RuntimeError(f"{len(failed)} hourly chunk(s) failed for {city_name}: {ranges}")
+    print(f"✅ Hourly load finished: {total} new hours for {location}")
+    return total
+
+
+if __name__ == "__main__":
+    from helpers.db_utils import create_weather_table
+
+    parser = argparse.ArgumentParser(description="Load hourly archive data into weather_hourly")
+    parser.add_argument("--city", default=CITY_NAME)
+    parser.add_argument("--country", default=COUNTRY)
+    parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--batch-size", type=int, default=HOURLY_BATCH_SIZE)
+    args = parser.parse_args()
+
+    create_weather_table(DB_PATH)
+    load_hourly_weather(DB_PATH, args.city, args.country, args.start, args.end, batch_size=args.batch_size)
+    # ru_maxrss is in KB on Linux
+    print(f"ℹ️  Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
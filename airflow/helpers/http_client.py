@@ -0,0 +1,192 @@
+# helpers/http_client.py
+# =====================================================
+# Module: http_client
+#
+# Shared HTTP client for all Open-Meteo calls (geocoding + archive).
+#
+# - One keep-alive `requests.Session` per process with a sized connection pool,
+#   so repeated calls reuse TCP/TLS connections instead of re-handshaking.
+# - Retries with exponential backoff and full jitter on 429/5xx responses and
+#   connection errors (a `Retry-After` header is honoured when present).
+# - A process-wide token-bucket rate limiter that paces every request, so
+#   mapped/parallel fetches stay under the API quota instead of getting throttled.
+#
+# Usage:
+#   from helpers.http_client import get_json, download_to_file
+#   data = get_json(WEATHER_API_URL, params={...}, timeout=30)
+#   download_to_file(WEATHER_API_URL, "data/staging/x.json", params={...})  # large bodies
+#
+# Dependencies:
+#   - requests
+# =====================================================
+
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from helpers import metrics
+from config.constants import (
+    HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES, HTTP_BACKOFF_BASE_SECONDS,
+    HTTP_BACKOFF_MAX_SECONDS, HTTP_RATE_LIMIT_PER_SECOND, HTTP_RATE_LIMIT_BURST
+)
+
+# Status codes worth retrying: throttling and transient server-side failures
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HTTPClientError(Exception):
+    """Raised when a request still fails after all retries."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+
+    Tokens refill continuously at `rate` per second up to `capacity`.
+    `acquire()` blocks until a token is available.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = TokenBucket(HTTP_RATE_LIMIT_PER_SECOND, HTTP_RATE_LIMIT_BURST)
+
+
+def get_session() -> requests.Session:
+    """Returns the shared keep-alive session (created on first use)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retries are handled in _get_with_retries so backoff and rate limiting stay in one place
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def configure_rate_limiter(rate_per_second: float, burst: int):
+    """
+    Replaces the shared rate limiter, e.g. to match a paid Open-Meteo quota.
+
+    Args:
+        rate_per_second (float): Sustained requests per second.
+        burst (int): Max requests allowed back-to-back.
+    """
+    global _rate_limiter
+    _rate_limiter = TokenBucket(rate_per_second, burst)
+
+
+def _backoff_delay(attempt: int, retry_after=None) -> float:
+    """Exponential backoff with full jitter; a server Retry-After wins if larger."""
+    delay = random.uniform(0, min(HTTP_BACKOFF_MAX_SECONDS, HTTP_BACKOFF_BASE_SECONDS * 2 ** attempt))
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), HTTP_BACKOFF_MAX_SECONDS))
+        except ValueError:
+            pass  # HTTP-date form of Retry-After; keep the computed delay
+    return delay
+
+
+def _get_with_retries(url, params, timeout, max_retries, stream=False) -> requests.Response:
+    """Rate-limited GET with backoff on retryable failures; returns the successful response."""
+    session = get_session()
+    endpoint = urlsplit(url).path
+    last_error = None
+
+    for attempt in range(max_retries + 1):
+        _rate_limiter.acquire()
+        retry_after = None
+        started = time.perf_counter()
+        try:
+            response = session.get(url, params=params, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.observe("http_request_seconds", time.perf_counter() - started, endpoint=endpoint, status="error")
+            last_error = e
+        else:
+            metrics.observe(
+                "http_request_seconds", time.perf_counter() - started, endpoint=endpoint, status=response.status_code
+            )
+            if response.status_code not in RETRY_STATUS_CODES:
+                response.raise_for_status()
+                return response
+            last_error = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+            retry_after = response.headers.get("Retry-After")
+            response.close()
+
+        if attempt < max_retries:
+            metrics.increment("http_retries_total", endpoint=endpoint)
+            delay = _backoff_delay(attempt, retry_after)
+            print(f"⚠️ Request failed ({last_error}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    raise HTTPClientError(f"GET {url} failed after {max_retries + 1} attempts: {last_error}") from last_error
+
+
+def get_json(url: str, params: dict = None, timeout: float = 30, max_retries: int = HTTP_MAX_RETRIES):
+    """
+    Rate-limited GET through the shared session, returning the decoded JSON body.
+
+    Args:
+        url (str): Endpoint URL.
+        params (dict, optional): Query parameters.
+        timeout (float): Per-attempt timeout in seconds.
+        max_retries (int): Retries after the first attempt for retryable failures.
+
+    Returns:
+        The parsed JSON payload (dict or list).
+
+    Raises:
+        requests.HTTPError: On a non-retryable 4xx response.
+        HTTPClientError: When retryable failures persist after all retries.
+    """
+    response = _get_with_retries(url, params, timeout, max_retries)
+    metrics.increment("http_response_bytes_total", len(response.content), endpoint=urlsplit(url).path)
+    return response.json()
+
+
+def download_to_file(
+    url: str, dest_path: str, params: dict = None, timeout: float = 60,
+    max_retries: int = HTTP_MAX_RETRIES, chunk_size: int = 1 << 16
+) -> int:
+    """
+    Like get_json, but streams the response body to `dest_path` in `chunk_size` pieces
+    instead of decoding it, so very large responses never sit in memory.
+
+    Returns:
+        int: Bytes written.
+
+    Raises:
+        requests.HTTPError: On a non-retryable 4xx response.
+        HTTPClientError: When retryable failures persist after all retries.
+    """
+    written = 0
+    with _get_with_retries(url, params, timeout, max_retries, stream=True) as response:
+        with open(dest_path, "wb") as f:
+            for block in response.iter_content(chunk_size=chunk_size):
+                f.write(block)
+                written += len(block)
+    metrics.increment("http_response_bytes_total", written, endpoint=urlsplit(url).path)
+    return written
@@ -0,0 +1,256 @@
+# helpers/json_stream.py
+# =====================================================
+# Module: json_stream
+#
+# Incremental reader for large, column-oriented JSON documents such as
+# Open-Meteo archive responses:
+#   {"latitude": .., "timezone": .., "hourly": {"time": [...], "temperature_2m": [...]}}
+#
+# Because the series are stored column by column, rows can only be rebuilt
+# by reading all columns side by side. This module does that without loading
+# the document:
+#   1. locate_arrays() makes one buffered pass over the file, collecting the
+#      top-level scalars (the metadata envelope) and the byte offset of each
+#      requested array. Array contents are skipped, not parsed.
+#   2. iter_column_batches() opens one file handle per column at its offset and
+#      reads the arrays in lockstep, yielding fixed-size column batches.
+# Memory is bounded by the block size and batch size, not by the document size.
+#
+# Assumption: requested arrays are flat arrays of numbers, null or strings
+# without ',' / ']' (true for Open-Meteo times and values).
+#
+# Usage:
+#   meta, offsets = locate_arrays(path, [("hourly", "time"), ("hourly", "temperature_2m")])
+#   for batch in iter_column_batches(path, {"time": offsets[("hourly", "time")], ...}, 10000):
+#       ...  # batch: dict column -> list of up to 10000 values
+#
+# Dependencies:
+#   - Python standard library only
+# =====================================================
+
+import json
+import re
+from typing import Dict, Iterator, List, Tuple
+
+_WHITESPACE = re.compile(rb"\s*")
+_SCALAR = re.compile(rb'[^\s{}\[\],:"]+')
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+
+class _Scanner:
+    """Buffered forward-only tokenizer over a binary file (used by locate_arrays)."""
+
+    def __init__(self, f, block_size):
+        self.f = f
+        self.block_size = block_size
+        self.buf = b""
+        self.pos = 0
+        self.base = 0   # absolute file offset of buf[0]
+
+    def more(self):
+        """Drops consumed bytes and reads another block; False at end of file."""
+        block = self.f.read(self.block_size)
+        if not block:
+            return False
+        self.base += self.pos
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos:self.pos + 1]
+            if not self.more():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Malformed JSON at byte {self.base + self.pos}: expected {char!r}")
+        self.pos += 1
+
+    def string(self):
+        self.expect(b'"')
+        start = self.pos - 1
+        search = self.pos
+        while True:
+            end = self.buf.find(b'"', search)
+            if end == -1:
+                offset = len(self.buf) - start
+                self.pos = start
+                if not self.more():
+                    raise ValueError("Malformed JSON: unterminated string")
+                start, search = 0, offset
+                continue
+            backslashes = len(self.buf[start:end]) - len(self.buf[start:end].rstrip(b"\\"))
+            if backslashes % 2:
+                search = end + 1
+                continue
+            self.pos = end + 1
+            return json.loads(self.buf[start:end + 1])
+
+    def scalar(self):
+        while True:
+            match = _SCALAR.match(self.buf, self.pos)
+            if match is None:
+                raise ValueError(f"Malformed JSON at byte {self.base + self.pos}")
+            # A scalar touching the end of the buffer may continue in the next block
+            if match.end() == len(self.buf) and self.more():
+                continue
+            self.pos = match.end()
+            return json.loads(match.group())
+
+    def skip_flat_array(self):
+        """Skips to just past the closing ']' of a flat array (opening '[' already consumed)."""
+        while True:
+            end = self.buf.find(b"]", self.pos)
+            if end != -1:
+                self.pos = end + 1
+                return
+            self.pos = len(self.buf)
+            if not self.more():
+                raise ValueError("Malformed JSON: unterminated array")
+
+
+def locate_arrays(
+    path: str, array_paths: List[Tuple[str, ...]], block_size: int = DEFAULT_BLOCK_SIZE
+) -> Tuple[dict, Dict[Tuple[str, ...], int]]:
+    """
+    Single streaming pass over a JSON object document.
+
+    Args:
+        path (str): JSON file to scan.
+        array_paths (list[tuple]): Key paths of the arrays to locate, e.g. ("hourly", "time").
+        block_size (int): Bytes read per I/O call.
+
+    Returns:
+        tuple: (top-level scalar members as a dict, {array path: byte offset just past its '['}).
+            Requested paths that are absent (or not arrays) are left out of the offsets.
+
+    Raises:
+        ValueError: If the document is malformed.
+    """
+    targets = set(array_paths)
+    scalars, offsets = {}, {}
+
+    with open(path, "rb") as f:
+        scanner = _Scanner(f, block_size)
+
+        def walk(key_path):
+            char = scanner.peek()
+            if char == b"{":
+                scanner.pos += 1
+                if scanner.peek() == b"}":
+                    scanner.pos += 1
+                    return
+                while True:
+                    key = scanner.string()
+                    scanner.expect(b":")
+                    value = walk(key_path + (key,))
+                    if not key_path and value is not None:
+                        scalars[key] = value
+                    if scanner.peek() == b",":
+                        scanner.pos += 1
+                        continue
+                    scanner.expect(b"}")
+                    return
+            if char == b"[":
+                scanner.pos += 1
+                if key_path in targets:
+                    offsets[key_path] = scanner.base + scanner.pos
+                if scanner.peek() not in (b"[", b"{"):
+                    scanner.skip_flat_array()
+                    return
+                while True:
+                    walk(key_path + ("[]",))
+                    if scanner.peek() == b",":
+                        scanner.pos += 1
+                        continue
+                    scanner.expect(b"]")
+                    return
+            if char == b'"':
+                return scanner.string()
+            if char is None:
+                raise ValueError("Malformed JSON: unexpected end of document")
+            return scanner.scalar()
+
+        walk(())
+    return scalars, offsets
+
+
+def _parse_item(item: bytes):
+    item = item.strip()
+    if item == b"null":
+        return None
+    if item[:1] == b'"':
+        return item[1:-1].decode()
+    return float(item)
+
+
+class _ArrayCursor:
+    """Reads the values of one flat array, starting just past its '['."""
+
+    def __init__(self, path, offset, block_size):
+        self.f = open(path, "rb")
+        self.f.seek(offset)
+        self.block_size = block_size
+        self.tail = b""     # incomplete last item of the previous block
+        self.pending = []   # parsed values not yet handed out
+        self.finished = False
+
+    def take(self, n):
+        while len(self.pending) < n and not self.finished:
+            block = self.f.read(self.block_size)
+            data = self.tail + block
+            end = data.find(b"]")
+            if end != -1:
+                items = data[:end].split(b",")
+                self.tail = b""
+                self.finished = True
+                if len(items) == 1 and not items[0].strip():
+                    items = []   # empty array
+            elif not block:
+                raise ValueError("Malformed JSON: unterminated array")
+            else:
+                items = data.split(b",")
+                self.tail = items.pop()
+            self.pending.extend(_parse_item(item) for item in items)
+        values, self.pending = self.pending[:n], self.pending[n:]
+        return values
+
+    def close(self):
+        self.f.close()
+
+
+def iter_column_batches(
+    path: str, columns: Dict[str, int], batch_size: int, block_size: int = DEFAULT_BLOCK_SIZE
+) -> Iterator[Dict[str, list]]:
+    """
+    Reads several located arrays side by side in batches of `batch_size` values.
+
+    Args:
+        path (str): JSON file (as scanned by locate_arrays).
+        columns (dict): Output column name -> array byte offset from locate_arrays.
+        batch_size (int): Values per column per batch.
+        block_size (int): Bytes read per I/O call and column.
+
+    Yields:
+        dict: Column name -> list of values; all lists in a batch have the same length.
+
+    Raises:
+        ValueError: If the arrays have different lengths or are malformed.
+    """
+    cursors = {name: _ArrayCursor(path, offset, block_size) for name, offset in columns.items()}
+    try:
+        while True:
+            batch = {name: cursor.take(batch_size) for name, cursor in cursors.items()}
+            lengths = {len(values) for values in batch.values()}
+            if len(lengths) > 1:
+                raise ValueError(f"Arrays in {path} have different lengths")
+            if not lengths or lengths == {0}:
+                return
+            yield batch
+    finally:
+        for cursor in cursors.values():
+            cursor.close()
@@ -0,0 +1,354 @@
+# helpers/julia_worker.py
+# =====================================================
+# Module: julia_worker
+#
+# Runs the Julia summary (analysis_jl/analysis.jl's main()) in a warm, long-lived
+# Julia process instead of a fresh `julia --project=...` per DAG run.
+#
+# A cold run pays package loading and JIT compilation of CSV/DataFrames/Chain on
+# every invocation (usually tens of seconds); the worker pays them once and then
+# answers each run in roughly the time main() itself takes.
+#
+# Worker (analysis_jl/summary_worker.jl):
+#   Loads analysis.jl once and serves line commands on an ephemeral 127.0.0.1 port:
+#   PING (health check), RUN (call main()), QUIT. Started detached (own session),
+#   so it outlives the Airflow task process that started it; later tasks find it
+#   through <JULIA_WORKER_STATE_DIR>/worker.json (port, pid, source mtime).
+#   Its output goes to <JULIA_WORKER_STATE_DIR>/worker.log.
+#
+# Supervision (JuliaSummaryWorker.run_summary):
+#   - An exclusive file lock serializes runs across processes: the worker handles
+#     one request at a time, so a busy worker must not be mistaken for a hung one.
+#   - Before each run: the recorded pid must be alive and answer PING within
+#     JULIA_WORKER_PING_TIMEOUT_SECONDS, and the Julia sources (analysis_jl/,
+#     helpers_jl/, config/constants.jl) must not have changed since it started;
+#     otherwise it is stopped and a new worker is started.
+#   - A run that loses its connection or exceeds JULIA_WORKER_RUN_TIMEOUT_SECONDS
+#     kills the worker and retries on a fresh one (up to JULIA_WORKER_MAX_RESTARTS).
+#   - An exception inside main() is reported back (ERR) and raised as
+#     JuliaWorkerError without a restart: the worker itself is still healthy.
+#   - JULIA_SYSIMAGE_PATH (a PackageCompiler sysimage with the project's packages)
+#     also shortens the cold start when set.
+#
+# Usage:
+#   from helpers.julia_worker import run_julia_summary
+#   run_julia_summary()                        # starts the worker on first use
+#   python -m helpers.julia_worker run         # also: start | ping | status | stop
+#
+# Dependencies:
+#   - Python standard library; Julia with the project environment (Project.toml)
+# =====================================================
+
+import argparse
+import contextlib
+import fcntl
+import glob
+import json
+import os
+import signal
+import socket
+import subprocess
+import time
+from helpers import metrics
+from config.constants import (
+    REPO_ROOT, JULIA_EXECUTABLE, JULIA_WORKER_SCRIPT_PATH, JULIA_SYSIMAGE_PATH,
+    JULIA_WORKER_STATE_DIR, JULIA_WORKER_STARTUP_TIMEOUT_SECONDS,
+    JULIA_WORKER_PING_TIMEOUT_SECONDS, JULIA_WORKER_RUN_TIMEOUT_SECONDS,
+    JULIA_WORKER_MAX_RESTARTS
+)
+
+_HOST = "127.0.0.1"
+_STOP_GRACE_SECONDS = 10.0
+_children = {}   # pid -> Popen of workers started by this process (polled to reap them)
+
+
+class JuliaWorkerError(Exception):
+    """Raised when the worker cannot be started or reached, or when main() fails."""
+
+
+class JuliaSummaryWorker:
+    """
+    Handle on the (possibly already running) summary worker for one state directory.
+
+    Args:
+        state_dir (str): Directory holding worker.json, worker.lock, worker.ready and worker.log.
+        executable (str): Julia executable.
+        script_path (str): Path of summary_worker.jl.
+        project (str): Julia project (--project) and working directory of the worker.
+        sysimage (str, optional): Sysimage passed as --sysimage.
+    """
+
+    def __init__(self, state_dir=JULIA_WORKER_STATE_DIR, executable=JULIA_EXECUTABLE,
+                 script_path=JULIA_WORKER_SCRIPT_PATH, project=REPO_ROOT, sysimage=JULIA_SYSIMAGE_PATH):
+        state_dir = os.path.abspath(state_dir)
+        self.state_path = os.path.join(state_dir, "worker.json")
+        self.lock_path = os.path.join(state_dir, "worker.lock")
+        self.ready_path = os.path.join(state_dir, "worker.ready")
+        self.log_path = os.path.join(state_dir, "worker.log")
+        self.executable = executable
+        self.script_path = script_path
+        self.project = project
+        self.sysimage = sysimage
+
+    # --- state, liveness, commands ---
+
+    @contextlib.contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_state(self, state):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _source_mtime(self):
+        """Latest mtime of the Julia code the worker has loaded (a change requires a restart)."""
+        airflow_dir = os.path.dirname(os.path.dirname(os.path.abspath(self.script_path)))
+        paths = (glob.glob(os.path.join(airflow_dir, "analysis_jl", "*.jl"))
+                 + glob.glob(os.path.join(airflow_dir, "helpers_jl", "*.jl"))
+                 + [os.path.join(airflow_dir, "config", "constants.jl")])
+        return max((os.path.getmtime(p) for p in paths if os.path.exists(p)), default=0.0)
+
+    def _alive(self, pid):
+        if pid in _children:
+            return _children[pid].poll() is None   # our child: poll() also reaps it
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _is_worker(self, pid):
+        """Guards signals against a recycled pid: the process must be running our script."""
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                return os.path.basename(self.script_path).encode() in f.read()
+        except FileNotFoundError:
+            return not os.path.isdir("/proc")   # no procfs (macOS): trust the pid
+        except OSError:
+            return False
+
+    def _command(self, state, command, timeout):
+        """Sends one command line and returns the reply line (raises OSError on failure)."""
+        with socket.create_connection((_HOST, state["port"]), timeout=timeout) as sock:
+            sock.sendall(f"{command}\n".encode())
+            reply = sock.makefile("r", encoding="utf-8").readline().strip()
+        if not reply:
+            raise ConnectionError(f"Worker closed the connection during {command}")
+        return reply
+
+    def _ping(self, state, timeout=JULIA_WORKER_PING_TIMEOUT_SECONDS):
+        try:
+            return self._command(state, "PING", timeout) == "PONG"
+        except OSError:
+            return False
+
+    # --- lifecycle (callers hold the lock) ---
+
+    def _start(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.ready_path)
+        cmd = [self.executable, f"--project={self.project}"]
+        if self.sysimage:
+            cmd.append(f"--sysimage={self.sysimage}")
+        cmd += [self.script_path, self.ready_path]
+
+        source_mtime = self._source_mtime()
+        started = time.perf_counter()
+        print(f"ℹ️  Starting Julia summary worker: {' '.join(cmd)}")
+        with open(self.log_path, "ab") as log:
+            try:
+                # Own session: the worker survives the task process (and its signals)
+                proc = subprocess.Popen(cmd, cwd=self.project, stdin=subprocess.DEVNULL,
+                                        stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+            except OSError as e:
+                raise JuliaWorkerError(f"Cannot start Julia worker ({self.executable}): {e}") from e
+        _children[proc.pid] = proc
+
+        deadline = time.monotonic() + JULIA_WORKER_STARTUP_TIMEOUT_SECONDS
+        while not os.path.exists(self.ready_path):
+            if proc.poll() is not None:
+                raise JuliaWorkerError(
+                    f"Julia worker exited with code {proc.returncode} during startup "
+                    f"(see {self.log_path}):\n{self._log_tail()}"
+                )
+            if time.monotonic() > deadline:
+                self._terminate(proc.pid)
+                raise JuliaWorkerError(
+                    f"Julia worker not ready after {JULIA_WORKER_STARTUP_TIMEOUT_SECONDS:.0f}s (see {self.log_path})"
+                )
+            time.sleep(0.1)
+
+        with open(self.ready_path) as f:
+            port, pid = (int(v) for v in f.read().split())
+        state = {"port": port, "pid": pid, "source_mtime": source_mtime, "started_at": time.time()}
+        self._write_state(state)
+        print(f"✅ Julia summary worker ready on {_HOST}:{port} (pid {pid}) "
+              f"in {time.perf_counter() - started:.1f}s")
+        return state
+
+    def _log_tail(self, lines=20):
+        try:
+            with open(self.log_path, errors="replace") as f:
+                return "".join(f.readlines()[-lines:])
+        except OSError:
+            return ""
+
+    def _terminate(self, pid):
+        if not self._alive(pid) or not self._is_worker(pid):
+            return
+        with contextlib.suppress(ProcessLookupError):
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + _STOP_GRACE_SECONDS
+        while self._alive(pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self._alive(pid):
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGKILL)
+
+    def _stop(self, state):
+        with contextlib.suppress(OSError):
+            self._command(state, "QUIT", timeout=1.0)
+        self._terminate(state["pid"])
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.state_path)
+
+    def _ensure_running(self):
+        """Returns (state, started): the healthy current worker, or a freshly started one."""
+        state = self._read_state()
+        if state is not None:
+            if not self._alive(state["pid"]):
+                reason = "dead"
+            elif state.get("source_mtime") != self._source_mtime():
+                reason = "stale"
+            elif not self._ping(state):
+                reason = "unresponsive"
+            else:
+                return state, False
+            print(f"⚠️ Julia summary worker (pid {state['pid']}) is {reason}; restarting it")
+            metrics.increment("julia_worker_restarts_total", reason=reason)
+            self._stop(state)
+        return self._start(), True
+
+    # --- public API ---
+
+    def ensure_running(self):
+        """
+        Starts the worker unless a healthy, up-to-date one is already running.
+
+        Returns:
+            dict: Worker state (port, pid, source_mtime, started_at).
+        """
+        with self._locked():
+            return self._ensure_running()[0]
+
+    def ping(self):
+        """True if the recorded worker answers PING."""
+        state = self._read_state()
+        return state is not None and self._ping(state)
+
+    def status(self):
+        """Recorded worker state plus liveness ("alive", "responding"), or None if none is recorded."""
+        state = self._read_state()
+        if state is None:
+            return None
+        return {**state, "alive": self._alive(state["pid"]), "responding": self._ping(state)}
+
+    def stop(self):
+        """Stops the worker (QUIT, then SIGTERM/SIGKILL) and forgets its state."""
+        with self._locked():
+            state = self._read_state()
+            if state is not None:
+                self._stop(state)
+                print(f"✅ Julia summary worker (pid {state['pid']}) stopped")
+
+    def run_summary(self, timeout=JULIA_WORKER_RUN_TIMEOUT_SECONDS, max_restarts=JULIA_WORKER_MAX_RESTARTS):
+        """
+        Runs analysis.jl's main() on the worker (starting it if needed) and waits for it.
+
+        Args:
+            timeout (float): Max seconds for the run before the worker is killed and restarted.
+            max_restarts (int): Fresh workers to try after the worker dies or hangs mid-run.
+        Returns:
+            dict: {"seconds": main() duration in Julia, "round_trip_seconds", "cold_start": bool,
+                "restarts": int}
+        Raises:
+            JuliaWorkerError: If the worker cannot run the summary, or main() raised.
+        """
+        started = time.perf_counter()
+        restarts, cold_start = 0, False
+        with self._locked():
+            while True:
+                state, fresh = self._ensure_running()
+                cold_start = cold_start or fresh
+                try:
+                    reply = self._command(state, "RUN", timeout)
+                    break
+                except OSError as e:
+                    print(f"⚠️ Julia summary run failed on worker pid {state['pid']}: {e!r}")
+                    self._stop(state)
+                    if restarts >= max_restarts:
+                        raise JuliaWorkerError(
+                            f"Julia summary failed after {restarts} restart(s) (see {self.log_path}): {e!r}"
+                        ) from e
+                    restarts += 1
+                    metrics.increment("julia_worker_restarts_total", reason="run_failed")
+
+        round_trip = time.perf_counter() - started
+        metrics.observe("julia_summary_seconds", round_trip, worker="cold" if cold_start else "warm")
+        status, _, detail = reply.partition(" ")
+        if status != "OK":
+            raise JuliaWorkerError(f"analysis.jl main() failed in the worker: {detail or reply}")
+        return {"seconds": float(detail), "round_trip_seconds": round_trip,
+                "cold_start": cold_start, "restarts": restarts}
+
+
+def run_julia_summary(worker=None):
+    """
+    Writes the Julia yearly summary CSV + manifest through the warm worker.
+
+    Returns:
+        dict: See JuliaSummaryWorker.run_summary.
+    """
+    result = (worker or JuliaSummaryWorker()).run_summary()
+    print(f"✅ Julia summary done in {result['round_trip_seconds']:.2f}s "
+          f"({'cold start' if result['cold_start'] else 'warm worker'}; main() {result['seconds']:.2f}s)")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm Julia worker for the yearly summary")
+    parser.add_argument("command", choices=["run", "start", "ping", "status", "stop"])
+    parser.add_argument("--julia", default=JULIA_EXECUTABLE, help="Julia executable")
+    args = parser.parse_args()
+
+    worker = JuliaSummaryWorker(executable=args.julia)
+    if args.command == "run":
+        run_julia_summary(worker)
+    elif args.command == "start":
+        worker.ensure_running()
+    elif args.command == "ping":
+        alive = worker.ping()
+        print("✅ Worker responding" if alive else "❌ Worker not responding")
+        raise SystemExit(0 if alive else 1)
+    elif args.command == "status":
+        print(json.dumps(worker.status(), indent=2))
+    else:
+        worker.stop()
@@ -0,0 +1,297 @@
+# helpers/metrics.py
+# =====================================================
+# Module: metrics
+#
+# In-process metrics registry (counters, gauges, histograms) for the ETL stages,
+# written to pluggable sinks on flush:
+#   JSON_LOG             one JSON line per flush at METRICS_JSON_LOG_PATH
+#   PROMETHEUS_TEXTFILE  <METRICS_PROMETHEUS_DIR>/<job>.prom, atomically replaced,
+#                        for node_exporter's textfile collector
+#   AIRFLOW_XCOM         the snapshot pushed as the running task's "metrics" XCom
+#
+# Recorded by the pipeline (all names get the "weather_etl_" prefix in Prometheus):
+#   http_request_seconds{endpoint,status}     histogram  (helpers.http_client)
+#   http_response_bytes_total{endpoint}       counter
+#   http_retries_total{endpoint}              counter
+#   response_cache_requests_total{result}     counter    (helpers.response_cache)
+#   geocode_lookups_total{source}             counter    (helpers.geocode_utils)
+#   validation_seconds{mode}                  histogram  (helpers.weather_api)
+#   db_transaction_seconds{table}             histogram  (helpers.db_loader)
+#   db_rows_inserted_total / db_rows_ignored_total{table}
+#   export_rows / export_seconds / export_rows_per_second{format}   gauges (helpers.sqlite_utils)
+#   julia_summary_seconds{worker}             histogram  (helpers.julia_worker; worker=cold|warm)
+#   julia_worker_restarts_total{reason}       counter
+#   derived_update_seconds                    histogram  (helpers.derived_metrics; per location)
+#   derived_rows_written_total                counter
+#   task_seconds{task,status}                 histogram  (DAG tasks, via task_metrics)
+#
+# With METRICS_ENABLED = False every recording call returns on its first line and
+# timed() hands back a shared no-op context manager, so instrumentation costs a
+# function call and a flag check.
+#
+# Usage:
+#   from helpers import metrics
+#   metrics.increment("db_rows_inserted_total", 120, table="weather_daily")
+#   with metrics.timed("validation_seconds", mode="columnar"):
+#       ...
+#   with metrics.task_metrics("fetch_weather_data"):   # DAG task body: reset, time, flush
+#       ...
+#
+# Dependencies:
+#   - Python standard library only (safe to import from the DAG file's task bodies)
+# =====================================================
+
+import bisect
+import contextlib
+import datetime
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from config.constants import (
+    METRICS_ENABLED, METRICS_SINKS, METRICS_JSON_LOG_PATH, METRICS_PROMETHEUS_DIR,
+    JSON_LOG, PROMETHEUS_TEXTFILE, AIRFLOW_XCOM
+)
+
+PROMETHEUS_PREFIX = "weather_etl_"
+# Upper bounds (seconds) for latency histograms; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+_enabled = METRICS_ENABLED
+_sinks = list(METRICS_SINKS)
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_gauges = {}       # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket bounds, per-bucket counts (+Inf last), sum, count]
+_NOOP = contextlib.nullcontext()
+
+
+def configure_metrics(enabled=None, sinks=None):
+    """Turns recording on/off and/or replaces the sink list at runtime (overrides the constants)."""
+    global _enabled, _sinks
+    if enabled is not None:
+        _enabled = enabled
+    if sinks is not None:
+        _sinks = list(sinks)
+
+
+def metrics_enabled():
+    return _enabled
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """Adds `value` to a counter."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """Sets a gauge to `value`."""
+    if not _enabled:
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Records one observation in a histogram (bucket bounds are fixed on first use)."""
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [tuple(buckets), [0] * (len(buckets) + 1), 0.0, 0]
+        histogram[1][bisect.bisect_left(histogram[0], value)] += 1
+        histogram[2] += value
+        histogram[3] += 1
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+def timed(name, **labels):
+    """Context manager observing the block's wall-clock seconds in histogram `name`."""
+    if not _enabled:
+        return _NOOP
+    return _Timer(name, labels)
+
+
+def snapshot():
+    """
+    Current values of every series.
+
+    Returns:
+        dict: {"counters": [...], "gauges": [...], "histograms": [...]}; each entry has
+            name and labels, plus value (counters/gauges) or count, sum and cumulative
+            buckets {upper bound: count} (histograms).
+    """
+    with _lock:
+        counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(_counters.items())]
+        gauges = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(_gauges.items())]
+        histograms = []
+        for (name, labels), (bounds, counts, total, count) in sorted(_histograms.items()):
+            cumulative, running = {}, 0
+            for bound, bucket_count in zip(list(bounds) + ["+Inf"], counts):
+                running += bucket_count
+                cumulative[str(bound)] = running
+            histograms.append({
+                "name": name, "labels": dict(labels), "count": count, "sum": total, "buckets": cumulative
+            })
+    return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def reset_metrics():
+    """Clears every series (e.g. at the start of a task)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+def _write_json_log(snap, job, context):
+    os.makedirs(os.path.dirname(METRICS_JSON_LOG_PATH) or ".", exist_ok=True)
+    line = {"ts": datetime.datetime.now(datetime.timezone.utc).isoformat(), "job": job, "pid": os.getpid(), **snap}
+    # One write() per line: concurrent appenders do not interleave within a line
+    with open(METRICS_JSON_LOG_PATH, "a") as f:
+        f.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prometheus_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+
+
+def format_prometheus(snap, job):
+    """Renders a snapshot in the Prometheus text exposition format (every series labelled job=...)."""
+    lines, typed = [], set()
+
+    def header(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for kind, entries in (("counter", snap["counters"]), ("gauge", snap["gauges"])):
+        for entry in entries:
+            name = PROMETHEUS_PREFIX + entry["name"]
+            header(name, kind)
+            lines.append(f"{name}{_prometheus_labels(entry['labels'], job=job)} {entry['value']}")
+    for entry in snap["histograms"]:
+        name = PROMETHEUS_PREFIX + entry["name"]
+        header(name, "histogram")
+        for bound, count in entry["buckets"].items():
+            lines.append(f"{name}_bucket{_prometheus_labels(entry['labels'], job=job, le=bound)} {count}")
+        lines.append(f"{name}_sum{_prometheus_labels(entry['labels'], job=job)} {entry['sum']}")
+        lines.append(f"{name}_count{_prometheus_labels(entry['labels'], job=job)} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_prometheus_textfile(snap, job, context):
+    os.makedirs(METRICS_PROMETHEUS_DIR, exist_ok=True)
+    path = os.path.join(METRICS_PROMETHEUS_DIR, f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', job)}.prom")
+    # Atomic replace: the collector must never read a half-written file
+    fd, tmp_path = tempfile.mkstemp(suffix=".prom.tmp", dir=METRICS_PROMETHEUS_DIR)
+    with os.fdopen(fd, "w") as f:
+        f.write(format_prometheus(snap, job))
+    os.replace(tmp_path, path)
+
+
+def _push_airflow_xcom(snap, job, context):
+    if context is None:
+        return   # not running inside an Airflow task
+    context["ti"].xcom_push(key="metrics", value=snap)
+
+
+_SINK_WRITERS = {
+    JSON_LOG: _write_json_log,
+    PROMETHEUS_TEXTFILE: _write_prometheus_textfile,
+    AIRFLOW_XCOM: _push_airflow_xcom,
+}
+
+
+def _airflow_context():
+    """The running task's Airflow context, or None outside a task (or without Airflow)."""
+    try:
+        try:
+            from airflow.sdk import get_current_context
+        except ImportError:
+            from airflow.operators.python import get_current_context
+        return get_current_context()
+    except Exception:
+        return None
+
+
+def flush_metrics(job="weather_etl", context=None):
+    """
+    Writes the current snapshot to every configured sink. A failing sink prints a
+    warning and never fails the caller.
+
+    Args:
+        job (str): Job/task name (Prometheus `job` label and textfile name).
+        context (dict, optional): Airflow task context for the XCom sink (looked up if omitted).
+    """
+    if not _enabled:
+        return
+    snap = snapshot()
+    if AIRFLOW_XCOM in _sinks and context is None:
+        context = _airflow_context()
+    for sink in _sinks:
+        try:
+            _SINK_WRITERS[sink](snap, job, context)
+        except Exception as e:
+            print(f"⚠️ Metrics sink '{sink}' failed: {e}")
+
+
+@contextlib.contextmanager
+def task_metrics(task_name):
+    """
+    Scopes metrics to one task run: clears the registry, records task_seconds
+    (status=success|failed) and flushes to the sinks when the block exits.
+    Mapped task instances flush as <task_name>.<map_index>.
+    """
+    if not _enabled:
+        yield
+        return
+    context = _airflow_context()
+    job = task_name
+    map_index = getattr(context["ti"], "map_index", -1) if context else -1
+    if map_index is not None and map_index >= 0:
+        job = f"{task_name}.{map_index}"
+
+    reset_metrics()
+    started = time.perf_counter()
+    status = "failed"
+    try:
+        yield
+        status = "success"
+    finally:
+        observe("task_seconds", time.perf_counter() - started, task=task_name, status=status)
+        flush_metrics(job, context)
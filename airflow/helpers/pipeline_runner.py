@@ -0,0 +1,305 @@
+# helpers/pipeline_runner.py
+# =====================================================
+# Module: pipeline_runner
+#
+# Standalone (non-Airflow) runner for backfills and ad-hoc loads.
+#
+# Runs geocode -> fetch -> validate -> insert as an asyncio producer/consumer
+# pipeline instead of stepping through them one city at a time:
+#
+#   jobs (city x date chunk)
+#     -> fetchers   (`fetch_concurrency` coroutines; HTTP calls in a thread pool
+#                    through the response cache and the pooled/rate-limited http_client)
+#     -> [bounded queue]
+#     -> validators (`validate_workers` threads; VALIDATION_MODE decides Polars or Pydantic)
+#     -> [bounded queue per shard]
+#     -> writers    (one SQLite writer per storage shard, idempotent batched inserts;
+#                    a single writer for the single-file layout, see helpers.shards;
+#                    each location's chunks are written in date order, up to the first
+#                    failed one, so the high-water mark never skips a gap)
+#   then: derived metrics (helpers.derived_metrics) for the inserted date ranges
+#
+# The fetchers are coroutines, but the HTTP calls themselves are the blocking
+# requests-based cached_get_json run through loop.run_in_executor on a
+# `fetch_concurrency`-thread pool, not an async HTTP client: that keeps one HTTP
+# stack (response cache, retries, rate limit) for every caller and adds no
+# aiohttp/httpx dependency.
+#
+# Network latency overlaps with parsing and disk writes. Bounded queues apply
+# backpressure, so memory stays at roughly `queue_size` chunks per stage however
+# many cities/years are requested. Progress and throughput are printed every
+# PIPELINE_PROGRESS_SECONDS and summarised at the end.
+#
+# Usage:
+#   python -m helpers.pipeline_runner --start 1990-01-01 --end 2020-12-31
+#   python -m helpers.pipeline_runner --cities my_cities.csv --start 2000-01-01 --end 2000-12-31 \
+#       --fetch-concurrency 16 --validate-workers 4 --queue-size 32
+#   python -m helpers.pipeline_runner --start 2000-01-01 --end 2000-12-31 --metrics   # + helpers.metrics sinks
+#   python -m helpers.pipeline_runner --start 2000-01-01 --end 2000-12-31 --no-derived  # skip derived metrics
+#
+# Dependencies:
+#   - asyncio (Python standard library)
+#   - helpers.response_cache, helpers.columnar_validation, helpers.db_loader
+# =====================================================
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pydantic import ValidationError
+from helpers.city_utils import load_city_list
+from helpers.columnar_validation import parse_weather_payload, ColumnarValidationError
+from helpers.date_utils import split_date_range, get_interval_start_to_end_dates
+from helpers.db_loader import insert_weather_frame
+from helpers.db_utils import create_weather_table
+from helpers.derived_metrics import update_derived_metrics
+from helpers.geocode_utils import get_city_coordinates
+from helpers.response_cache import cached_get_json, evict_response
+from helpers.schemas import WeatherResponse
+from helpers.shards import shard_count, shard_index
+from helpers.staging import weather_response_to_frame
+from config.constants import (
+    DB_PATH, CITIES_CSV_PATH, WEATHER_API_URL, DAILY_VARIABLES,
+    START_YEAR, NUM_YEARS, DIRECTION, FETCH_CHUNK_YEARS, VALIDATION_MODE, COLUMNAR,
+    PIPELINE_FETCH_CONCURRENCY, PIPELINE_VALIDATE_WORKERS, PIPELINE_QUEUE_SIZE,
+    PIPELINE_PROGRESS_SECONDS
+)
+
+_DONE = object()   # End-of-stream marker passed down the queues
+
+
+def _validate(payload, validation_mode):
+    """Validates one archive payload into a weather_daily-shaped DataFrame."""
+    if validation_mode == COLUMNAR:
+        return parse_weather_payload(payload)[1]
+    return weather_response_to_frame(WeatherResponse.model_validate(payload))
+
+
+class _Progress:
+    """Counters shared by the stages (all updated from the event loop thread)."""
+
+    def __init__(self, total_chunks):
+        self.started = time.monotonic()
+        self.total_chunks = total_chunks
+        self.fetched = self.validated = self.written = 0
+        self.rows_received = self.rows_inserted = 0
+        self.failed = []
+
+    def report(self, final=False):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        prefix = "✅ Pipeline finished" if final else "ℹ️  Progress"
+        print(
+            f"{prefix}: fetched {self.fetched}/{self.total_chunks}, validated {self.validated}, "
+            f"written {self.written} chunks | {self.rows_inserted} new rows of {self.rows_received} | "
+            f"{self.rows_received / elapsed:,.0f} rows/s, {self.written / elapsed:.2f} chunks/s "
+            f"| {len(self.failed)} failed | {elapsed:.1f}s"
+        )
+
+
+async def run_pipeline(
+    cities,
+    start_date,
+    end_date,
+    db_path=DB_PATH,
+    weather_api_url=WEATHER_API_URL,
+    daily_variables=DAILY_VARIABLES,
+    chunk_years=FETCH_CHUNK_YEARS,
+    fetch_concurrency=PIPELINE_FETCH_CONCURRENCY,
+    validate_workers=PIPELINE_VALIDATE_WORKERS,
+    queue_size=PIPELINE_QUEUE_SIZE,
+    progress_seconds=PIPELINE_PROGRESS_SECONDS,
+    validation_mode=VALIDATION_MODE,
+    update_derived=True
+):
+    """
+    Fetches, validates and loads every (city, date chunk) of the range concurrently.
+
+    Args:
+        cities (list[dict]): Entries as returned by city_utils.load_city_list. An entry may
+            carry its own start_date/end_date (e.g. a coverage.plan_backfill plan).
+        start_date, end_date (str): Inclusive range, 'YYYY-MM-DD', for entries without their own.
+        db_path (str): Target SQLite database (created/migrated if needed).
+        chunk_years (int): Calendar years per archive request.
+        fetch_concurrency (int): Requests in flight at once.
+        validate_workers (int): Validation threads.
+        queue_size (int): Capacity of each inter-stage queue (the writers get one queue per shard).
+        progress_seconds (float): Interval between progress reports.
+        validation_mode (str): COLUMNAR or PYDANTIC.
+        update_derived (bool): Recompute the derived metrics touched by the inserts at the end.
+
+    Returns:
+        _Progress: Final counters; `failed` lists (location, chunk_start, chunk_end, reason).
+    """
+    loop = asyncio.get_running_loop()
+    create_weather_table(db_path)
+
+    fetch_pool = ThreadPoolExecutor(max_workers=fetch_concurrency, thread_name_prefix="fetch")
+    validate_pool = ThreadPoolExecutor(max_workers=validate_workers, thread_name_prefix="validate")
+    # One thread owns each shard's SQLite writes: shards load in parallel, and no two
+    # writers ever wait on the same database lock (one writer without sharding)
+    shards = shard_count(db_path)
+    write_pools = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"writer-{i}") for i in range(shards)]
+
+    # Geocoding is cached (helpers.geocode_cache); resolve all cities up front
+    jobs = asyncio.Queue()
+    located = await asyncio.gather(*(
+        loop.run_in_executor(fetch_pool, get_city_coordinates, city['city_name'], city['country'])
+        for city in cities
+    ), return_exceptions=True)
+    progress = _Progress(0)
+    for city, coordinates in zip(cities, located):
+        # A city may carry its own planned range (e.g. from the incremental planner)
+        city_range = (city.get('start_date', start_date), city.get('end_date', end_date))
+        if isinstance(coordinates, Exception):
+            # Geocoding API error (HTTPError / HTTPClientError): only this city fails
+            progress.failed.append((city['location'], *city_range, f"geocoding: {coordinates}"))
+            continue
+        lat, lon = coordinates
+        if lat is None:
+            progress.failed.append((city['location'], *city_range, "no coordinates"))
+            continue
+        for seq, chunk in enumerate(split_date_range(*city_range, chunk_years)):
+            jobs.put_nowait((city, lat, lon, seq, chunk))
+    progress.total_chunks = jobs.qsize()
+
+    payloads = asyncio.Queue(maxsize=queue_size)
+    frames = [asyncio.Queue(maxsize=queue_size) for _ in range(shards)]
+
+    async def fetcher():
+        while not jobs.empty():
+            city, lat, lon, seq, (chunk_start, chunk_end) = jobs.get_nowait()
+            params = {
+                'latitude': lat,
+                'longitude': lon,
+                'start_date': chunk_start,
+                'end_date': chunk_end,
+                'daily': ','.join(daily_variables),
+                'timezone': city['timezone'],
+            }
+            try:
+                payload = await loop.run_in_executor(
+                    fetch_pool, partial(cached_get_json, weather_api_url, params=params, timeout=60)
+                )
+            except Exception as e:
+                progress.failed.append((city['location'], chunk_start, chunk_end, str(e)))
+                payload = None   # still passed down: the writer must learn that this chunk is missing
+            else:
+                progress.fetched += 1
+            await payloads.put((city['location'], seq, chunk_start, chunk_end, params, payload))
+
+    async def validator():
+        while (item := await payloads.get()) is not _DONE:
+            location, seq, chunk_start, chunk_end, params, payload = item
+            frame = None
+            if payload is not None:
+                try:
+                    frame = await loop.run_in_executor(validate_pool, _validate, payload, validation_mode)
+                    progress.validated += 1
+                except (ValidationError, ColumnarValidationError) as e:
+                    progress.failed.append((location, chunk_start, chunk_end, f"validation: {e}"))
+                except Exception as e:
+                    progress.failed.append((location, chunk_start, chunk_end, str(e)))
+                if frame is None:
+                    # The body was cached before validation: drop it so a rerun refetches it
+                    await loop.run_in_executor(validate_pool, evict_response, weather_api_url, params)
+            await frames[shard_index(location, shards)].put((location, seq, chunk_start, chunk_end, frame))
+
+    async def write(shard, location, chunk_start, chunk_end, frame):
+        """Inserts one chunk; returns False (recorded in progress.failed) if it could not be written."""
+        try:
+            # Await before touching the counter: `+= await` would race the other shard writers
+            inserted = await loop.run_in_executor(
+                write_pools[shard], insert_weather_frame, db_path, frame, location
+            )
+        except Exception as e:
+            # insert_weather_frame raises on database errors: the chunk counts as failed
+            # (the run exits 1). Keep draining: a dead writer would block the validators
+            progress.failed.append((location, chunk_start, chunk_end, f"insert: {e}"))
+            return False
+        progress.rows_inserted += inserted
+        progress.rows_received += frame.height
+        progress.written += 1
+        return True
+
+    async def writer(shard):
+        # Chunks arrive in completion order but are written in date order per location, and
+        # never past a missing one: the INCREMENTAL high-water mark (latest stored date)
+        # must not jump a gap it would never refetch. Held chunks are bounded by the
+        # chunks in flight, since every chunk arrives, as a frame or as None (failed).
+        held = {}        # location -> {seq: (chunk_start, chunk_end, frame)}
+        next_seq = {}    # location -> seq of the next chunk to write
+        broken = set()   # locations with a missing chunk: later ones are not written
+        while (item := await frames[shard].get()) is not _DONE:
+            location, seq, chunk_start, chunk_end, frame = item
+            waiting = held.setdefault(location, {})
+            waiting[seq] = (chunk_start, chunk_end, frame)
+            while next_seq.get(location, 0) in waiting:
+                chunk_start, chunk_end, frame = waiting.pop(next_seq.get(location, 0))
+                next_seq[location] = next_seq.get(location, 0) + 1
+                if location in broken:
+                    if frame is not None:
+                        progress.failed.append((location, chunk_start, chunk_end,
+                                                "skipped: an earlier chunk of this location failed"))
+                elif frame is None or not await write(shard, location, chunk_start, chunk_end, frame):
+                    broken.add(location)
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(progress_seconds)
+            progress.report()
+
+    reporting = asyncio.create_task(reporter())
+    try:
+        writing = [asyncio.create_task(writer(shard)) for shard in range(shards)]
+        validating = [asyncio.create_task(validator()) for _ in range(validate_workers)]
+        await asyncio.gather(*(fetcher() for _ in range(fetch_concurrency)))
+        for _ in validating:
+            await payloads.put(_DONE)
+        await asyncio.gather(*validating)
+        for queue in frames:
+            await queue.put(_DONE)
+        await asyncio.gather(*writing)
+    finally:
+        reporting.cancel()
+        for pool in (fetch_pool, validate_pool, *write_pools):
+            pool.shutdown(wait=True)
+
+    progress.report(final=True)
+    if update_derived:
+        update_derived_metrics(db_path)
+    for location, chunk_start, chunk_end, reason in progress.failed:
+        print(f"❌ {location} {chunk_start}..{chunk_end}: {reason}")
+    return progress
+
+
+if __name__ == "__main__":
+    default_start, default_end = get_interval_start_to_end_dates(START_YEAR, NUM_YEARS, DIRECTION)
+
+    parser = argparse.ArgumentParser(description="Concurrent fetch/validate/load pipeline (outside Airflow)")
+    parser.add_argument("--cities", default=CITIES_CSV_PATH, help="City list CSV (city_name,country,timezone)")
+    parser.add_argument("--start", default=default_start, help="YYYY-MM-DD")
+    parser.add_argument("--end", default=default_end, help="YYYY-MM-DD")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the SQLite database")
+    parser.add_argument("--chunk-years", type=int, default=FETCH_CHUNK_YEARS)
+    parser.add_argument("--fetch-concurrency", type=int, default=PIPELINE_FETCH_CONCURRENCY)
+    parser.add_argument("--validate-workers", type=int, default=PIPELINE_VALIDATE_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE)
+    parser.add_argument("--progress-seconds", type=float, default=PIPELINE_PROGRESS_SECONDS)
+    parser.add_argument("--metrics", action="store_true", help="Record metrics and flush them to the sinks at the end")
+    parser.add_argument("--no-derived", action="store_true", help="Leave the derived metrics queue for a later run")
+    args = parser.parse_args()
+
+    if args.metrics:
+        from helpers.metrics import configure_metrics
+        configure_metrics(enabled=True)
+    result = asyncio.run(run_pipeline(
+        load_city_list(args.cities), args.start, args.end, db_path=args.db,
+        chunk_years=args.chunk_years, fetch_concurrency=args.fetch_concurrency,
+        validate_workers=args.validate_workers, queue_size=args.queue_size,
+        progress_seconds=args.progress_seconds, update_derived=not args.no_derived
+    ))
+    if args.metrics:
+        from helpers.metrics import flush_metrics
+        flush_metrics("pipeline_runner")
+    raise SystemExit(1 if result.failed else 0)
@@ -0,0 +1,327 @@
+# helpers/queries.py
+# =====================================================
+# Module: queries
+#
+# Read-side query API over weather_daily for dashboards: point queries that
+# touch only the rows they return, instead of exporting the whole table.
+#
+#   query_range(location, start, end)   one city over a date range
+#   query_latest(location, days)        the latest N stored days of a city
+#   query_monthly(location, start, end) monthly counts and mean/min/max temperatures
+#   query_locations()                   stored locations with first/last date (coverage index)
+#   query_derived(location, start, end) precomputed rolling means / normals / anomalies
+#                                       (weather_daily_derived, helpers.derived_metrics)
+#
+# Every query is a parameterized range scan on the (location, date) unique
+# index (schema v3), so its cost follows the rows returned, not the table size.
+# Results are Polars DataFrames (or Arrow tables with as_arrow=True).
+#
+# Connections:
+#   A small pool of read-only connections (mode=ro, query_only) per database,
+#   shared by threads; WAL mode lets them read while the loader writes.
+#   With sharded storage (helpers.shards) a location's queries go to its shard's
+#   pool; query_locations reads every shard's coverage index and concatenates.
+#
+# Result cache:
+#   An in-process LRU of QUERY_CACHE_SIZE results, tagged with the location's
+#   load generation (db_utils.get_load_watermark). The loader bumps that
+#   generation in every transaction that inserts rows for the location, so a
+#   cached result is served only while it is still exactly what the query would
+#   return. A hit costs one primary-key lookup. Cached frames are shared: treat
+#   them as read-only.
+#
+# Usage:
+#   from helpers.queries import query_range, query_latest, query_monthly
+#   df = query_range("Lisbon,PT", "2020-01-01", "2020-12-31")
+#   python -m helpers.queries --location "Lisbon,PT" --monthly
+#
+# Dependencies:
+#   - polars, sqlite3
+# =====================================================
+
+import argparse
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+import polars as pl
+from helpers.db_utils import get_load_watermark
+from helpers.coverage import COVERAGE_TABLE
+from helpers.derived_metrics import DERIVED_COLUMNS
+from helpers.shards import shard_path, shard_paths
+from config.constants import (
+    DB_PATH, TABLE_NAME, DERIVED_TABLE_NAME, QUERY_POOL_SIZE, QUERY_CACHE_SIZE,
+    SQLITE_BUSY_TIMEOUT_SECONDS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE_BYTES
+)
+
+DAILY_SCHEMA = {"date": pl.Utf8, "temp_max": pl.Float64, "temp_min": pl.Float64, "weather_code": pl.Int64}
+MONTHLY_SCHEMA = {
+    "month": pl.Utf8, "days": pl.Int64,
+    "mean_temp_max": pl.Float64, "min_temp_max": pl.Float64, "max_temp_max": pl.Float64,
+    "mean_temp_min": pl.Float64, "min_temp_min": pl.Float64, "max_temp_min": pl.Float64,
+}
+DERIVED_SCHEMA = {"date": pl.Utf8, **{column: pl.Float64 for column in DERIVED_COLUMNS}}
+LOCATIONS_SCHEMA = {"location": pl.Utf8, "first_date": pl.Utf8, "last_date": pl.Utf8, "days": pl.Int64}
+
+# Open bounds for optional date filters ('YYYY-MM-DD' strings compare chronologically)
+_MIN_DATE, _MAX_DATE = "0000-01-01", "9999-12-31"
+
+
+class _ReadPool:
+    """Fixed-size pool of read-only connections; borrow one with `with pool.connection() as conn`."""
+
+    def __init__(self, db_path, size):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_SECONDS)
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_BYTES}")
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            conn = self._connect() if create else self._idle.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_cache = OrderedDict()   # (db, query, location, params) -> (generation, result)
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _pool(db_path):
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(f"No weather database at {db_path}")
+            pool = _pools[key] = _ReadPool(db_path, QUERY_POOL_SIZE)
+        return pool
+
+
+def _cached_query(db_path, name, location, params, run, cache_size=QUERY_CACHE_SIZE):
+    """
+    Returns run(conn)'s result for this (query, location, params), from the cache if the
+    location's load generation is unchanged since it was computed. `db_path` is the
+    database file to read (one shard for a sharded store).
+    """
+    key = (os.path.abspath(db_path), name, location, params)
+    with _pool(db_path).connection() as conn:
+        generation = get_load_watermark(conn, location)
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry is not None and entry[0] == generation:
+                _cache.move_to_end(key)
+                _cache_stats["hits"] += 1
+                return entry[1]
+            _cache_stats["misses"] += 1
+
+        # Read the generation and the rows in one snapshot, so the tag matches the data exactly
+        conn.execute("BEGIN")
+        generation = get_load_watermark(conn, location)
+        result = run(conn)
+        conn.commit()
+
+    with _cache_lock:
+        _cache[key] = (generation, result)
+        _cache.move_to_end(key)
+        while len(_cache) > cache_size:
+            _cache.popitem(last=False)
+    return result
+
+
+_RANGE_SQL = f"""
+    SELECT date, temp_max, temp_min, weather_code FROM {TABLE_NAME}
+    WHERE location = ? AND date BETWEEN ? AND ?
+    ORDER BY date
+"""
+_LATEST_SQL = f"""
+    SELECT date, temp_max, temp_min, weather_code FROM {TABLE_NAME}
+    WHERE location = ?
+    ORDER BY date DESC LIMIT ?
+"""
+_MONTHLY_SQL = f"""
+    SELECT substr(date, 1, 7) AS month, COUNT(*),
+           AVG(temp_max), MIN(temp_max), MAX(temp_max),
+           AVG(temp_min), MIN(temp_min), MAX(temp_min)
+    FROM {TABLE_NAME}
+    WHERE location = ? AND date BETWEEN ? AND ?
+    GROUP BY month
+    ORDER BY month
+"""
+_DERIVED_SQL = f"""
+    SELECT date, {", ".join(DERIVED_COLUMNS)} FROM {DERIVED_TABLE_NAME}
+    WHERE location = ? AND date BETWEEN ? AND ?
+    ORDER BY date
+"""
+# Day numbers are proleptic ordinals (see helpers.coverage): ordinal 1 = julianday 1721425.5
+_LOCATIONS_SQL = f"""
+    SELECT location,
+           date(MIN(start_day) + 1721424.5), date(MAX(end_day) + 1721424.5),
+           SUM(end_day - start_day + 1)
+    FROM {COVERAGE_TABLE}
+    GROUP BY location
+    ORDER BY location
+"""
+
+
+def _select(sql, args, schema, as_arrow, reverse=False):
+    """Builds the cache-miss function: run the query, return its rows as a frame."""
+    def run(conn):
+        rows = conn.execute(sql, args).fetchall()
+        df = pl.DataFrame(rows[::-1] if reverse else rows, schema=schema, orient="row")
+        return df.to_arrow() if as_arrow else df
+    return run
+
+
+def query_range(location, start_date=None, end_date=None, db_path=DB_PATH, as_arrow=False):
+    """
+    Daily rows of one location within [start_date, end_date] (inclusive, 'YYYY-MM-DD';
+    None leaves that side open), ordered by date.
+
+    Returns:
+        pl.DataFrame | pyarrow.Table: date, temp_max, temp_min, weather_code.
+    """
+    params = (start_date or _MIN_DATE, end_date or _MAX_DATE)
+    return _cached_query(shard_path(db_path, location), "range", location, (*params, as_arrow),
+                         _select(_RANGE_SQL, (location, *params), DAILY_SCHEMA, as_arrow))
+
+
+def query_latest(location, days=30, db_path=DB_PATH, as_arrow=False):
+    """
+    The latest `days` stored rows of one location (a backward index scan), ordered by date.
+
+    Returns:
+        pl.DataFrame | pyarrow.Table: date, temp_max, temp_min, weather_code.
+    """
+    return _cached_query(shard_path(db_path, location), "latest", location, (days, as_arrow),
+                         _select(_LATEST_SQL, (location, days), DAILY_SCHEMA, as_arrow, reverse=True))
+
+
+def query_monthly(location, start_date=None, end_date=None, db_path=DB_PATH, as_arrow=False):
+    """
+    Monthly aggregates of one location within [start_date, end_date] (None = open).
+
+    Returns:
+        pl.DataFrame | pyarrow.Table: month ('YYYY-MM'), days, and mean/min/max of
+            temp_max and temp_min (nulls ignored), ordered by month.
+    """
+    params = (start_date or _MIN_DATE, end_date or _MAX_DATE)
+    return _cached_query(shard_path(db_path, location), "monthly", location, (*params, as_arrow),
+                         _select(_MONTHLY_SQL, (location, *params), MONTHLY_SCHEMA, as_arrow))
+
+
+def query_derived(location, start_date=None, end_date=None, db_path=DB_PATH, as_arrow=False):
+    """
+    Precomputed derived metrics of one location within [start_date, end_date] (None = open):
+    a primary-key range read of weather_daily_derived, current as of the last
+    derived_metrics.update_derived_metrics run.
+
+    Returns:
+        pl.DataFrame | pyarrow.Table: date, temp_<var>_mean_7d / _mean_30d, temp_<var>_normal,
+            temp_<var>_anomaly for temp_max and temp_min, ordered by date.
+    """
+    params = (start_date or _MIN_DATE, end_date or _MAX_DATE)
+    return _cached_query(shard_path(db_path, location), "derived", location, (*params, as_arrow),
+                         _select(_DERIVED_SQL, (location, *params), DERIVED_SCHEMA, as_arrow))
+
+
+def query_locations(db_path=DB_PATH, as_arrow=False):
+    """
+    Stored locations with their first/last date and number of stored days, read from
+    the coverage index (a few rows per location, no scan of weather_daily; each shard
+    cached separately).
+
+    Returns:
+        pl.DataFrame | pyarrow.Table: location, first_date, last_date, days.
+    """
+    frames = [
+        _cached_query(path, "locations", None, (), _select(_LOCATIONS_SQL, (), LOCATIONS_SCHEMA, False))
+        for path in shard_paths(db_path)
+    ]
+    df = frames[0] if len(frames) == 1 else pl.concat(frames).sort("location")
+    return df.to_arrow() if as_arrow else df
+
+
+def query_cache_info():
+    """Returns {"hits", "misses", "size"} of the result cache."""
+    with _cache_lock:
+        return {**_cache_stats, "size": len(_cache)}
+
+
+def clear_query_cache():
+    """Drops every cached result and resets the hit/miss counters."""
+    with _cache_lock:
+        _cache.clear()
+        _cache_stats.update(hits=0, misses=0)
+
+
+def close_query_pools():
+    """Closes the pooled read connections (e.g. at application shutdown)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+if __name__ == "__main__":
+    import time
+
+    parser = argparse.ArgumentParser(description="Query weather_daily (cold, then cached)")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--location", help="Location key, e.g. 'Lisbon,PT' (omit to list locations)")
+    parser.add_argument("--start", help="YYYY-MM-DD")
+    parser.add_argument("--end", help="YYYY-MM-DD")
+    parser.add_argument("--latest", type=int, help="Latest N days instead of a range")
+    parser.add_argument("--monthly", action="store_true", help="Monthly aggregates")
+    parser.add_argument("--derived", action="store_true", help="Rolling means, normals and anomalies")
+    args = parser.parse_args()
+
+    if args.location is None:
+        run = lambda: query_locations(args.db)
+    elif args.latest:
+        run = lambda: query_latest(args.location, args.latest, args.db)
+    elif args.monthly:
+        run = lambda: query_monthly(args.location, args.start, args.end, args.db)
+    elif args.derived:
+        run = lambda: query_derived(args.location, args.start, args.end, args.db)
+    else:
+        run = lambda: query_range(args.location, args.start, args.end, args.db)
+
+    for label in ("cold", "cached"):
+        started = time.perf_counter()
+        df = run()
+        print(f"ℹ️  {label}: {df.height} rows in {(time.perf_counter() - started) * 1000:.2f} ms")
+    print(df)
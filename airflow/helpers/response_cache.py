@@ -0,0 +1,275 @@
+# helpers/response_cache.py
+# =====================================================
+# Module: response_cache
+#
+# On-disk cache for archive API responses.
+#
+# Historical archive data does not change, so re-runs, backfills and DB rebuilds
+# should not download it again. Responses are stored:
+#   - content-addressed: one zstd-compressed blob per distinct body, named by
+#     its sha256 (<dir>/<ab>/<sha256>.json.zst), shared by identical responses
+#   - indexed in SQLite (<dir>/index.db) by a request key - sha256 of the
+#     endpoint and its sorted query parameters (lat, lon, start/end date,
+#     variables, timezone)
+#
+# Freshness:
+#   - end_date before today - ARCHIVE_LAG_DAYS: immutable, never expires
+#   - otherwise the archive may still be revised: RESPONSE_CACHE_RECENT_TTL_SECONDS
+#
+# Size: after each store the least recently used entries are evicted until the
+# blobs fit in RESPONSE_CACHE_MAX_BYTES (a blob is deleted with its last entry).
+#
+# Validation: a 200 response can still carry a bad body. cached_get_json(validate=...)
+# stores a body only after the validator accepted it, and evicts (then refetches) a
+# cached body the validator rejects; callers that validate later call evict_response,
+# so retries always reach the API instead of replaying the bad body.
+#
+# Usage:
+#   from helpers.response_cache import cached_get_json, cached_download_to_file
+#   payload = cached_get_json(WEATHER_API_URL, params={...})
+#   frame = cached_get_json(WEATHER_API_URL, params={...}, validate=parse)   # cached only if parse succeeds
+#   evict_response(WEATHER_API_URL, params={...})                           # body turned out to be bad
+#   cached_download_to_file(WEATHER_API_URL, "data/staging/x.json", params={...})
+#
+# Dependencies:
+#   - pyarrow (zstd streams), sqlite3
+# =====================================================
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import pyarrow as pa
+from helpers import metrics
+from helpers.http_client import get_json, download_to_file
+from config.constants import (
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_DIR, RESPONSE_CACHE_RECENT_TTL_SECONDS,
+    RESPONSE_CACHE_MAX_BYTES, ARCHIVE_LAG_DAYS
+)
+
+_CODEC = "zstd"
+
+
+def request_key(url, params):
+    """Stable cache key for a GET: sha256 over the URL and its sorted, stringified params."""
+    canonical = json.dumps([url, sorted((k, str(v)) for k, v in (params or {}).items())])
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def is_immutable(params, archive_lag_days=ARCHIVE_LAG_DAYS):
+    """True if the requested range ends before the archive's still-changing window."""
+    end_date = (params or {}).get("end_date")
+    if not end_date:
+        return False
+    cutoff = datetime.date.today() - datetime.timedelta(days=archive_lag_days)
+    return datetime.date.fromisoformat(str(end_date)) < cutoff
+
+
+def _connect(cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS response_cache (
+            request_key TEXT PRIMARY KEY,
+            content_sha256 TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            immutable INTEGER NOT NULL,
+            fetched_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache (last_access)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_content ON response_cache (content_sha256)")
+    return conn
+
+
+def _blob_path(cache_dir, content_sha256):
+    return os.path.join(cache_dir, content_sha256[:2], f"{content_sha256}.json.{_CODEC}")
+
+
+def _lookup(cache_dir, key, ttl_seconds):
+    """Returns the blob path for a fresh entry (touching its LRU timestamp), else None."""
+    conn = _connect(cache_dir)
+    try:
+        row = conn.execute(
+            "SELECT content_sha256, immutable, fetched_at FROM response_cache WHERE request_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        content_sha256, immutable, fetched_at = row
+        path = _blob_path(cache_dir, content_sha256)
+        if (not immutable and time.time() - fetched_at > ttl_seconds) or not os.path.exists(path):
+            return None
+        with conn:
+            conn.execute("UPDATE response_cache SET last_access = ? WHERE request_key = ?", (time.time(), key))
+        return path
+    finally:
+        conn.close()
+
+
+def _store(cache_dir, key, source_path, immutable, max_bytes):
+    """Compresses `source_path` into the content-addressed store and indexes it under `key`."""
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    content_sha256 = digest.hexdigest()
+    path = _blob_path(cache_dir, content_sha256)
+
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(source_path, "rb") as src, pa.CompressedOutputStream(tmp_path, _CODEC) as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(tmp_path, path)   # atomic: readers never see a partial blob
+
+    now = time.time()
+    conn = _connect(cache_dir)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (key, content_sha256, os.path.getsize(path), int(immutable), now, now)
+            )
+        _evict(conn, cache_dir, max_bytes)
+    finally:
+        conn.close()
+
+
+def _delete_entry(conn, cache_dir, key, content_sha256):
+    """Removes one index entry, and its blob if no other entry shares it; returns True if the blob went."""
+    with conn:
+        conn.execute("DELETE FROM response_cache WHERE request_key = ?", (key,))
+        shared = conn.execute(
+            "SELECT 1 FROM response_cache WHERE content_sha256 = ? LIMIT 1", (content_sha256,)
+        ).fetchone()
+    if shared:
+        return False
+    try:
+        os.remove(_blob_path(cache_dir, content_sha256))
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def _evict(conn, cache_dir, max_bytes):
+    """Drops least recently used entries until the distinct blobs fit in max_bytes."""
+    total = conn.execute(
+        "SELECT COALESCE(SUM(size_bytes), 0) FROM (SELECT DISTINCT content_sha256, size_bytes FROM response_cache)"
+    ).fetchone()[0]
+    if total <= max_bytes:
+        return
+    evicted = 0
+    for key, content_sha256, size_bytes in conn.execute(
+        "SELECT request_key, content_sha256, size_bytes FROM response_cache ORDER BY last_access"
+    ).fetchall():
+        if total <= max_bytes:
+            break
+        if _delete_entry(conn, cache_dir, key, content_sha256):
+            total -= size_bytes
+        evicted += 1
+    print(f"ℹ️  Response cache: evicted {evicted} least recently used entries")
+
+
+def _discard(cache_dir, key):
+    conn = _connect(cache_dir)
+    try:
+        row = conn.execute("SELECT content_sha256 FROM response_cache WHERE request_key = ?", (key,)).fetchone()
+        if row is not None:
+            _delete_entry(conn, cache_dir, key, row[0])
+    finally:
+        conn.close()
+
+
+def evict_response(url, params=None, cache_dir=RESPONSE_CACHE_DIR):
+    """
+    Drops the cached response of this request (if any), so the next call fetches it again.
+    For callers that find a cached body invalid after cached_get_json/cached_download_to_file returned it.
+    """
+    _discard(cache_dir, request_key(url, params))
+
+
+def cached_download_to_file(
+    url, dest_path, params=None, timeout=60,
+    cache_dir=RESPONSE_CACHE_DIR, ttl_seconds=RESPONSE_CACHE_RECENT_TTL_SECONDS,
+    max_bytes=RESPONSE_CACHE_MAX_BYTES, enabled=RESPONSE_CACHE_ENABLED
+):
+    """
+    http_client.download_to_file with the response cache in front.
+
+    On a hit the cached blob is decompressed (streaming) into `dest_path`; on a miss
+    the body is downloaded and then added to the cache. A caller that finds the file
+    invalid must call evict_response, or the bad body is served again.
+
+    Returns:
+        int: Size of `dest_path` in bytes.
+    """
+    if not enabled:
+        return download_to_file(url, dest_path, params=params, timeout=timeout)
+
+    key = request_key(url, params)
+    path = _lookup(cache_dir, key, ttl_seconds)
+    metrics.increment("response_cache_requests_total", result="miss" if path is None else "hit")
+    if path is not None:
+        with pa.CompressedInputStream(path, _CODEC) as src, open(dest_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        return os.path.getsize(dest_path)
+
+    size = download_to_file(url, dest_path, params=params, timeout=timeout)
+    _store(cache_dir, key, dest_path, is_immutable(params), max_bytes)
+    return size
+
+
+def cached_get_json(
+    url, params=None, timeout=30,
+    cache_dir=RESPONSE_CACHE_DIR, ttl_seconds=RESPONSE_CACHE_RECENT_TTL_SECONDS,
+    max_bytes=RESPONSE_CACHE_MAX_BYTES, enabled=RESPONSE_CACHE_ENABLED, validate=None
+):
+    """
+    http_client.get_json with the response cache in front (same return value and errors).
+
+    With `validate` (a callable taking the payload), its return value is returned instead
+    of the payload and its exceptions propagate. A fetched body is stored only once
+    `validate` accepted it; a cached body it rejects is evicted and fetched again.
+    """
+    if not enabled:
+        payload = get_json(url, params=params, timeout=timeout)
+        return validate(payload) if validate else payload
+
+    key = request_key(url, params)
+    path = _lookup(cache_dir, key, ttl_seconds)
+    metrics.increment("response_cache_requests_total", result="miss" if path is None else "hit")
+    if path is not None:
+        with pa.CompressedInputStream(path, _CODEC) as src:
+            payload = json.loads(src.read())
+        if validate is None:
+            return payload
+        try:
+            return validate(payload)
+        except Exception:
+            # Stored before validation existed, or rejected by a newer validator: refetch
+            _discard(cache_dir, key)
+            metrics.increment("response_cache_requests_total", result="invalid")
+
+    payload = get_json(url, params=params, timeout=timeout)
+    result = validate(payload) if validate else payload   # a rejected body is never stored
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".json", dir=cache_dir)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(payload, f, separators=(",", ":"))
+        _store(cache_dir, key, tmp_path, is_immutable(params), max_bytes)
+    finally:
+        os.remove(tmp_path)
+    return result
+
+
+def clear_response_cache(cache_dir=RESPONSE_CACHE_DIR):
+    """Deletes the whole cache directory (index and blobs)."""
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    print(f"ℹ️  Cleared response cache at {cache_dir}")
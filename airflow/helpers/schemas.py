@@ -9,28 +9,30 @@ class DailyData(BaseModel):
     Fields are Optional to handle cases where:
     1. A specific variable was not requested.
     2. Data is missing/null from the provider for a given location.
+    Individual entries may also be null (sparse stations), so a single missing
+    day does not reject the whole series.
     """
     time: List[str] = Field(
         ..., 
         description="List of dates in YYYY-MM-DD format. Corresponds to the daily intervals."
     )
     
-    temperature_2m_max: Optional[List[float]] = Field(
+    temperature_2m_max: Optional[List[Optional[float]]] = Field(
         None, 
         description="Maximum daily air temperature at 2 meters above ground (°C)."
     )
     
-    temperature_2m_min: Optional[List[float]] = Field(
+    temperature_2m_min: Optional[List[Optional[float]]] = Field(
         None, 
         description="Minimum daily air temperature at 2 meters above ground (°C)."
     )
     
-    weather_code: Optional[List[float]] = Field(
+    weather_code: Optional[List[Optional[float]]] = Field(
         None, 
         description="WMO weather code indicating the general weather condition (e.g., Rain, Sun)."
     )
     
-    precipitation_sum: Optional[List[float]] = Field(
+    precipitation_sum: Optional[List[Optional[float]]] = Field(
         None, 
         description="Sum of daily precipitation (rain, showers, snow) in millimeters."
     )
@@ -40,13 +42,19 @@ class DailyData(BaseModel):
         # Prevents crashes if the API adds new features (e.g., wind_speed) in the future.
         extra = "ignore" 
 
-class WeatherResponse(BaseModel):
+class WeatherMetadata(BaseModel):
     """
-    Top-level response model for the Open-Meteo Historical Weather API.
-    Validates the metadata and the nested daily data payload.
+    Metadata envelope of an Open-Meteo Historical Weather API response.
+    Used on its own by the columnar validation path (helpers.columnar_validation),
+    which validates the daily series with Polars instead of Pydantic.
     """
     latitude: float = Field(..., description="Latitude of the location (WGS84).")
     longitude: float = Field(..., description="Longitude of the location (WGS84).")
     timezone: str = Field(..., description="Timezone identifier (e.g., 'Europe/Lisbon').")
-    
+
+class WeatherResponse(WeatherMetadata):
+    """
+    Top-level response model for the Open-Meteo Historical Weather API.
+    Validates the metadata and the nested daily data payload.
+    """
     daily: DailyData = Field(..., description="Nested object containing the daily weather series.")
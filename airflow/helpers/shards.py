@@ -0,0 +1,277 @@
+# helpers/shards.py
+# =====================================================
+# Module: shards
+#
+# Sharded storage layout for the weather database: instead of one DB_PATH file
+# (one write lock for every city), the weather tables are split across N SQLite
+# files by a stable hash of the location key:
+#
+#   data/weather.db                 single-file layout (default, DB_SHARDS = 1)
+#   data/weather_shards/layout.json {"shards": N, "hash": "crc32"}
+#   data/weather_shards/shard_00.db ... shard_<N-1>.db
+#
+# Every shard is a complete weather database (same schema, migrations, summary,
+# coverage and watermark tables) holding all rows of its locations, so each
+# location's idempotent load stays a single-shard transaction, and loads for
+# locations on different shards commit concurrently instead of queueing on one lock.
+#
+# Callers keep passing DB_PATH: the layout is discovered from disk.
+#   - Writers route through shard_path(db_path, location) (helpers.db_loader).
+#   - Per-location readers route the same way (high-water mark, helpers.queries).
+#   - Whole-table readers fan out over shard_paths(db_path) in parallel threads
+#     (sqlite3 releases the GIL while a statement runs) and merge the per-shard
+#     results in Polars (read_frames); locations never span shards, so
+#     per-location results need no cross-shard merge.
+#
+# The layout is created by db_utils.create_weather_table when DB_SHARDS > 1 and is
+# fixed from then on: an existing layout is used as found whatever DB_SHARDS says
+# (a different count needs a fresh store). An existing single-file database is moved
+# into shards with split_database.
+#
+# Usage:
+#   from helpers.shards import shard_path, shard_paths, read_frames
+#   path = shard_path(DB_PATH, "Lisbon,PT")       # the one file holding Lisbon's rows
+#   df = read_frames(DB_PATH, "SELECT * FROM weather_daily")
+#   python -m helpers.shards info
+#   python -m helpers.shards split --shards 8     # DB_PATH single file -> 8 shards
+#
+# Dependencies:
+#   - polars, sqlite3
+# =====================================================
+
+import argparse
+import json
+import os
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import polars as pl
+from config.constants import (
+    DB_PATH, DB_SHARDS, TABLE_NAME, HOURLY_TABLE_NAME, DERIVED_TABLE_NAME, CLIMATOLOGY_TABLE_NAME
+)
+
+LAYOUT_FILE = "layout.json"
+HASH_NAME = "crc32"
+
+_layouts = {}   # abspath(db_path) -> shard count of a discovered sharded layout
+
+
+def shard_dir(db_path):
+    """Directory of the sharded layout for `db_path` (data/weather.db -> data/weather_shards)."""
+    return f"{os.path.splitext(db_path)[0]}_shards"
+
+
+def shard_index(location, shards):
+    """Stable shard number of a location key (crc32, identical across processes and runs)."""
+    return zlib.crc32(location.encode("utf-8")) % shards
+
+
+def shard_count(db_path):
+    """Number of shards of the store at `db_path`: N for a sharded layout, 1 for a single file."""
+    key = os.path.abspath(db_path)
+    shards = _layouts.get(key)
+    if shards is None:
+        layout_path = os.path.join(shard_dir(db_path), LAYOUT_FILE)
+        if not os.path.exists(layout_path):
+            return 1   # not cached: the layout may be created later in this process
+        with open(layout_path) as f:
+            layout = json.load(f)
+        if layout.get("hash") != HASH_NAME:
+            raise ValueError(f"Unsupported shard hash {layout.get('hash')!r} in {layout_path}")
+        shards = _layouts[key] = int(layout["shards"])
+    return shards
+
+
+def _shard_file(db_path, index):
+    return os.path.join(shard_dir(db_path), f"shard_{index:02d}.db")
+
+
+def shard_paths(db_path):
+    """Every database file of the store (just [db_path] for the single-file layout)."""
+    shards = shard_count(db_path)
+    if shards == 1:
+        return [db_path]
+    return [_shard_file(db_path, i) for i in range(shards)]
+
+
+def shard_path(db_path, location):
+    """Shard router: the database file that holds (and receives) `location`'s rows."""
+    shards = shard_count(db_path)
+    if shards == 1:
+        return db_path
+    return _shard_file(db_path, shard_index(location, shards))
+
+
+def init_layout(db_path, shards=DB_SHARDS):
+    """
+    Returns the store's database files, creating the sharded layout on first use
+    when shards > 1. An existing sharded layout is always used as found.
+
+    Raises:
+        ValueError: If a single-file database with data would be hidden by a new
+            sharded layout (move it with split_database instead).
+    """
+    existing = shard_count(db_path)
+    if existing > 1:
+        if shards > 1 and shards != existing:
+            print(f"⚠️ {db_path} is stored as {existing} shards ({shards} configured); "
+                  "using the existing layout, the shard count of a store cannot change")
+        return shard_paths(db_path)
+    if shards <= 1:
+        return [db_path]
+
+    if os.path.exists(db_path):
+        raise ValueError(
+            f"{db_path} already exists as a single file; move it into shards with "
+            f"`python -m helpers.shards split --db {db_path} --shards {shards}`"
+        )
+    _write_layout(db_path, shards)
+    return shard_paths(db_path)
+
+
+def _write_layout(db_path, shards):
+    directory = shard_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, LAYOUT_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"shards": shards, "hash": HASH_NAME}, f)
+    os.replace(tmp_path, os.path.join(directory, LAYOUT_FILE))
+    _layouts[os.path.abspath(db_path)] = shards
+
+
+def map_shards(db_path, func):
+    """
+    Calls func(shard_file) for every existing database file of the store, in parallel
+    threads when sharded.
+
+    Returns:
+        list: The results, in shard order.
+    """
+    paths = [p for p in shard_paths(db_path) if os.path.exists(p)]
+    if len(paths) <= 1:
+        return [func(p) for p in paths]
+    with ThreadPoolExecutor(max_workers=len(paths), thread_name_prefix="shard-read") as pool:
+        return list(pool.map(func, paths))
+
+
+def read_frames(db_path, query, schema=None):
+    """
+    Runs `query` on every shard and concatenates the results (the unified read view).
+
+    Row-level queries (SELECT ... WHERE ...) give the same rows as on a single file;
+    aggregates come back per shard and must be re-aggregated by the caller. Ordering
+    holds within each shard only.
+
+    Returns:
+        pl.DataFrame: Rows of all shards (empty, with `schema` if given, when no shard has data).
+    """
+    def read(path):
+        with sqlite3.connect(path) as conn:
+            return pl.read_database(query, conn, schema_overrides=schema)
+
+    frames = [df for df in map_shards(db_path, read) if df.height]
+    if not frames:
+        return pl.DataFrame(schema=schema)
+    return pl.concat(frames, how="vertical_relaxed")
+
+
+def split_database(db_path=DB_PATH, shards=DB_SHARDS):
+    """
+    Moves a single-file database into a new sharded layout next to it.
+
+    Daily and hourly rows, load generations, derived metrics (climatology, derived
+    rows and their pending queue) are copied to their shards (ATTACH + INSERT ...
+    SELECT), then each shard's summary and coverage tables are rebuilt. Every copied
+    table's row count is checked against the source. The source file is kept
+    (renamed to <db_path>.presplit) for the operator to delete.
+
+    Returns:
+        list[str]: The shard files.
+
+    Raises:
+        RuntimeError: If the shards do not hold exactly the source's rows.
+    """
+    # db_utils imports this module (create_weather_table routes through it)
+    from helpers.db_utils import create_weather_table, connect, LOAD_WATERMARK_TABLE, DERIVED_PENDING_TABLE
+    from helpers.yearly_summary import rebuild_summary_table
+    from helpers.coverage import rebuild_coverage_table
+
+    if shards <= 1:
+        raise ValueError("split_database needs shards > 1")
+    if shard_count(db_path) > 1 or os.path.exists(os.path.join(shard_dir(db_path), LAYOUT_FILE)):
+        raise ValueError(f"{shard_dir(db_path)} already holds a sharded layout")
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"No weather database at {db_path}")
+
+    create_weather_table(db_path, shards=1)   # bring the source to the current schema first
+    source = os.path.abspath(db_path) + ".presplit"
+    os.replace(db_path, source)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.replace(db_path + suffix, source + suffix)
+
+    # Tables copied row for row (same schema on both sides); summary and coverage are rebuilt
+    copied_tables = [HOURLY_TABLE_NAME, LOAD_WATERMARK_TABLE, DERIVED_TABLE_NAME,
+                     CLIMATOLOGY_TABLE_NAME, DERIVED_PENDING_TABLE]
+    paths = create_weather_table(db_path, shards=shards)
+    for index, path in enumerate(paths):
+        conn = connect(path)
+        try:
+            conn.create_function("shard_index", 1, lambda loc: shard_index(loc, shards), deterministic=True)
+            conn.execute("ATTACH DATABASE ? AS source", (source,))
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+            cursor.execute(f"""
+                INSERT INTO {TABLE_NAME} (location, date, temp_max, temp_min, weather_code)
+                SELECT location, date, temp_max, temp_min, weather_code FROM source.{TABLE_NAME}
+                WHERE shard_index(location) = ? ORDER BY location, date
+            """, (index,))
+            rows = cursor.rowcount
+            for table in copied_tables:
+                cursor.execute(f"""
+                    INSERT INTO {table}
+                    SELECT * FROM source.{table} WHERE shard_index(location) = ?
+                """, (index,))
+            rebuild_summary_table(cursor)
+            rebuild_coverage_table(cursor)
+            conn.commit()
+            conn.execute("DETACH DATABASE source")
+        finally:
+            conn.close()
+        print(f"✅ {path}: {rows} daily rows")
+
+    def table_counts(path):
+        with sqlite3.connect(path) as conn:
+            return [conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in (TABLE_NAME, *copied_tables)]
+
+    expected = table_counts(source)
+    actual = [sum(counts) for counts in zip(*map_shards(db_path, table_counts))]
+    mismatched = [f"{table} ({have} of {want})"
+                  for table, have, want in zip((TABLE_NAME, *copied_tables), actual, expected) if have != want]
+    if mismatched:
+        raise RuntimeError(f"Split of {db_path} is incomplete: {', '.join(mismatched)} rows; "
+                           f"the original is kept at {source}")
+    print(f"✅ Split {db_path} into {shards} shards under {shard_dir(db_path)}; "
+          f"the original is kept at {source}")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded weather storage")
+    parser.add_argument("command", choices=["info", "split"])
+    parser.add_argument("--db", default=DB_PATH, help="Path of the (logical) weather database")
+    parser.add_argument("--shards", type=int, default=DB_SHARDS, help="Shard count for split")
+    args = parser.parse_args()
+
+    if args.command == "split":
+        split_database(args.db, args.shards)
+    else:
+        def row_count(path):
+            with sqlite3.connect(path) as conn:
+                return conn.execute(f"SELECT COUNT(*), COUNT(DISTINCT location) FROM {TABLE_NAME}").fetchone()
+
+        print(f"ℹ️  {args.db}: {shard_count(args.db)} shard(s)")
+        existing = [p for p in shard_paths(args.db) if os.path.exists(p)]
+        for path, (rows, locations) in zip(existing, map_shards(args.db, row_count)):
+            print(f"   {path}: {rows} rows, {locations} locations")
@@ -1,8 +1,33 @@
+import datetime
+import json
 import os
+import shutil
 import sqlite3
+import time
 import polars as pl
+from helpers import metrics
 from helpers.csv_path_writer import save_exported_csv_path_if_missing
-from config.constants import DB_PATH, EXPORT_QUERY, EXPORT_CSV
+from helpers.city_utils import location_slug
+from helpers.shards import map_shards, read_frames, shard_count
+from config.constants import (
+    DB_PATH, EXPORT_QUERY, EXPORT_CSV, TABLE_NAME,
+    EXPORT_PARQUET_DIR, EXPORT_PARQUET_MANIFEST, EXPORT_BATCH_SIZE
+)
+
+# Column layout of exported Parquet partitions
+PARQUET_EXPORT_SCHEMA = {
+    "location": pl.Utf8,
+    "date": pl.Utf8,
+    "temp_max": pl.Float64,
+    "temp_min": pl.Float64,
+    "weather_code": pl.Int64,
+}
+
+def _record_export(fmt, rows, seconds):
+    metrics.set_gauge("export_rows", rows, format=fmt)
+    metrics.set_gauge("export_seconds", seconds, format=fmt)
+    metrics.set_gauge("export_rows_per_second", rows / seconds if seconds > 0 else 0.0, format=fmt)
+
 
 def export_sqlite_to_csv_with_polars(
     sqlite_db_path=DB_PATH,
@@ -11,31 +36,141 @@ def export_sqlite_to_csv_with_polars(
     sample_lines=5,
     overwrite=False
 ):
+    """
+    Exports `query` (every shard, concatenated) to `output_csv` and records its path.
+
+    Returns:
+        bool: True if the CSV was written; False if it already exists (without
+            overwrite) or the table is empty.
+
+    Raises:
+        Exception: Database and write errors propagate (the DAG export task must fail).
+    """
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     # Check for existing non-empty CSV
     if os.path.exists(output_csv) and os.path.getsize(output_csv) > 0 and not overwrite:
         print(f"CSV '{output_csv}' already exists and is non-empty. Skipping export.")
         return False
-    try:
-        with sqlite3.connect(sqlite_db_path) as conn:
-            df = pl.read_database(query, conn)
-        if df.is_empty():
-            print("No data found in the database. Export skipped.")
-            return False
-        df.write_csv(output_csv)
-        print(f"✅ Data exported to '{output_csv}'")
-        print("=" * 45)
-        print("Sample of exported data:")
-        print(df.head(sample_lines))  # Only uses Polars, no pandas
-        print("=" * 45)
-
-        # Safely save export path only if record file does not exist yet
-        save_exported_csv_path_if_missing("airflow/config/export_csv_path.txt", output_csv)
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error during export: {e}")
+    started = time.perf_counter()
+    # One read per shard (in parallel when sharded), concatenated
+    df = read_frames(sqlite_db_path, query)
+    if df.is_empty():
+        print("No data found in the database. Export skipped.")
         return False
+    df.write_csv(output_csv)
+    _record_export("csv", df.height, time.perf_counter() - started)
+    print(f"✅ Data exported to '{output_csv}'")
+    print("=" * 45)
+    print("Sample of exported data:")
+    print(df.head(sample_lines))  # Only uses Polars, no pandas
+    print("=" * 45)
+
+    # Safely save export path only if record file does not exist yet
+    save_exported_csv_path_if_missing("airflow/config/export_csv_path.txt", output_csv)
+    return True
+
+def export_sqlite_to_parquet_partitions(
+    sqlite_db_path=DB_PATH,
+    output_dir=EXPORT_PARQUET_DIR,
+    manifest_path=EXPORT_PARQUET_MANIFEST,
+    batch_size=EXPORT_BATCH_SIZE
+):
+    """
+    Streams weather_daily into Parquet files partitioned by location and year, plus a manifest.
+
+    Rows are read in (location, date) order (served by the unique index, no sort) in
+    batches of `batch_size`, so memory is bounded by one batch plus one partition
+    whatever the table size (per shard: sharded stores stream every shard in
+    parallel; a location's partitions all come from its one shard). Layout:
+        <output_dir>/location=<slug>/year=<YYYY>/part.parquet
+    (slug: city_utils.location_slug, unique per location key).
+    The export is built in a temporary directory and swapped in at the end, so readers
+    never see a half-written export and every run reflects the current table.
+
+    Manifest (JSON at `manifest_path`): generated_at, db_path, shards, output_dir, total_rows and
+    a `partitions` list of {location, year, path, rows}. Readers can use it to skip
+    partitions they do not need.
+
+    Returns:
+        dict | None: The manifest, or None if the table is empty.
+
+    Raises:
+        RuntimeError: If two partitions map to the same path (the previous export is kept).
+        Exception: Database and write errors propagate (the previous export is kept).
+    """
+    started = time.perf_counter()
+    tmp_dir = f"{output_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    partitions = []
+
+    def write_partitions(df):
+        for (location, year), part in df.partition_by(["location", "year"], as_dict=True, maintain_order=True).items():
+            part_dir = os.path.join(tmp_dir, f"location={location_slug(location)}", f"year={year}")
+            os.makedirs(part_dir, exist_ok=True)
+            part_path = os.path.join(part_dir, "part.parquet")
+            part.drop("year").write_parquet(part_path, compression="zstd")
+            final_path = os.path.join(output_dir, os.path.relpath(part_path, tmp_dir))
+            partitions.append({"location": location, "year": year, "path": final_path, "rows": part.height})
+
+    def export_shard(path):
+        with sqlite3.connect(path) as conn:
+            cursor = conn.execute(
+                f"SELECT {', '.join(PARQUET_EXPORT_SCHEMA)} FROM {TABLE_NAME} ORDER BY location, date"
+            )
+            carry = None
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                df = pl.DataFrame(rows, schema=PARQUET_EXPORT_SCHEMA, orient="row")
+                df = df.with_columns(pl.col("date").str.slice(0, 4).cast(pl.Int32).alias("year"))
+                if carry is not None:
+                    df = pl.concat([carry, df])
+                # The last (location, year) may continue in the next batch; hold it back
+                is_last = (pl.col("location") == df["location"][-1]) & (pl.col("year") == df["year"][-1])
+                carry = df.filter(is_last)
+                write_partitions(df.filter(~is_last))
+            if carry is not None:
+                write_partitions(carry)
+
+    try:
+        map_shards(sqlite_db_path, export_shard)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if not partitions:
+        print("No data found in the database. Parquet export skipped.")
+        return None
+
+    # A shared path means one partition overwrote another: never publish that export
+    paths = [p["path"] for p in partitions]
+    if len(set(paths)) != len(paths):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        duplicates = sorted({path for path in paths if paths.count(path) > 1})
+        raise RuntimeError(f"Parquet partitions share paths (export aborted): {', '.join(duplicates[:5])}")
+
+    # Swap the fresh export in place of the previous one
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+
+    partitions.sort(key=lambda p: (p["location"], p["year"]))   # shard threads finish in any order
+    manifest = {
+        "generated_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "db_path": sqlite_db_path,
+        "shards": shard_count(sqlite_db_path),
+        "output_dir": output_dir,
+        "total_rows": sum(p["rows"] for p in partitions),
+        "partitions": partitions,
+    }
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    _record_export("parquet", manifest["total_rows"], time.perf_counter() - started)
+    print(f"✅ Exported {manifest['total_rows']} rows to {len(partitions)} Parquet partitions under '{output_dir}'")
+    print(f"✅ Parquet manifest written to '{manifest_path}'")
+    return manifest
+
 
 if __name__ == "__main__":
     
@@ -0,0 +1,127 @@
+# helpers/staging.py
+# =====================================================
+# Module: staging
+#
+# On-disk staging of fetched weather payloads between the DAG's fetch and
+# insert tasks.
+#
+# The fetch task writes each validated response (one file per city/chunk) as a
+# compact zstd-compressed Parquet file and passes only a small reference
+# {location, path, sha256, rows} through XCom. The insert task bulk-loads the
+# file directly. Large series never land in the Airflow metadata DB, and the
+# payload is validated by Pydantic only once (at fetch time).
+# File names include the writer's run id (the DAG passes run id + try number),
+# so concurrent runs staging the same city and range keep separate files.
+#
+# Usage:
+#   from helpers.staging import write_weather_staging, read_weather_staging
+#   ref = write_weather_staging(weather_obj, "Lisbon,PT", run_id="manual__2025-01-01_try1")
+#   df = read_weather_staging(ref)   # verifies the checksum
+#
+# Dependencies:
+#   - polars
+# =====================================================
+
+import hashlib
+import os
+import re
+from typing import Optional
+import polars as pl
+from helpers.schemas import WeatherResponse
+from helpers.city_utils import location_slug
+from config.constants import STAGING_DIR
+
+# Column layout matches the weather_daily table
+STAGING_SCHEMA = {
+    "date": pl.Utf8,
+    "temp_max": pl.Float64,
+    "temp_min": pl.Float64,
+    "weather_code": pl.Int64,
+}
+
+
+def _file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def weather_response_to_frame(weather_data: WeatherResponse) -> pl.DataFrame:
+    """
+    Converts the daily block of a WeatherResponse into a weather_daily-shaped DataFrame.
+
+    Mirrors insert_weather_data's zip() semantics: a variable that was not returned
+    counts as an empty list, and rows are truncated to the shortest series.
+    """
+    daily = weather_data.daily
+    columns = {
+        "date": daily.time,
+        "temp_max": daily.temperature_2m_max or [],
+        "temp_min": daily.temperature_2m_min or [],
+        "weather_code": daily.weather_code or [],
+    }
+    n_rows = min(len(values) for values in columns.values())
+    return pl.DataFrame(
+        {name: values[:n_rows] for name, values in columns.items()},
+        schema=STAGING_SCHEMA,
+        strict=False
+    )
+
+
+def write_weather_staging(
+    weather_data, location: str, staging_dir: str = STAGING_DIR, run_id: Optional[str] = None
+) -> dict:
+    """
+    Writes one fetched response to a Parquet staging file.
+
+    Args:
+        weather_data (WeatherResponse | pl.DataFrame): Validated response (one city, one chunk),
+            either a Pydantic model or a frame from the columnar validation path.
+        location (str): Location key the rows belong to.
+        staging_dir (str): Directory for staging files.
+        run_id (str, optional): Identifies the writer (e.g. Airflow run id + try number).
+            Part of the file name, so overlapping runs or retries staging the same city
+            and range never write, or clean up, each other's files.
+
+    Returns:
+        dict: XCom-safe reference {location, path, sha256, rows}.
+    """
+    os.makedirs(staging_dir, exist_ok=True)
+    if isinstance(weather_data, pl.DataFrame):
+        df = weather_data.select(list(STAGING_SCHEMA)).cast(STAGING_SCHEMA)
+    else:
+        df = weather_response_to_frame(weather_data)
+
+    # File name: <location>_<first date>_<last date>[_<run id>].parquet (made filesystem-safe)
+    safe_location = location_slug(location)
+    first, last = (df["date"][0], df["date"][-1]) if df.height else ("empty", "empty")
+    name = f"{safe_location}_{first}_{last}"
+    if run_id:
+        name += "_" + re.sub(r"[^A-Za-z0-9.-]+", "-", run_id)
+    path = os.path.join(staging_dir, f"{name}.parquet")
+
+    df.write_parquet(path, compression="zstd")
+    ref = {"location": location, "path": path, "sha256": _file_sha256(path), "rows": df.height}
+    print(f"✅ Staged {df.height} rows for {location} at {path}")
+    return ref
+
+
+def read_weather_staging(ref: dict) -> pl.DataFrame:
+    """
+    Loads a staging file, verifying it against the checksum recorded at write time.
+
+    Raises:
+        ValueError: If the file content does not match the recorded sha256.
+    """
+    checksum = _file_sha256(ref["path"])
+    if checksum != ref["sha256"]:
+        raise ValueError(f"Checksum mismatch for staging file {ref['path']}")
+    return pl.read_parquet(ref["path"])
+
+
+def remove_weather_staging(ref: dict):
+    """Deletes a staging file once its rows are loaded (missing files are ignored)."""
+    if os.path.exists(ref["path"]):
+        os.remove(ref["path"])
@@ -1,40 +1,255 @@
-import requests
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Union
+import polars as pl
 from pydantic import ValidationError
 
 # Import schemas
 from helpers.schemas import WeatherResponse
+from helpers.columnar_validation import parse_weather_payload, ColumnarValidationError
 
 # Import helpers
+from helpers import metrics
 from helpers.geocode_utils import get_city_coordinates
+from helpers.http_client import HTTPClientError
+from helpers.response_cache import cached_get_json, evict_response
 from helpers.date_utils import get_interval_start_to_end_dates # Needed for default calculation
+from helpers.date_utils import split_date_range
 
 # Import all constants for defaults
 from config.constants import (
     CITY_NAME, COUNTRY, WEATHER_API_URL, DAILY_VARIABLES, 
-    START_YEAR, TIMEZONE, NUM_YEARS, DIRECTION
+    START_YEAR, TIMEZONE, NUM_YEARS, DIRECTION,
+    FETCH_CHUNK_YEARS, FETCH_CHUNK_WORKERS, FETCH_CHUNK_RETRIES, WEATHER_API_BATCH_SIZE,
+    CITY_DEFAULT_TIMEZONE
 )
 
-# Pre-calculate default dates if you want them as defaults
-# (Note: This runs on import, so it fixes the dates to "today")
-DEFAULT_START, DEFAULT_END = get_interval_start_to_end_dates(START_YEAR, NUM_YEARS, DIRECTION)
+def _default_dates(start_date=None, end_date=None):
+    """
+    Fills in missing dates from the configured interval, computed at call time
+    (not at import, so long-lived workers never reuse a stale "today").
+    """
+    if start_date is None or end_date is None:
+        default_start, default_end = get_interval_start_to_end_dates(START_YEAR, NUM_YEARS, DIRECTION)
+        start_date = start_date or default_start
+        end_date = end_date or default_end
+    return start_date, end_date
 
 def fetch_weather_data(
     city_name: str = CITY_NAME, 
     country: str = COUNTRY, 
     weather_api_url: str = WEATHER_API_URL, 
-    start_date: str = DEFAULT_START, # Uses the calculated string
-    end_date: str = DEFAULT_END,     # Uses the calculated string
+    start_date: Optional[str] = None, # None = configured interval (computed per call)
+    end_date: Optional[str] = None,
     daily_variables: list = DAILY_VARIABLES, 
     timezone: str = TIMEZONE
 ) -> Optional[WeatherResponse]:
     """
     Fetches weather data using Project Constants as defaults.
     Allows running without arguments to fetch the 'configured' city/range.
+
+    Raises:
+        RuntimeError: If the city could not be geocoded.
+        requests.HTTPError / HTTPClientError: See _request_weather.
     """
-    
+    start_date, end_date = _default_dates(start_date, end_date)
     lat, lon = get_city_coordinates(city_name, country)
-    
+    if lat is None:
+        raise RuntimeError(f"No coordinates for {city_name}, {country}; nothing fetched")
+    return _request_weather(
+        lat, lon, weather_api_url, start_date, end_date, daily_variables, timezone, city_name
+    )
+
+
+def iter_weather_chunks(
+    city_name: str = CITY_NAME,
+    country: str = COUNTRY,
+    weather_api_url: str = WEATHER_API_URL,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    daily_variables: list = DAILY_VARIABLES,
+    timezone: str = TIMEZONE,
+    chunk_years: int = FETCH_CHUNK_YEARS,
+    max_workers: int = FETCH_CHUNK_WORKERS,
+    chunk_retries: int = FETCH_CHUNK_RETRIES,
+    columnar: bool = False
+) -> Iterator[Union[WeatherResponse, pl.DataFrame]]:
+    """
+    Fetches a long date range as calendar-aligned chunks, concurrently, yielding each
+    validated chunk in date order.
+    With columnar=True chunks are validated with Polars (helpers.columnar_validation)
+    and yielded as weather_daily-shaped DataFrames instead of WeatherResponse objects.
+
+    Up to `max_workers` chunks are requested ahead of the one the consumer is waiting
+    for, so memory stays bounded by a few chunks whatever the range length. A failed
+    chunk is retried on its own (`chunk_retries` extra attempts) without restarting
+    the others. Only transient failures are retried: a response that failed validation,
+    or an HTTPClientError (429/5xx/connection errors that outlasted the HTTP client's
+    own retries). A 4xx response is a bad request and fails at once.
+
+    Chunks are yielded strictly in date order and never past a chunk that failed:
+    callers load them as they arrive, and the INCREMENTAL high-water mark (latest
+    stored date) must not move past a gap it would then never refetch.
+
+    Raises:
+        RuntimeError: If the city could not be geocoded (nothing is yielded), or if a
+            chunk still failed after its retries. The chunks before it
+            were yielded and stay valid; it and the later chunks were not yielded.
+        requests.HTTPError: On a 4xx response for a chunk (same partial-yield rule).
+
+    Usage:
+        for chunk in iter_weather_chunks("Lisbon", "PT", start_date="1940-01-01", end_date="2024-12-31"):
+            insert_weather_data(DB_PATH, chunk, "Lisbon,PT")
+    """
+    start_date, end_date = _default_dates(start_date, end_date)
+    lat, lon = get_city_coordinates(city_name, country)
+    if lat is None:
+        raise RuntimeError(f"No coordinates for {city_name}, {country}; nothing fetched")
+
+    chunks = split_date_range(start_date, end_date, chunk_years)
+
+    def fetch_chunk(chunk):
+        for attempt in range(chunk_retries + 1):
+            try:
+                result = _request_weather(
+                    lat, lon, weather_api_url, chunk[0], chunk[1], daily_variables, timezone,
+                    f"{city_name} {chunk[0]}..{chunk[1]}", columnar
+                )
+            except HTTPClientError as e:
+                # A 4xx (requests.HTTPError) propagates: retrying a bad request cannot help
+                print(f"❌ Error: {e}")
+                result = None
+            if result is not None:
+                return result
+            if attempt < chunk_retries:
+                print(f"🔁 Retrying chunk {chunk[0]}..{chunk[1]} for {city_name} ({attempt + 1}/{chunk_retries})")
+        return None
+
+    failed_index = None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        in_flight = {}   # chunk index -> future, requested but not yet yielded
+        submitted = 0
+        try:
+            for index in range(len(chunks)):
+                # Sliding window: never more than max_workers chunks requested but not yet consumed
+                while submitted < len(chunks) and submitted - index < max_workers:
+                    in_flight[submitted] = pool.submit(fetch_chunk, chunks[submitted])
+                    submitted += 1
+                result = in_flight.pop(index).result()
+                if result is None:
+                    failed_index = index
+                    break
+                yield result
+        finally:
+            for future in in_flight.values():
+                future.cancel()   # requests already running finish and are discarded
+
+    if failed_index is not None:
+        start, end = chunks[failed_index]
+        skipped = len(chunks) - failed_index - 1
+        raise RuntimeError(
+            f"Chunk {start}..{end} failed for {city_name}; it and {skipped} later chunk(s) "
+            f"up to {chunks[-1][1]} were not loaded"
+        )
+
+
+def fetch_weather_data_batch(
+    cities: List[dict],
+    weather_api_url: str = WEATHER_API_URL,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    daily_variables: list = DAILY_VARIABLES,
+    batch_size: int = WEATHER_API_BATCH_SIZE
+) -> Dict[str, Optional[WeatherResponse]]:
+    """
+    Fetches many cities with few HTTP calls using Open-Meteo's multi-location requests.
+
+    Cities are grouped by date range (a city dict may carry its own start_date/end_date,
+    e.g. from the incremental planner), split into batches of `batch_size`, and each
+    batch is sent as one request with comma-separated latitude/longitude/timezone lists.
+    The response array is demultiplexed back into one WeatherResponse per city.
+    Coordinates come from the geocode cache, so warm cities cost no geocoding calls.
+
+    Args:
+        cities (list[dict]): Entries as returned by city_utils.load_city_list.
+        weather_api_url (str): Archive endpoint.
+        start_date, end_date (str, optional): Default range for cities without their own
+            (None = configured interval).
+        daily_variables (list): Daily variables to request.
+        batch_size (int): Max locations per request.
+
+    Returns:
+        dict: location key -> WeatherResponse, or None if that city could not be fetched.
+
+    Raises:
+        requests.HTTPError: On a non-retryable 4xx response (the request itself is wrong).
+    """
+    start_date, end_date = _default_dates(start_date, end_date)
+    results = {}
+    groups = {}
+    for city in cities:
+        lat, lon = get_city_coordinates(city['city_name'], city['country'])
+        if lat is None:
+            print(f"❌ No coordinates for {city['location']}; skipping.")
+            results[city['location']] = None
+            continue
+        date_range = (city.get('start_date', start_date), city.get('end_date', end_date))
+        groups.setdefault(date_range, []).append((city, lat, lon))
+
+    for (range_start, range_end), members in groups.items():
+        for i in range(0, len(members), batch_size):
+            batch = members[i:i + batch_size]
+            params = {
+                'latitude': ','.join(str(lat) for _, lat, _ in batch),
+                'longitude': ','.join(str(lon) for _, _, lon in batch),
+                'start_date': range_start,
+                'end_date': range_end,
+                'daily': ','.join(daily_variables),
+                'timezone': ','.join(city.get('timezone') or CITY_DEFAULT_TIMEZONE for city, _, _ in batch),
+            }
+            try:
+                payload = cached_get_json(weather_api_url, params=params, timeout=60)
+            except HTTPClientError as e:
+                print(f"❌ Batch request failed for {len(batch)} cities: {e}")
+                results.update({city['location']: None for city, _, _ in batch})
+                continue
+
+            # A single location comes back as an object, several as an array (same order as sent)
+            entries = payload if isinstance(payload, list) else [payload]
+            if len(entries) != len(batch):
+                print(f"❌ Batch response has {len(entries)} results for {len(batch)} cities; discarding batch.")
+                results.update({city['location']: None for city, _, _ in batch})
+                evict_response(weather_api_url, params)
+                continue
+
+            for (city, _, _), entry in zip(batch, entries):
+                try:
+                    with metrics.timed("validation_seconds", mode="pydantic"):
+                        results[city['location']] = WeatherResponse.model_validate(entry)
+                except ValidationError as e:
+                    print(f"❌ Validation Error for {city['location']}: {e}")
+                    metrics.increment("validation_failures_total", mode="pydantic")
+                    results[city['location']] = None
+            if any(results[city['location']] is None for city, _, _ in batch):
+                # Keep the valid entries, but fetch the whole batch again next time
+                evict_response(weather_api_url, params)
+
+    fetched = sum(1 for r in results.values() if r is not None)
+    print(f"✅ Batch fetch: {fetched}/{len(results)} cities fetched")
+    return results
+
+
+def _request_weather(
+    lat, lon, weather_api_url, start_date, end_date, daily_variables, timezone, label, columnar=False
+) -> Optional[Union[WeatherResponse, pl.DataFrame]]:
+    """
+    Single archive request for one coordinate pair.
+    Returns a WeatherResponse, or a weather_daily-shaped DataFrame when columnar=True;
+    None if the response failed validation.
+
+    Raises:
+        requests.HTTPError: On a non-retryable 4xx response.
+        HTTPClientError: When retryable failures persist after the client's retries.
+    """
     params = {
         'latitude': lat,
         'longitude': lon,
@@ -44,14 +259,19 @@ def fetch_weather_data(
         'timezone': timezone,
     }
     
+    def validate(payload):
+        with metrics.timed("validation_seconds", mode="columnar" if columnar else "pydantic"):
+            if columnar:
+                _, frame = parse_weather_payload(payload)
+                return frame
+            return WeatherResponse.model_validate(payload)
+
     try:
-        response = requests.get(weather_api_url, params=params, timeout=30)
-        response.raise_for_status()
-        return WeatherResponse.model_validate(response.json())
+        # On-disk response cache first; then pooled session, retries with backoff, shared rate limit.
+        # Validated before it is cached: a bad body is never replayed to the chunk retries
+        return cached_get_json(weather_api_url, params=params, timeout=30, validate=validate)
 
-    except ValidationError as e:
-        print(f"❌ Validation Error for {city_name}: {e}")
-        return None
-    except Exception as e:
-        print(f"❌ Error: {e}")
+    except (ValidationError, ColumnarValidationError) as e:
+        print(f"❌ Validation Error for {label}: {e}")
+        metrics.increment("validation_failures_total", mode="columnar" if columnar else "pydantic")
         return None
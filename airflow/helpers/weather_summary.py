@@ -0,0 +1,189 @@
+# helpers/weather_summary.py
+# =====================================================
+# Module: weather_summary
+#
+# Polars port of the Julia summary step (analysis_jl/analysis.jl).
+#
+# Produces the same yearly summary CSV and manifest as the Julia script, so the
+# R animation can consume either engine's output unchanged:
+#   year, weather_code, weather_desc, count,
+#   mean/min/max/std_tempmax, mean/min/max/std_tempmin
+#
+# The query is a lazy Polars plan over the exported data (partitioned Parquet
+# via its manifest when EXPORT_FORMATS includes parquet, otherwise the exported
+# CSV, the file analysis.jl reads) and is executed with the streaming engine. It avoids Julia process startup and JIT on every
+# DAG run.
+#
+# Julia semantics reproduced on purpose:
+#   - weather_desc comes from WEATHERCODE_LOOKUP, "Unknown" for unlisted codes
+#   - statistics over a group containing a missing value are missing
+#     (Julia's mean/std/minimum/maximum propagate `missing`)
+#   - std is the sample std; undefined (single-row) values are written empty
+#
+# Usage:
+#   python -m helpers.weather_summary                       # write summary + manifest
+#   python -m helpers.weather_summary --check-parity <csv>  # compare with a Julia output
+# =====================================================
+
+import argparse
+import json
+import os
+import polars as pl
+from config.constants import (
+    EXPORT_CSV, EXPORT_PARQUET_MANIFEST, EXPORT_FORMATS, SUMMARY_CSV_PATH,
+    WEATHER_SUMMARY_CSV_MANIFEST, WEATHERCODE_LOOKUP
+)
+
+SUMMARY_COLUMNS = [
+    "year", "weather_code", "weather_desc", "count",
+    "mean_tempmax", "min_tempmax", "max_tempmax", "std_tempmax",
+    "mean_tempmin", "min_tempmin", "max_tempmin", "std_tempmin",
+]
+
+
+def scan_weather_data(parquet_manifest=EXPORT_PARQUET_MANIFEST, csv_path=EXPORT_CSV,
+                      formats=EXPORT_FORMATS) -> pl.LazyFrame:
+    """
+    Lazily scans the exported weather rows: the Parquet partitions listed in the
+    manifest if `formats` (the formats the export task writes) includes parquet,
+    otherwise the exported CSV. An export of a format that is no longer written is
+    never read, however recent its file looks: it is not refreshed by the DAG.
+
+    Raises:
+        FileNotFoundError: If the export of the selected format does not exist.
+    """
+    if "parquet" in formats and os.path.exists(parquet_manifest):
+        with open(parquet_manifest) as f:
+            paths = [p["path"] for p in json.load(f)["partitions"]]
+        return pl.scan_parquet(paths)
+    if "csv" in formats and os.path.exists(csv_path):
+        return pl.scan_csv(csv_path)
+    raise FileNotFoundError(f"No current weather export found for formats {list(formats)} "
+                            f"({parquet_manifest} / {csv_path})")
+
+
+def _julia_stat(column, func, name):
+    # Julia propagates `missing`: one null in the group makes the statistic missing
+    stat = func(pl.col(column))
+    return pl.when(pl.col(column).null_count() == 0).then(stat).otherwise(None).alias(name)
+
+
+def build_summary(weather: pl.LazyFrame) -> pl.LazyFrame:
+    """Lazy group-by equivalent to analysis.jl's @chain pipeline."""
+    stats = []
+    for column, suffix in (("temp_max", "tempmax"), ("temp_min", "tempmin")):
+        stats += [
+            _julia_stat(column, lambda c: c.mean(), f"mean_{suffix}"),
+            _julia_stat(column, lambda c: c.min(), f"min_{suffix}"),
+            _julia_stat(column, lambda c: c.max(), f"max_{suffix}"),
+            _julia_stat(column, lambda c: c.std(ddof=1), f"std_{suffix}"),
+        ]
+
+    return (
+        weather
+        .with_columns(
+            pl.col("date").cast(pl.Utf8).str.slice(0, 4).cast(pl.Int64).alias("year"),
+            pl.col("weather_code").cast(pl.Int64),
+            pl.col("temp_max").cast(pl.Float64),
+            pl.col("temp_min").cast(pl.Float64),
+        )
+        .with_columns(
+            pl.col("weather_code")
+            .replace_strict(WEATHERCODE_LOOKUP, default="Unknown", return_dtype=pl.Utf8)
+            .fill_null("Unknown")
+            .alias("weather_desc")
+        )
+        .group_by(["year", "weather_code", "weather_desc"])
+        .agg([pl.len().cast(pl.Int64).alias("count")] + stats)
+        # Undefined std (single-row groups) -> missing, as analysis.jl does
+        .with_columns(pl.col("std_tempmax", "std_tempmin").fill_nan(None))
+        .select(SUMMARY_COLUMNS)
+        .sort(["year", "weather_code"], nulls_last=True)
+    )
+
+
+def compute_weather_summary(parquet_manifest=EXPORT_PARQUET_MANIFEST, csv_path=EXPORT_CSV,
+                            formats=EXPORT_FORMATS) -> pl.DataFrame:
+    """Runs the summary query with the streaming engine and returns the result."""
+    return build_summary(scan_weather_data(parquet_manifest, csv_path, formats)).collect(engine="streaming")
+
+
+def run_weather_summary(
+    summary_csv=SUMMARY_CSV_PATH,
+    manifest_path=WEATHER_SUMMARY_CSV_MANIFEST,
+    parquet_manifest=EXPORT_PARQUET_MANIFEST,
+    csv_path=EXPORT_CSV,
+    formats=EXPORT_FORMATS
+):
+    """
+    Drop-in replacement for analysis.jl's main(): writes the summary CSV and the
+    manifest file (absolute CSV path) that the R stage reads.
+
+    Returns:
+        pl.DataFrame: The summary that was written.
+    """
+    summary = compute_weather_summary(parquet_manifest, csv_path, formats)
+
+    os.makedirs(os.path.dirname(summary_csv), exist_ok=True)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    summary.write_csv(summary_csv)
+    with open(manifest_path, "w") as f:
+        f.write(os.path.abspath(summary_csv) + "\n")
+
+    print(f"✅ Exported grouped summary CSV at: {summary_csv} ({summary.height} rows)")
+    print(f"✅ Manifest file written for R/Python handoff at: {manifest_path}")
+    return summary
+
+
+def check_parity(julia_csv, tolerance=1e-9, parquet_manifest=EXPORT_PARQUET_MANIFEST, csv_path=EXPORT_CSV,
+                 formats=EXPORT_FORMATS):
+    """
+    Compares the Polars summary with a summary CSV produced by analysis.jl
+    (same input export). Columns, row keys and values must match; floats within
+    a relative `tolerance`.
+
+    Returns:
+        bool: True on parity.
+    """
+    keys = ["year", "weather_code"]
+    expected = (
+        pl.read_csv(julia_csv)
+        .select(SUMMARY_COLUMNS)
+        .with_columns(pl.col("year", "weather_code", "count").cast(pl.Int64))
+        .sort(keys, nulls_last=True)
+    )
+    actual = compute_weather_summary(parquet_manifest, csv_path, formats).sort(keys, nulls_last=True)
+
+    if expected.height != actual.height:
+        print(f"❌ Row count differs: julia={expected.height} polars={actual.height}")
+        return False
+
+    problems = []
+    for column in SUMMARY_COLUMNS:
+        left, right = expected[column], actual[column]
+        if right.dtype == pl.Float64:
+            left = left.cast(pl.Float64)
+            both_null = left.is_null() & right.is_null()
+            close = (left - right).abs() <= tolerance * right.abs().clip(lower_bound=1.0)
+            ok = (both_null | close.fill_null(False)).all()
+        else:
+            ok = left.cast(right.dtype).equals(right)
+        if not ok:
+            problems.append(column)
+
+    if problems:
+        print(f"❌ Polars summary differs from {julia_csv} in columns: {problems}")
+        return False
+    print(f"✅ Polars summary matches {julia_csv} ({actual.height} rows)")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Yearly weather summary (Polars engine)")
+    parser.add_argument("--check-parity", metavar="JULIA_CSV",
+                        help="Compare against a summary CSV written by analysis.jl instead of writing outputs")
+    args = parser.parse_args()
+
+    if args.check_parity:
+        raise SystemExit(0 if check_parity(args.check_parity) else 1)
+    run_weather_summary()
@@ -0,0 +1,225 @@
+# helpers/yearly_summary.py
+# =====================================================
+# Module: yearly_summary
+#
+# Incrementally maintained per-(location, year, weather_code) aggregates in
+# the `weather_yearly_summary` table.
+#
+# Instead of re-reading all history to recompute count/mean/min/max/std, the
+# loader (db_loader._insert_records) folds each batch of *newly inserted* rows
+# into running totals in the same transaction:
+#   count, n_<var>, sum_<var>, sumsq_<var>, min_<var>, max_<var>
+# for var in temp_max / temp_min. Mean and sample std are derived on read:
+#   mean = sum / n
+#   std  = sqrt((sumsq - sum^2 / n) / (n - 1))   (undefined for n < 2)
+# so summary cost is proportional to new rows, not to total history.
+#
+# A missing weather_code is stored as -1 so it still groups (NULLs would never
+# match the upsert conflict target).
+#
+# With sharded storage (helpers.shards) each shard summarizes its own locations;
+# read_yearly_summary merges the shards' totals, rebuild/verify cover every shard.
+#
+# Verification:
+#   python -m helpers.yearly_summary --verify    # compare against a full recompute
+#   python -m helpers.yearly_summary --rebuild   # recompute from weather_daily
+# =====================================================
+
+import argparse
+import sqlite3
+import polars as pl
+from helpers.shards import map_shards, read_frames
+from config.constants import DB_PATH, TABLE_NAME
+
+SUMMARY_TABLE = "weather_yearly_summary"
+MISSING_WEATHER_CODE = -1
+_VARIABLES = ["temp_max", "temp_min"]
+
+_SUMMARY_COLUMNS = ["location", "year", "weather_code", "count"] + [
+    f"{stat}_{v}" for v in _VARIABLES for stat in ("n", "sum", "sumsq", "min", "max")
+]
+
+_STAT_TYPES = {"n": "INTEGER NOT NULL", "sum": "REAL NOT NULL", "sumsq": "REAL NOT NULL", "min": "REAL", "max": "REAL"}
+
+CREATE_SUMMARY_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_TABLE} (
+        location TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        weather_code INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        {", ".join(f"{c} {_STAT_TYPES[c.split('_')[0]]}" for c in _SUMMARY_COLUMNS[4:])},
+        PRIMARY KEY (location, year, weather_code)
+    )
+"""
+
+
+def _aggregate_select(source_table):
+    """GROUP BY query producing summary rows from any weather_daily-shaped table."""
+    stats = ", ".join(
+        f"COUNT({v}), TOTAL({v}), TOTAL({v} * {v}), MIN({v}), MAX({v})" for v in _VARIABLES
+    )
+    return f"""
+        SELECT location, CAST(substr(date, 1, 4) AS INTEGER), IFNULL(weather_code, {MISSING_WEATHER_CODE}),
+               COUNT(*), {stats}
+        FROM {source_table}
+        GROUP BY 1, 2, 3
+    """
+
+
+def _merge_min_max(func, column):
+    # SQLite's scalar min()/max() return NULL if any argument is NULL
+    return f"{column} = {func}(IFNULL({column}, excluded.{column}), IFNULL(excluded.{column}, {column}))"
+
+
+def apply_summary_delta(cursor, source_table):
+    """
+    Folds the rows of `source_table` (only rows that were actually inserted) into the
+    running totals. Call inside the same transaction as the insert.
+    """
+    updates = ["count = count + excluded.count"]
+    for v in _VARIABLES:
+        updates += [
+            f"n_{v} = n_{v} + excluded.n_{v}",
+            f"sum_{v} = sum_{v} + excluded.sum_{v}",
+            f"sumsq_{v} = sumsq_{v} + excluded.sumsq_{v}",
+            _merge_min_max("min", f"min_{v}"),
+            _merge_min_max("max", f"max_{v}"),
+        ]
+    cursor.execute(f"""
+        INSERT INTO {SUMMARY_TABLE} ({", ".join(_SUMMARY_COLUMNS)})
+        {_aggregate_select(source_table)}
+        ON CONFLICT (location, year, weather_code) DO UPDATE SET {", ".join(updates)}
+    """)
+
+
+def rebuild_summary_table(cursor):
+    """Recomputes the whole summary table from weather_daily (inside the caller's transaction)."""
+    cursor.execute(CREATE_SUMMARY_TABLE_SQL)
+    cursor.execute(f"DELETE FROM {SUMMARY_TABLE}")
+    cursor.execute(f"""
+        INSERT INTO {SUMMARY_TABLE} ({", ".join(_SUMMARY_COLUMNS)})
+        {_aggregate_select(TABLE_NAME)}
+    """)
+
+
+def _rebuild_summary_file(path):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        rebuild_summary_table(cursor)
+        conn.commit()
+        return cursor.execute(f"SELECT COUNT(*) FROM {SUMMARY_TABLE}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def rebuild_yearly_summary(db_path=DB_PATH):
+    """Full rebuild of weather_yearly_summary from weather_daily (on every shard)."""
+    rows = sum(map_shards(db_path, _rebuild_summary_file))
+    print(f"✅ Rebuilt {SUMMARY_TABLE}: {rows} groups")
+    return rows
+
+
+def read_yearly_summary(db_path=DB_PATH, by_location=False) -> pl.DataFrame:
+    """
+    Reads the summary with derived statistics, in the Julia summary's column naming.
+
+    Args:
+        db_path (str): Path to the SQLite .db file.
+        by_location (bool): Keep one row per location; otherwise locations are combined
+            per (year, weather_code) like the Julia summary.
+
+    Returns:
+        pl.DataFrame: [location,] year, weather_code, count and mean/min/max/std for
+            temp_max (…_tempmax) and temp_min (…_tempmin). std is null when n < 2.
+            weather_code is null where the source code was missing.
+    """
+    # Per-shard totals; the group_by below merges them like any other partial sums
+    df = read_frames(db_path, f"SELECT * FROM {SUMMARY_TABLE}")
+
+    keys = (["location"] if by_location else []) + ["year", "weather_code"]
+    sums = [c for c in _SUMMARY_COLUMNS if c.startswith(("count", "n_", "sum_", "sumsq_"))]
+    df = df.group_by(keys).agg(
+        [pl.col(c).sum() for c in sums]
+        + [pl.col(f"min_{v}").min() for v in _VARIABLES]
+        + [pl.col(f"max_{v}").max() for v in _VARIABLES]
+    )
+
+    derived = []
+    for v in _VARIABLES:
+        suffix = v.replace("_", "")   # temp_max -> tempmax (Julia column names)
+        n, total, sumsq = pl.col(f"n_{v}"), pl.col(f"sum_{v}"), pl.col(f"sumsq_{v}")
+        variance = ((sumsq - total * total / n) / (n - 1)).clip(lower_bound=0)
+        derived += [
+            pl.when(n > 0).then(total / n).alias(f"mean_{suffix}"),
+            pl.col(f"min_{v}").alias(f"min_{suffix}"),
+            pl.col(f"max_{v}").alias(f"max_{suffix}"),
+            pl.when(n > 1).then(variance.sqrt()).alias(f"std_{suffix}"),
+        ]
+
+    return (
+        df.select(keys + ["count"] + derived)
+        .with_columns(
+            pl.when(pl.col("weather_code") == MISSING_WEATHER_CODE)
+            .then(None).otherwise(pl.col("weather_code")).alias("weather_code")
+        )
+        .sort(keys)
+    )
+
+
+def _count_summary_mismatches(path, tolerance):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE TEMP TABLE expected_summary AS SELECT * FROM {SUMMARY_TABLE} WHERE 0")
+        cursor.execute(f"INSERT INTO expected_summary {_aggregate_select(TABLE_NAME)}")
+        diff_checks = " OR ".join(
+            f"a.{c} IS NOT b.{c}" if c.startswith(("count", "n_", "min_", "max_"))
+            else f"abs(a.{c} - b.{c}) > {tolerance} * max(1.0, abs(b.{c}))"
+            for c in _SUMMARY_COLUMNS[3:]
+        )
+        # Groups present on only one side, then groups whose totals differ
+        same_group = "a.location = b.location AND a.year = b.year AND a.weather_code = b.weather_code"
+        mismatches = 0
+        for left, right in (("expected_summary", SUMMARY_TABLE), (SUMMARY_TABLE, "expected_summary")):
+            mismatches += cursor.execute(f"""
+                SELECT COUNT(*) FROM {left} a
+                WHERE NOT EXISTS (SELECT 1 FROM {right} b WHERE {same_group})
+            """).fetchone()[0]
+        mismatches += cursor.execute(f"""
+            SELECT COUNT(*) FROM expected_summary a
+            JOIN {SUMMARY_TABLE} b ON {same_group}
+            WHERE {diff_checks}
+        """).fetchone()[0]
+    finally:
+        conn.close()
+    return mismatches
+
+
+def verify_yearly_summary(db_path=DB_PATH, tolerance=1e-6):
+    """
+    Compares the incrementally maintained table with a fresh full recompute (on every shard).
+
+    Returns:
+        bool: True if every group matches (sums within relative `tolerance`).
+    """
+    mismatches = sum(map_shards(db_path, lambda path: _count_summary_mismatches(path, tolerance)))
+    if mismatches:
+        print(f"❌ {SUMMARY_TABLE} differs from a full recompute in {mismatches} group(s)")
+    else:
+        print(f"✅ {SUMMARY_TABLE} matches a full recompute")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain/verify the weather_yearly_summary table")
+    parser.add_argument("--db", default=DB_PATH, help="Path to the SQLite database")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute the table from weather_daily")
+    parser.add_argument("--verify", action="store_true", help="Compare the table with a full recompute")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rebuild_yearly_summary(args.db)
+    if args.verify or not args.rebuild:
+        raise SystemExit(0 if verify_yearly_summary(args.db) else 1)
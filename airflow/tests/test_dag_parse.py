@@ -0,0 +1,29 @@
+# tests/test_dag_parse.py
+# =====================================================
+# The DAG parse-time budget (benchmarks/dag_parse_benchmark.py) as a test: the
+# scheduler re-parses the DAG file constantly, so parse cost and parse-time
+# imports of the ETL helpers must not creep back in.
+#
+# Skipped where Airflow is not installed (the repo's own airflow/ folder is not
+# the package, hence the check on airflow.decorators).
+# =====================================================
+
+import os
+import pytest
+
+pytest.importorskip("airflow.decorators")
+
+from benchmarks.dag_parse_benchmark import DAG_FILE, PARSE_BUDGET_SECONDS, run_benchmark
+
+
+def test_dag_parses_within_budget(monkeypatch):
+    # The parse runs in a fresh interpreter: give it the DAG folder's import path
+    dags_root = os.path.dirname(os.path.dirname(DAG_FILE))
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join(filter(None, [dags_root, os.environ.get("PYTHONPATH")])))
+
+    report = run_benchmark(runs=3)
+
+    assert report["heavy_imports"] == [], f"DAG file imports ETL modules at parse time: {report['heavy_imports']}"
+    assert report["dag_parse_s"] <= PARSE_BUDGET_SECONDS, (
+        f"DAG parse took {report['dag_parse_s'] * 1000:.0f} ms (budget {PARSE_BUDGET_SECONDS * 1000:.0f} ms)"
+    )
@@ -0,0 +1,38 @@
+# tests/test_date_utils.py
+# =====================================================
+# Incremental date planning (helpers.date_utils): ranges never reach into the
+# archive's still-changing window (ARCHIVE_LAG_DAYS), on the first load too.
+# =====================================================
+
+import datetime
+from config.constants import ARCHIVE_LAG_DAYS, FORWARD, BACKWARD
+from helpers.date_utils import get_incremental_start_to_end_dates
+
+TODAY = datetime.date.today()
+LATEST_COMPLETE = (TODAY - datetime.timedelta(days=ARCHIVE_LAG_DAYS)).isoformat()
+
+
+def test_first_load_ends_before_archive_lag():
+    start_date, end_date = get_incremental_start_to_end_dates(None, TODAY.year - 1, 2, FORWARD)
+    assert start_date == f"{TODAY.year - 1}-01-01"
+    assert end_date <= LATEST_COMPLETE
+
+
+def test_first_load_of_past_interval_is_unchanged():
+    assert get_incremental_start_to_end_dates(None, 2015, 5, FORWARD) == ("2015-01-01", "2019-12-31")
+
+
+def test_first_load_backward_interval_is_ordered_and_capped():
+    start_date, end_date = get_incremental_start_to_end_dates(None, TODAY.year, 2, BACKWARD)
+    assert start_date <= end_date <= LATEST_COMPLETE
+
+
+def test_incremental_range_starts_after_watermark_and_is_capped():
+    watermark = (TODAY - datetime.timedelta(days=ARCHIVE_LAG_DAYS + 10)).isoformat()
+    start_date, end_date = get_incremental_start_to_end_dates(watermark, TODAY.year - 1, 2, FORWARD)
+    assert start_date == (TODAY - datetime.timedelta(days=ARCHIVE_LAG_DAYS + 9)).isoformat()
+    assert end_date == LATEST_COMPLETE
+
+
+def test_nothing_missing_returns_none():
+    assert get_incremental_start_to_end_dates(LATEST_COMPLETE, TODAY.year - 1, 2, FORWARD) is None